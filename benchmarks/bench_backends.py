@@ -0,0 +1,68 @@
+''' Compare the backends of CoolProp for water with HEOS.
+
+    For each backend, the time of a property of a new point of state
+    and of a batch on a (T,P) grid of liquid water and steam is measured.
+    The deviations are the median and the maximum of the relative
+    differences to HEOS on the grid.
+    The tabular backends BICUBIC and TTSE build their tables on first use
+    (once per host, CoolProp keeps them in ~/.CoolProp/Tables).
+'''
+import itertools
+
+import numpy as np
+
+from harness import measure, report
+from fluids import fluid_factory
+
+
+backends = ['HEOS','IF97','BICUBIC','TTSE']
+
+# standard grid: 300 K ... 700 K and 1 bar ... 100 bar, without
+# points close to the saturation line
+T_grid, P_grid = np.meshgrid(np.linspace(300,700,41),np.geomspace(1e5,1e7,21))
+properties = ['H','D','S','C']
+
+
+def deviations(Water,reference,mask):
+    ''' return {statistic of property: relative deviation} of Water from
+        the batch reference on the points of the grid in mask. The
+        statistics are the median and the maximum.
+    '''
+    batch = Water.batch(T=T_grid,P=P_grid)
+    res = dict()
+    for q in properties:
+        d = np.abs(getattr(batch,q)[mask]/getattr(reference,q)[mask] - 1)
+        res[f'median deviation of {q}'] = float(np.nanmedian(d))
+        res[f'maximum deviation of {q}'] = float(np.nanmax(d))
+    return res
+
+
+def run():
+    temperatures = itertools.cycle(np.linspace(300,700,997).tolist())
+    HEOS = fluid_factory('Water',backend='HEOS')
+    reference = HEOS.batch(T=T_grid,P=P_grid)
+    # more than 2 K from the saturation temperature (nan above Pcrit)
+    T_sat = HEOS.batch(P=P_grid,Q=0).T
+    mask = ~(np.abs(T_grid - T_sat) <= 2)
+    timings, errors = dict(), dict()
+    for backend in backends:
+        Water = fluid_factory('Water',backend=backend)
+        Water(T=300.0,P=1e5).H # build the tables of tabular backends
+        timings[f'{backend}: H'] = measure(lambda: Water(T=next(temperatures),P=1e5).H)
+        timings[f'{backend}: outputs H, D, S, C'] = measure(
+            lambda: Water(T=next(temperatures),P=1e5).outputs(*properties)
+        )
+        timings[f'{backend}: batch H ({T_grid.size})'] = measure(
+            lambda: Water.batch(T=T_grid,P=P_grid).H,number=3
+        )
+        for q,v in deviations(Water,reference,mask).items():
+            errors[f'{backend}: {q}'] = v
+    return timings, errors
+
+
+if __name__ == '__main__':
+    timings, errors = run()
+    report(timings,title='backends of CoolProp for Water')
+    print('relative deviation from HEOS')
+    for k,v in errors.items():
+        print(f'{k:<38} {v:.2e}')
@@ -0,0 +1,42 @@
+''' Data of an h-x chart of humid air: loops of points of state and hx_chart(...).
+
+    The loops create one point of state per point of the isolines of
+    constant R (like the notebooks), hx_chart(...) one batch per kind of
+    isolines. The second call of hx_chart(...) with the same arguments
+    returns the cached chart.
+'''
+import numpy as np
+
+from harness import measure, report
+from fluids import fluid_factory, T_0
+from fluids.charts import HXChart, hx_chart, clear_charts
+
+
+def loops(HA,n=101):
+    ''' return the lists of W and H of the isolines R = 0.1, ..., 1 '''
+    lines = []
+    for R in np.linspace(0.1,1,10):
+        points = [HA(T=T,R=R) for T in np.linspace(T_0-20,T_0+50,n)]
+        lines.append(([p.W for p in points],[p.H for p in points]))
+    return lines
+
+
+def run():
+    results = dict()
+    for engine in ['PropsSI','ideal']:
+        HA = fluid_factory('HumidAir',engine=engine)
+        results[f'{engine}: loops, isolines of R (10 x 101)'] = measure(lambda: loops(HA),number=1,repeat=3)
+        results[f'{engine}: HXChart, isolines of R (10 x 101)'] = measure(
+            lambda: HXChart(engine=engine,T_lines=(),H=(),Vda=(),B=()),number=1,repeat=3
+        )
+        results[f'{engine}: HXChart, all isolines'] = measure(
+            lambda: HXChart(engine=engine),number=1,repeat=3
+        )
+        clear_charts()
+        hx_chart(engine=engine)
+        results[f'{engine}: hx_chart, cached'] = measure(lambda: hx_chart(engine=engine))
+    return results
+
+
+if __name__ == '__main__':
+    report(run(),title='h-x chart of humid air')
@@ -0,0 +1,65 @@
+''' Columnar tables of points of state (fluids.columns.StateTable).
+
+    The values of n points of state of air (T, P, H, D and S) are kept
+    either as list of dicts of subset(...) (one dict and five floats per
+    point) or as StateTable with one float64 array per property. The
+    table is saved as directory of .npy files and opened again as
+    memory map, which does not read the columns.
+'''
+import os
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+from harness import measure, report
+from fluids import fluid_factory
+from fluids.columns import StateTable
+
+
+properties = ('T','P','H','D','S')
+
+
+def traced_bytes(make):
+    ''' return the traced memory of the result of make() '''
+    tracemalloc.start()
+    result = make()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, result
+
+
+def run(n=100_000):
+    Air = fluid_factory('Air')
+    inputs = dict(T=np.linspace(250,350,n),P=1e5)
+    table = StateTable.evaluate(Air,inputs,['H','D','S'],workers=1)
+    batch = Air.batch(**inputs)
+    arrays = {q: np.broadcast_to(getattr(batch,q),(n,)) for q in properties}
+    sizes = dict()
+    sizes['list of dicts: bytes per point'] = traced_bytes(
+        lambda: [{q: float(arrays[q][i]) for q in properties} for i in range(n)]
+    )[0]/n
+    sizes['StateTable: bytes per point'] = sum(v.nbytes for v in table.columns.values())/n
+    timing = dict()
+    timing[f'evaluate {n} points of state (H, D, S)'] = measure(
+        lambda: StateTable.evaluate(Air,inputs,['H','D','S'],workers=1),number=1,repeat=3
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory,'states')
+        timing['save as .npy files'] = measure(lambda: table.save(path),number=1)
+        timing['load (memory map)'] = measure(lambda: StateTable.load(path,Air))
+        loaded = StateTable.load(path,Air)
+        timing['load and mean of H'] = measure(lambda: float(StateTable.load(path,Air)['H'].mean()))
+        rng = np.random.default_rng(0)
+        timing['point(i).H of the loaded table'] = measure(lambda: loaded.point(int(rng.integers(n))).H)
+        timing['Air(T=...,P=1e5).H by the engine'] = measure(lambda: Air(T=float(rng.uniform(250,350)),P=1e5).H)
+        del loaded
+    return sizes, timing
+
+
+if __name__ == '__main__':
+    sizes, timing = run()
+    print('values of T, P, H, D and S of air')
+    for k,v in sizes.items():
+        print(f'{k:<40} {v:8.0f}')
+    report(timing,title='')
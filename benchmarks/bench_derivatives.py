@@ -0,0 +1,52 @@
+''' Jacobians of H and D of water by CoolProp and by finite differences.
+
+    The finite differences need two extra points of state (T+dT and
+    P+dP) and their properties, the analytic derivatives of CoolProp one
+    call of the bulk function (CP.PropsSImulti) or, with
+    engine='AbstractState', one flash.
+'''
+import itertools
+
+import numpy as np
+
+from harness import measure, report
+from fluids import fluid_factory
+
+
+def finite_differences(Water,T,P,outputs=('H','D'),rel=1e-6):
+    ''' return the Jacobian of outputs with respect to (T,P) by forward
+        differences
+    '''
+    p = Water(T=T,P=P)
+    dT, dP = T*rel, P*rel
+    p_T, p_P = Water(T=T+dT,P=P), Water(T=T,P=P+dP)
+    return np.array([
+        [(getattr(p_T,q)-getattr(p,q))/dT,(getattr(p_P,q)-getattr(p,q))/dP]
+        for q in outputs
+    ])
+
+
+def run():
+    results = dict()
+    temperatures = itertools.cycle(np.linspace(300,600,997).tolist())
+    T = np.linspace(300,600,1000)
+    for engine in ['PropsSI','AbstractState']:
+        Water = fluid_factory('Water',engine=engine)
+        results[f'{engine}: finite differences of H, D'] = measure(
+            lambda: finite_differences(Water,next(temperatures),1e5)
+        )
+        results[f'{engine}: jacobian H, D'] = measure(
+            lambda: Water(T=next(temperatures),P=1e5).jacobian('H','D')
+        )
+    Water = fluid_factory('Water')
+    results['batch (1000): jacobian H, D'] = measure(
+        lambda: Water.batch(T=T,P=1e5).jacobian('H','D'),number=3
+    )
+    results['batch (1000): cached jacobian H, D'] = measure(
+        (lambda b: lambda: b.jacobian('H','D'))(Water.batch(T=T,P=1e5))
+    )
+    return results
+
+
+if __name__ == '__main__':
+    report(run(),title='Jacobians of water with respect to (T,P)')
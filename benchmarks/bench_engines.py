@@ -0,0 +1,34 @@
+''' Compare the engines 'PropsSI' and 'AbstractState' of fluid_factory(...).
+
+    Each call uses a new point of state with new inputs, so neither
+    the cache of the point of state nor the last flash of the
+    AbstractState can be reused.
+'''
+import itertools
+
+import numpy as np
+
+from harness import measure, report
+from fluids import fluid_factory
+
+
+def run(fluid='Air'):
+    temperatures = itertools.cycle(np.linspace(250,350,997))
+    results = dict()
+    for engine in ['PropsSI','AbstractState']:
+        ThisFluid = fluid_factory(fluid,engine=engine)
+        results[f'{engine}: args'] = measure(
+            lambda: ThisFluid(T=next(temperatures),P=1e5).args
+        )
+        results[f'{engine}: H'] = measure(
+            lambda: ThisFluid(T=next(temperatures),P=1e5).H
+        )
+        results[f'{engine}: batch H (1000)'] = measure(
+            lambda: ThisFluid.batch(T=np.linspace(250,350,1000)+next(temperatures),P=1e5).H,
+            number=10
+        )
+    return results
+
+
+if __name__ == '__main__':
+    report(run(),title='engines of fluid_factory for Air')
@@ -0,0 +1,81 @@
+''' Hot paths of points of state with the default engine CP.PropsSI.
+
+    "first" means the first access of a property of a new point of
+    state (one call of the engine), "cached" means the access of a
+    property that is cached in the point of state.
+'''
+import itertools
+
+import numpy as np
+
+from harness import measure, report
+from fluids import fluid_factory, Q_, ha_subset, fluids_subset
+from fluids import enable_instrumentation, disable_instrumentation
+from fluids.fluids import _fluid_classes
+
+
+def run():
+    Air = fluid_factory('Air')
+    HA = fluid_factory('HumidAir')
+    HA_u = fluid_factory('HumidAir',with_units=True)
+    Water_u = fluid_factory('Water',with_units=True)
+    temperatures = itertools.cycle(np.linspace(250,350,997).tolist())
+    humidities = itertools.cycle(np.linspace(1e-3,9e-3,997).tolist())
+    results = dict()
+
+    def new_class():
+        _fluid_classes.clear()
+        return fluid_factory('Air')
+    results['fluid_factory: new class'] = measure(new_class)
+    results['fluid_factory: memoized class'] = measure(lambda: fluid_factory('Air'))
+
+    air = Air(T=300,P=1e5)
+    air.H
+    results['Fluid: first H'] = measure(lambda: Air(T=next(temperatures),P=1e5).H)
+    results['Fluid: cached H'] = measure(lambda: air.H)
+    enable_instrumentation()
+    results['Fluid: first H, instrumented'] = measure(lambda: Air(T=next(temperatures),P=1e5).H)
+    results['Fluid: cached H, instrumented'] = measure(lambda: air.H)
+    disable_instrumentation()
+    results['Fluid: args'] = measure(lambda: Air(T=next(temperatures),P=1e5).args)
+    results['Fluid: args_or_errormessages'] = measure(
+        lambda: Air(T=next(temperatures),P=1e5).args_or_errormessages
+    )
+    Water = fluid_factory('Water')
+    qualities = itertools.cycle(np.linspace(0.01,0.99,997).tolist())
+    results['Fluid: two-phase args_or_errormessages'] = measure(
+        lambda: Water(P=1e5,Q=next(qualities)).args_or_errormessages
+    )
+
+    ha = HA(T=293.15,R=0.5)
+    ha.H
+    results['HAPoint_of_State: first H'] = measure(lambda: HA(T=next(temperatures),R=0.5).H)
+    results['HAPoint_of_State: cached H'] = measure(lambda: ha.H)
+    results['HAPoint_of_State: args'] = measure(lambda: HA(T=next(temperatures),R=0.5).args)
+    results['HAPoint_of_State: W+R, T'] = measure(lambda: HA(W=next(humidities),R=0.5).T)
+    results['HAPoint_of_State: D+R, T'] = measure(lambda: HA(D=next(temperatures)-40,R=0.5).T)
+
+    # a third of the points of state is outside of the domain (R > 1)
+    HA_mask = fluid_factory('HumidAir',validation='mask')
+    R = np.linspace(0,1.5,300)
+    results['Batch: HumidAir 300 points, 100 invalid'] = measure(lambda: HA.batch(T=293.15,R=R).H)
+    results['Batch: HumidAir 300 points, 100 invalid, validation'] = measure(lambda: HA_mask.batch(T=293.15,R=R).H)
+
+    other = HA(T=303.15,R=0.8)
+    other.H, other.W, ha.W
+    results['HAPoint_of_State: mix, T'] = measure(lambda: ha.mix(other,0.3).T)
+    results['HAPoint_of_State: hom_coord, T'] = measure(lambda: ha.hom_coord(other,1.5).T)
+
+    ha_u = HA_u(T=Q_(20,'degC'),R=Q_(50,'percent'))
+    ha_u.args
+    water_u = Water_u(T=Q_(20,'degC'),P=Q_(1,'bar'))
+    water_u.args
+    results['Units: HumidAir subset_to(ha_subset)'] = measure(lambda: ha_u.subset_to(**ha_subset))
+    results['Units: HumidAir subset_m_as(ha_subset)'] = measure(lambda: ha_u.subset_m_as(**ha_subset))
+    results['Units: Water subset_to(fluids_subset)'] = measure(lambda: water_u.subset_to(**fluids_subset))
+    results['Units: Water subset_m_as(fluids_subset)'] = measure(lambda: water_u.subset_m_as(**fluids_subset))
+    return results
+
+
+if __name__ == '__main__':
+    report(run(),title='hot paths of points of state')
@@ -0,0 +1,29 @@
+''' Startup time of the fluids package.
+
+    Each measurement starts a new Python interpreter, so the time
+    includes the startup of the interpreter itself (see 'python').
+    pint and CoolProp are imported on first use, e.g. by the first
+    Quantity or the first fluid_factory(...).
+'''
+import subprocess
+import sys
+
+from harness import measure, report, root
+
+
+def python(code):
+    return lambda: subprocess.run([sys.executable,'-c',code],cwd=root,check=True)
+
+
+def run():
+    statements = {
+        'python': 'pass',
+        'import fluids': 'import fluids',
+        'import fluids, first Q_': "import fluids; fluids.Q_(1,'m')",
+        'import fluids, first fluid_factory': "import fluids; fluids.fluid_factory('Air')",
+    }
+    return {k: measure(python(code),number=1,repeat=5) for k,code in statements.items()}
+
+
+if __name__ == '__main__':
+    report(run(),title='startup time of fluids')
@@ -0,0 +1,62 @@
+''' Memory per point of state.
+
+    Points of state keep their inputs and cached values in a float
+    array with a bitmask of valid values and have no __dict__. The
+    layout before (one attribute _<name> in the instance __dict__
+    for each value and the list _arg_list) is emulated by DictLayout
+    with the same values.
+'''
+import sys
+import tracemalloc
+
+import numpy as np
+
+from harness import measure, report
+from fluids import fluid_factory
+
+
+class DictLayout():
+    ''' the values of point in the instance __dict__ '''
+    def __init__(self,point,properties):
+        self.name = point.name
+        for k in point._inputs:
+            setattr(self,f'_{k}',float(point._get(k)))
+        for k in properties:
+            setattr(self,f'_{k}',float(getattr(point,k)))
+        self._arg_list = list(point._arg_list)
+
+
+def bytes_per_point(make,n):
+    ''' return the traced memory per point of n points created by make(i) '''
+    tracemalloc.start()
+    points = [make(i) for i in range(n)]
+    size = tracemalloc.get_traced_memory()[0] - sys.getsizeof(points)
+    tracemalloc.stop()
+    return size/n
+
+
+def run(n=2000):
+    Air = fluid_factory('Air')
+    T = np.linspace(250,350,n).tolist()
+    cases = {'inputs only': [], 'inputs, H, S, D and C': ['H','S','D','C']}
+    sizes = dict()
+    for case,properties in cases.items():
+        def make(i):
+            point = Air(T=T[i],P=1e5)
+            point.subset(*properties)
+            return point
+        points = [make(i) for i in range(n)]
+        sizes[f'{case}: dict layout'] = bytes_per_point(lambda i: DictLayout(points[i],properties),n)
+        sizes[f'{case}: array layout'] = bytes_per_point(make,n)
+    point = Air(T=300,P=1e5)
+    point.H
+    timing = {'access of cached H': measure(lambda: point.H)}
+    return sizes, timing
+
+
+if __name__ == '__main__':
+    sizes, timing = run()
+    print('bytes per point of state of Air')
+    for k,v in sizes.items():
+        print(f'{k:<40} {v:8.0f}')
+    report(timing,title='')
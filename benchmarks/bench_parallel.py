@@ -0,0 +1,30 @@
+''' Speedup of evaluate_many(...) with several worker processes.
+
+    The grid of points of state is a parameter sweep of Air over
+    temperatures and pressures.
+'''
+import os
+
+import numpy as np
+
+from harness import measure, report
+from fluids import fluid_factory, evaluate_many
+
+
+def run(n=200):
+    Air = fluid_factory('Air')
+    T, P = np.meshgrid(np.linspace(200,600,n),np.geomspace(1e4,1e7,n))
+    results = dict()
+    workers = 1
+    while workers <= os.cpu_count():
+        results[f'{n*n} points, {workers} workers'] = measure(
+            lambda: evaluate_many(Air,dict(T=T,P=P),['H','D','S'],workers=workers),
+            number=1,
+            repeat=3
+        )
+        workers *= 2
+    return results
+
+
+if __name__ == '__main__':
+    report(run(),title='evaluate_many for Air, properties H, D and S')
@@ -0,0 +1,74 @@
+''' Validation and throughput of the engine 'ideal' for humid air.
+
+    The ideal gas equations (fluids/psychrometrics.py) are compared with
+    CP.HAPropsSI on grids over the usual range of HVAC applications:
+    T from -20 °C to 0 °C and from 0 °C to 50 °C, R from 5 % to 100 %
+    and P = 101325 Pa.
+'''
+import numpy as np
+
+from harness import measure, report
+from fluids import fluid_factory
+
+
+# properties of the ideal gas equations
+properties = ['W','H','B','D','Vda','Vha','C','P_w','psi_w']
+
+# properties that are compared by their absolute deviation (with unit)
+absolute = {'H': 'J/kg', 'B': 'K', 'D': 'K'}
+
+
+def grid(n=50,T=(253.15,323.15)):
+    T, R = np.meshgrid(np.linspace(*T,n),np.linspace(0.05,1,n))
+    return T.ravel(), R.ravel()
+
+
+def validation(n=50,T=(253.15,323.15)):
+    ''' return dict of maximum deviations between the engines 'ideal'
+        and 'PropsSI' for all properties
+    '''
+    T, R = grid(n,T)
+    ideal = fluid_factory('HumidAir',engine='ideal').batch(T=T,R=R)
+    real = fluid_factory('HumidAir').batch(T=T,R=R)
+    res = dict()
+    for k in properties:
+        a, b = getattr(ideal,k), getattr(real,k)
+        if k in absolute:
+            res[k] = (f'max. abs. deviation ({absolute[k]})', np.nanmax(np.abs(a-b)))
+        else:
+            res[k] = ('max. rel. deviation', np.nanmax(np.abs(a/b-1)))
+    return res
+
+
+def run(n=100):
+    T, R = grid(n)
+    results = dict()
+    for engine in ['PropsSI','ideal']:
+        HA = fluid_factory('HumidAir',engine=engine)
+        results[f'{engine}: batch H ({len(T)})'] = measure(
+            lambda: HA.batch(T=T,R=R).H,
+            number=1
+        )
+        results[f'{engine}: batch T from (H,R) ({len(T)})'] = measure(
+            lambda: HA.batch(H=5e4*R,R=R).T,
+            number=1
+        )
+        results[f'{engine}: single point H'] = measure(
+            lambda: HA(T=293.15,R=0.5).H
+        )
+    return results
+
+
+if __name__ == '__main__':
+    for t in [(-20,0),(0,50)]:
+        print('validation of engine ideal against CP.HAPropsSI')
+        print(f'T = {t[0]} °C ... {t[1]} °C, R = 5 % ... 100 %, P = 101325 Pa')
+        for k,(kind,v) in validation(T=(t[0]+273.15,t[1]+273.15)).items():
+            print(f'{k:>6} {kind:<28} {v:.2e}')
+        print()
+    results = run()
+    report(results,title='throughput of the engines for humid air')
+    for k,v in results.items():
+        if 'batch' in k:
+            n = int(k.split('(')[-1][:-1])
+            print(f'{k:<40} {n/v["median"]:12.0f} points/s')
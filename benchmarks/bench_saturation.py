@@ -0,0 +1,78 @@
+''' Refrigeration cycle sweep of R134a with and without the saturation table.
+
+    Each cycle has four points of state: saturated vapor at the
+    evaporation temperature, isentropic compression to the condensation
+    pressure, saturated liquid at the condensation temperature and
+    throttling to the evaporation pressure. The values of all points are
+    read with subset_m_as(**fluids_subset). With saturation_table=True,
+    three of the four points are determined from the saturation table,
+    the compression (superheated vapor) by CP.PropsSI.
+'''
+import itertools
+
+import numpy as np
+
+from harness import measure, report
+from fluids import fluid_factory, Q_, fluids_subset
+
+
+# evaporation and condensation temperatures in degC
+t_evaporation = np.linspace(-30,10,9).tolist()
+t_condensation = np.linspace(25,55,7).tolist()
+
+
+def cycle(R134a,t_0,t_c):
+    ''' return the values of fluids_subset of the four points of state
+        and the COP of the cycle
+    '''
+    p1 = R134a(T=Q_(t_0,'degC'),Q=1)
+    p3 = R134a(T=Q_(t_c,'degC'),Q=0)
+    p2 = R134a(P=p3.P,S=p1.S)
+    p4 = R134a(P=p1.P,H=p3.H)
+    values = [p.subset_m_as(**fluids_subset) for p in (p1,p2,p3,p4)]
+    # the values of fluids_subset are rounded
+    h1, h2, h4 = (p.H.m_as('J/kg') for p in (p1,p2,p4))
+    return values, (h1-h4)/(h2-h1)
+
+
+def sweep(R134a):
+    ''' return the COPs of all cycles of the sweep '''
+    return [cycle(R134a,t_0,t_c)[1] for t_0,t_c in itertools.product(t_evaporation,t_condensation)]
+
+
+def saturated_points(R134a):
+    ''' return the values of fluids_subset of the saturated vapor and
+        liquid at all evaporation and condensation temperatures
+    '''
+    return [
+        R134a(T=Q_(t,'degC'),Q=q).subset_m_as(**fluids_subset)
+        for t in t_evaporation + t_condensation for q in (0,1)
+    ]
+
+
+def run():
+    results = dict()
+    n = len(t_evaporation)*len(t_condensation)
+    cops = dict()
+    for table in (False,True):
+        R134a = fluid_factory('R134a',with_units=True,saturation_table=table)
+        if table:
+            results['build of the saturation table'] = measure(
+                lambda: type(R134a.saturation())('R134a'),number=1,repeat=3
+            )
+        name = 'saturation table' if table else 'PropsSI'
+        results[f'{name}: sweep of {n} cycles'] = measure(lambda: sweep(R134a),number=1)
+        results[f'{name}: {2*(len(t_evaporation)+len(t_condensation))} saturated points'] = measure(
+            lambda: saturated_points(R134a),number=1
+        )
+        cops[name] = np.array(sweep(R134a))
+    deviation = np.max(np.abs(cops['saturation table']/cops['PropsSI']-1))
+    results['maximum relative deviation of the COP'] = float(deviation)
+    return results
+
+
+if __name__ == '__main__':
+    results = run()
+    deviation = results.pop('maximum relative deviation of the COP')
+    report(results,title='refrigeration cycle sweep of R134a')
+    print(f'maximum relative deviation of the COP: {deviation:.2e}')
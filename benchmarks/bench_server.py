@@ -0,0 +1,106 @@
+''' Load test of the local property server (fluids/server.py).
+
+    The server runs in a process of its own on a Unix socket. Each of
+    the clients is a connection that sends single point requests for H
+    and D of air one after the other (the next request after the
+    response). The latencies are the times from sending a request to its
+    response, the throughput is the number of requests per second of
+    all clients.
+
+    Scenarios:
+      - unique: all requests have different inputs, they are evaluated
+        in batches of the requests that arrive within the batch window
+      - repeated: the inputs are taken from 100 points of state, so
+        most requests are answered from the cache or wait for an
+        identical request
+'''
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from harness import root, measure
+from fluids import fluid_factory
+
+
+def start_server(path,batch_window):
+    ''' start the server in a subprocess and wait for the socket '''
+    process = subprocess.Popen(
+        [sys.executable,'-m','fluids.server','--unix',path,'--batch-window',str(batch_window)],
+        cwd=root,stdout=subprocess.PIPE,
+    )
+    process.stdout.readline()
+    return process
+
+
+async def client(path,temperatures,latencies):
+    reader, writer = await asyncio.open_unix_connection(path)
+    for i,T in enumerate(temperatures):
+        request = dict(id=i,fluid='Air',inputs=dict(T=T,P=1e5),outputs=['H','D'])
+        start = time.perf_counter()
+        writer.write(json.dumps(request).encode()+b'\n')
+        response = json.loads(await reader.readline())
+        latencies.append(time.perf_counter()-start)
+        assert 'H' in response['values']
+    writer.close()
+    await writer.wait_closed()
+
+
+async def load(path,clients,requests,repeated):
+    rng = np.random.default_rng(0)
+    if repeated:
+        temperatures = rng.choice(np.linspace(250,350,100),(clients,requests))
+    else:
+        temperatures = rng.uniform(250,350,(clients,requests))
+    # the fluid class of the server is created by the first request
+    await client(path,[300.0],[])
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(path,T.tolist(),latencies) for T in temperatures))
+    elapsed = time.perf_counter()-start
+    latencies = np.sort(latencies)
+    return dict(
+        min=float(latencies[0]),
+        median=float(np.median(latencies)),
+        p99=float(np.percentile(latencies,99)),
+        max=float(latencies[-1]),
+        throughput=len(latencies)/elapsed,
+        number=len(latencies),
+        repeat=1,
+    )
+
+
+def run(clients=32,requests=100,batch_windows=(0.0,0.001,0.005)):
+    results = dict()
+    Air = fluid_factory('Air')
+    rng = np.random.default_rng(1)
+    direct = measure(lambda: Air(T=float(rng.uniform(250,350)),P=1e5).outputs('H','D'))
+    direct['throughput'] = 1/direct['median']
+    results['in process, no server'] = direct
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory,'fluids.sock')
+        for batch_window in batch_windows:
+            process = start_server(path,batch_window)
+            try:
+                for repeated in (False,True):
+                    name = f'{clients} clients, window {batch_window*1e3:g} ms, {"repeated" if repeated else "unique"}'
+                    results[name] = asyncio.run(load(path,clients,requests,repeated))
+            finally:
+                process.terminate()
+                process.wait()
+    return results
+
+
+if __name__ == '__main__':
+    results = run()
+    print('load test of the property server')
+    width = max(len(k) for k in results)
+    print(f'{"":<{width}}  {"requests/s":>10}  {"median":>10}  {"p99":>10}')
+    for k,v in results.items():
+        p99 = f'{v["p99"]*1e3:7.2f} ms' if 'p99' in v else ''
+        print(f'{k:<{width}}  {v["throughput"]:10.0f}  {v["median"]*1e3:7.2f} ms  {p99:>10}')
@@ -0,0 +1,38 @@
+''' Compare the engine 'table' with CP.PropsSI for water on a (P,H) table. '''
+import itertools
+import tempfile
+
+import numpy as np
+
+from harness import measure, report
+from fluids import fluid_factory
+
+
+def run():
+    results = dict()
+    enthalpies = itertools.cycle(np.linspace(2.9e6,3.4e6,997))
+    with tempfile.TemporaryDirectory() as directory:
+        options = dict(inputs=('P','H'),P=(1e5,1e7),H=(1e5,3.5e6),directory=directory)
+        for engine in ['PropsSI','table']:
+            Water = fluid_factory(
+                'Water',
+                engine=engine,
+                engine_options=options if engine == 'table' else dict()
+            )
+            results[f'{engine}: T'] = measure(
+                lambda: Water(P=2e5,H=next(enthalpies)).T
+            )
+            results[f'{engine}: batch T (1000)'] = measure(
+                lambda: Water.batch(P=2e5,H=np.linspace(2.9e6,3.4e6,1000)+next(enthalpies)/1e3).T,
+                number=10
+            )
+        table = Water._generic_function.table
+    report(results,title='engine table for Water on (P,H)')
+    print('maximum relative errors of the table:')
+    for k,v in table.max_rel_error.items():
+        print(f'{k:>8} {v:.2e}')
+    return results
+
+
+if __name__ == '__main__':
+    run()
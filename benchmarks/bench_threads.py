@@ -0,0 +1,58 @@
+''' Threads sharing fluid classes and evaluate_many(...) with a pool of threads.
+
+    With the GIL, the threads run the calls of CoolProp one after the
+    other, so more threads do not reduce the time. On a free-threaded
+    build of Python (e.g. python3.13t with a free-threaded CoolProp),
+    the calls run in parallel.
+'''
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from harness import measure, report
+from fluids import fluid_factory, evaluate_many
+
+
+def gil_enabled():
+    ''' return False on a free-threaded build without GIL '''
+    return getattr(sys,'_is_gil_enabled',lambda: True)()
+
+
+def run(n=100):
+    Air = fluid_factory('Air')
+    T, P = np.meshgrid(np.linspace(200,600,n),np.geomspace(1e4,1e7,n))
+    temperatures = np.linspace(250,350,1000).tolist()
+    results = dict()
+
+    def points(i):
+        # each thread creates its own points of state of the shared class
+        for T_i in temperatures[i::threads]:
+            Air(T=T_i,P=1e5).H
+
+    threads = 1
+    while threads <= max(4,os.cpu_count()):
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results[f'1000 points, H, {threads} threads'] = measure(
+                lambda: list(executor.map(points,range(threads))),
+                number=1,
+                repeat=3
+            )
+        results[f'evaluate_many {n*n} points, {threads} threads'] = measure(
+            lambda: evaluate_many(Air,dict(T=T,P=P),['H','D','S'],workers=threads,pool='thread'),
+            number=1,
+            repeat=3
+        )
+        threads *= 2
+    results[f'evaluate_many {n*n} points, {os.cpu_count()} processes'] = measure(
+        lambda: evaluate_many(Air,dict(T=T,P=P),['H','D','S'],pool='process'),
+        number=1,
+        repeat=3
+    )
+    return results
+
+
+if __name__ == '__main__':
+    print(f'GIL enabled: {gil_enabled()}, {os.cpu_count()} CPUs')
+    report(run(),title='threads sharing the fluid class Air')
@@ -0,0 +1,41 @@
+''' Overhead of the unit layer of fluid_factory(...,with_units=True).
+
+    The naive unit layer converts each input with pint (v.m_as(u)) and
+    parses the unit string of each result (Q_(v,u)). The unit layer of
+    Units uses precompiled conversion factors and parsed units.
+'''
+import numpy as np
+
+from harness import measure, report
+from fluids import fluid_factory, Q_
+
+
+def run():
+    Air = fluid_factory('Air')
+    Air_u = fluid_factory('Air',with_units=True)
+    units = Air_u.acceptable_args
+    T, P = Q_(20.0,'degC'), Q_(1.0,'bar')
+    point = Air(T=293.15,P=1e5)
+    point.H
+    point_u = Air_u(T=T,P=P)
+    point_u.H
+    results = dict()
+    results['naive pint: inputs'] = measure(lambda: (T.m_as(units['T']),P.m_as(units['P'])))
+    results['Units: inputs'] = measure(lambda: Air_u(T=T,P=P))
+    results['without units: inputs'] = measure(lambda: Air(T=293.15,P=1e5))
+    results['naive pint: cached H'] = measure(lambda: Q_(point.H,units['H']))
+    results['Units: cached H'] = measure(lambda: point_u.H)
+    results['Units: subset_m_as'] = measure(
+        lambda: point_u.subset_m_as(t=dict(q='T',u='degC'),h=dict(q='H',u='kJ/kg'))
+    )
+    batch = Air_u.batch(T=Q_(np.linspace(0,40,100000),'degC'),P=P)
+    batch.H
+    results['Units: batch subset_m_as (100000)'] = measure(
+        lambda: batch.subset_m_as(t=dict(q='T',u='degC'),h=dict(q='H',u='kJ/kg')),
+        number=100
+    )
+    return results
+
+
+if __name__ == '__main__':
+    report(run(),title='unit layer of Air with units')
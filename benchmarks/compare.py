@@ -0,0 +1,47 @@
+''' Compare two JSON files of run_all.py, e.g. of two commits.
+
+    python benchmarks/compare.py before.json after.json --threshold 1.2
+
+    For each timing in both files, the ratio after/before of the minimum
+    (or the median with --statistic median) is printed. The minimum is
+    less sensitive to other load on the machine. The exit code is 1 if
+    a ratio exceeds the threshold.
+'''
+import argparse
+import json
+import sys
+
+
+def compare(before,after,statistic='min'):
+    ''' return list of (benchmark, name, time before, time after, ratio) '''
+    rows = []
+    for bench,results in after['results'].items():
+        for name,v in results.items():
+            w = before['results'].get(bench,dict()).get(name)
+            if w is None or statistic not in v or statistic not in w:
+                continue
+            rows.append((bench,name,w[statistic],v[statistic],v[statistic]/w[statistic]))
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold',type=float,default=1.2,help='maximum ratio after/before')
+    parser.add_argument('--statistic',choices=['min','median','max'],default='min')
+    args = parser.parse_args()
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    print(f'before: {before["commit"]}, after: {after["commit"]}')
+    rows = compare(before,after,args.statistic)
+    regressions = 0
+    for bench,name,t_before,t_after,ratio in rows:
+        flag = ''
+        if ratio > args.threshold:
+            flag = '  regression'
+            regressions += 1
+        print(f'{bench:<15} {name:<45} {t_before*1e6:12.2f} µs {t_after*1e6:12.2f} µs {ratio:6.2f}{flag}')
+    sys.exit(1 if regressions else 0)
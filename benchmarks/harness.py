@@ -0,0 +1,38 @@
+''' Small timing helpers shared by the benchmark scripts in this directory.
+
+    Each benchmark script defines a function run() that returns a dict
+    {name: result} with results of measure(...) and can be started with
+
+        python benchmarks/bench_<topic>.py
+'''
+import os
+import sys
+import timeit
+
+# make the package importable without installation
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0,root)
+
+
+def measure(func,number=None,repeat=5):
+    ''' return timing statistics (seconds per call) of func() '''
+    timer = timeit.Timer(func)
+    if number is None:
+        number, _ = timer.autorange()
+    times = sorted(t/number for t in timer.repeat(repeat,number))
+    return dict(
+        min=times[0],
+        median=times[len(times)//2],
+        max=times[-1],
+        number=number,
+        repeat=repeat,
+    )
+
+
+def report(results,title=None):
+    ''' print results of measure(...) as table to stdout '''
+    if title is not None:
+        print(title)
+    width = max(len(k) for k in results)
+    for k,v in results.items():
+        print(f'{k:<{width}}  {v["median"]*1e6:12.2f} µs  (min {v["min"]*1e6:.2f} µs)')
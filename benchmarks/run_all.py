@@ -0,0 +1,82 @@
+''' Run the benchmark scripts and store the results as JSON.
+
+    python benchmarks/run_all.py --output results.json
+    python benchmarks/run_all.py --only hotpaths units --output results.json
+
+    The JSON file contains the commit, the versions of Python, NumPy and
+    CoolProp and for each benchmark {name: statistics of measure(...)}.
+    Numbers that are not timings (e.g. bytes per point of state of
+    bench_memory) are stored as {'value': number}. Two files are compared
+    with benchmarks/compare.py.
+'''
+import argparse
+import datetime
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+
+from harness import root
+
+# benchmarks in the order they are run, bench_parallel, bench_threads
+# and bench_server only with --only
+default_benchmarks = [
+    'hotpaths', 'units', 'engines', 'backends', 'memory', 'psychrometrics', 'tables', 'saturation', 'derivatives', 'charts', 'columns', 'import'
+]
+
+
+def collect(result):
+    ''' return {name: statistics} of the result of run() of a benchmark '''
+    if isinstance(result,tuple):
+        res = dict()
+        for r in result:
+            res.update(collect(r))
+        return res
+    return {k: v if isinstance(v,dict) else {'value': float(v)} for k,v in result.items()}
+
+
+def commit():
+    ''' return the current commit or None '''
+    try:
+        return subprocess.run(
+            ['git','rev-parse','HEAD'],cwd=root,capture_output=True,text=True,check=True
+        ).stdout.strip()
+    except (OSError,subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    import numpy
+    import CoolProp
+    return dict(
+        commit=commit(),
+        date=datetime.datetime.now().isoformat(timespec='seconds'),
+        python=platform.python_version(),
+        platform=platform.platform(),
+        cpu_count=os.cpu_count(),
+        numpy=numpy.__version__,
+        coolprop=CoolProp.__version__,
+    )
+
+
+def run_all(benchmarks=default_benchmarks):
+    results = dict()
+    for name in benchmarks:
+        print(f'bench_{name} ...',file=sys.stderr)
+        results[name] = collect(importlib.import_module(f'bench_{name}').run())
+    return dict(environment(),results=results)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--only',nargs='+',default=default_benchmarks,help='names of the benchmarks, e.g. hotpaths')
+    parser.add_argument('--output',help='JSON file (default: stdout)')
+    args = parser.parse_args()
+    res = json.dumps(run_all(args.only),indent=1)
+    if args.output is None:
+        print(res)
+    else:
+        with open(args.output,'w') as f:
+            f.write(res)
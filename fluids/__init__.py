@@ -1,10 +1,53 @@
 from .fluids import (
     fluid_factory,
-    ureg,
-    Quantity,
-    Q_,
+    PropertyError,
+    get_ureg,
     p_amb,
     T_0,
     ha_subset,
     fluids_subset,
 )
+from .cache import (
+    LRUCache,
+    enable_cache,
+    disable_cache,
+    get_cache,
+    clear_cache,
+)
+from .persistent import PersistentCache, enable_persistent_cache
+from .parallel import evaluate_many
+from .timeseries import IncrementalEvaluator
+from .charts import HXChart, hx_chart, clear_charts
+from .columns import StateTable
+from .instrumentation import (
+    Instrumentation,
+    enable_instrumentation,
+    disable_instrumentation,
+    get_instrumentation,
+)
+import sys as _sys
+# the DataFrame accessor df.fluids (fluids.frames) needs pandas,
+# which is not imported by import fluids
+if 'pandas' in _sys.modules:
+    from . import frames
+
+# ureg, Quantity and Q_ are not created by import fluids, so
+# from fluids import * needs the names of the public attributes
+__all__ = [
+    'fluid_factory', 'PropertyError', 'get_ureg', 'ureg', 'Quantity', 'Q_', 'p_amb', 'T_0',
+    'ha_subset', 'fluids_subset',
+    'LRUCache', 'enable_cache', 'disable_cache', 'get_cache', 'clear_cache',
+    'PersistentCache', 'enable_persistent_cache',
+    'evaluate_many', 'IncrementalEvaluator', 'HXChart', 'hx_chart', 'clear_charts',
+    'StateTable',
+    'Instrumentation', 'enable_instrumentation', 'disable_instrumentation',
+    'get_instrumentation',
+]
+
+
+def __getattr__(name):
+    ''' ureg, Quantity and Q_ are created on first access, see fluids.get_ureg() '''
+    if name in ('ureg','Quantity','Q_'):
+        from . import fluids
+        return getattr(fluids,name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,142 @@
+''' A process-wide LRU memo cache for properties of points of state.
+
+    A point of state caches its properties in the instance only.
+    With the memo cache, two points of state with the same inputs
+    share the results of the _generic_function, e.g.
+
+    from fluids import fluid_factory, enable_cache
+    enable_cache(maxsize=10000)
+    Air = fluid_factory('Air')
+    Air(T=273.15,P=1e5).H # determined by CP.PropsSI
+    Air(T=273.15,P=1e5).H # taken from the memo cache
+'''
+from collections import OrderedDict
+import threading
+
+from .fluids import Point_of_State
+
+
+def normalize(arg_list,digits=None):
+    ''' return hashable tuple of arg_list with floats rounded
+        to digits significant digits (if digits is not None)
+    '''
+    if digits is None:
+        return tuple(arg_list)
+    return tuple(
+        float(f'{v:.{digits}g}') if isinstance(v,float) else v
+        for v in arg_list
+    )
+
+
+class LRUCache():
+    ''' bounded least recently used cache for values of
+        _generic_function(arg,*arg_list) of points of state.
+
+        The key of a value is (namespace, inputs, arg), where namespace
+        is the pair (_generic_function, _fluid) of the class of the point
+        of state and inputs is the tuple of its _arg_list.
+
+        If digits is not None, all float inputs are rounded to digits
+        significant digits before they are used in a key. Points of state
+        with inputs that only differ after these digits share the value
+        determined for the first of these points.
+    '''
+    def __init__(self,maxsize=4096,digits=None):
+        if maxsize <= 0:
+            raise Exception(f'maxsize = {maxsize} must be positive')
+        self.maxsize = maxsize
+        self.digits = digits
+        self._data = OrderedDict()
+        # the cache is shared by threads, the engine is called without the lock
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(maxsize={self.maxsize},digits={self.digits})'
+
+    def key(self,point,arg):
+        ''' return the key of property arg of point '''
+        return (point._memo_namespace(), normalize(point._arg_list,self.digits), arg)
+
+    def lookup(self,point,arg):
+        ''' return value of property arg of point. The value is
+            determined by point._backend(arg) if it is not cached.
+        '''
+        key = self.key(point,arg)
+        data = self._data
+        try:
+            with self._lock:
+                v = data[key]
+                self.hits += 1
+                data.move_to_end(key)
+        except TypeError:
+            # arrays or other unhashable inputs are never cached
+            return point._backend(arg)
+        except KeyError:
+            # exceptions are raised and not cached
+            v = point._backend(arg)
+            with self._lock:
+                self.misses += 1
+                data[key] = v
+                if len(data) > self.maxsize:
+                    data.popitem(last=False)
+                    self.evictions += 1
+        return v
+
+    def clear(self,cls=None):
+        ''' delete all values or, if cls is given, only the
+            values of points of state of the fluid class cls
+        '''
+        with self._lock:
+            if cls is None:
+                self._data.clear()
+                return
+            namespace = cls._memo_namespace()
+            for key in [key for key in self._data if key[0] == namespace]:
+                del self._data[key]
+
+    @property
+    def stats(self):
+        ''' return dict of statistics of the cache '''
+        calls = self.hits + self.misses
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            hit_ratio=self.hits/calls if calls else 0.0,
+            currsize=len(self._data),
+            maxsize=self.maxsize,
+        )
+
+    def reset_stats(self):
+        self.hits = self.misses = self.evictions = 0
+
+
+def enable_cache(maxsize=4096,digits=None,cls=Point_of_State):
+    ''' enable a new LRUCache for all points of state of cls and
+        its subclasses (default: all points of state) and return it.
+    '''
+    cls._memo = LRUCache(maxsize=maxsize,digits=digits)
+    return cls._memo
+
+
+def disable_cache(cls=Point_of_State):
+    ''' disable the LRUCache of cls '''
+    cls._memo = None
+
+
+def get_cache(cls=Point_of_State):
+    ''' return the LRUCache used by cls or None '''
+    return cls._memo
+
+
+def clear_cache(cls=None):
+    ''' clear the values of all fluids or of fluid class cls
+        in the LRUCache used by cls (or by all points of state)
+    '''
+    memo = Point_of_State._memo if cls is None else cls._memo
+    if memo is not None:
+        memo.clear(cls)
@@ -0,0 +1,205 @@
+''' Data of h-x (Mollier) and psychrometric charts of humid air.
+
+    hx_chart(...) determines the isolines of constant R, T, H, Vda and B
+    of humid air at pressure P in a range of T and W. All points of
+    state of a kind of isolines are one batch of points of state, so a
+    chart takes one vectorized call of the engine per kind of isolines
+    and property instead of one point of state per point of the chart.
+    Charts are cached by their arguments, so repeated rendering of a
+    report takes no calls of the engine.
+
+    chart = hx_chart(P=1e5,T=(263.15,313.15),W=(0,0.02))
+    for R,line in chart.lines['R'].items():
+        plt.plot(*chart.coordinates(line)) # Mollier: x = W, y = H - r_0*W
+
+    HA = fluid_factory('HumidAir',P_default=1e5)
+    p_0, p_1 = HA(T=T_0+30,R=0.4), HA(T=T_0+10,R=0.8)
+    plt.plot(*chart.coordinates(chart.point(p_0)),'o')
+    plt.plot(*chart.coordinates(chart.mix_line(p_0,p_1)))
+'''
+from functools import lru_cache
+
+import numpy as np
+
+from .fluids import fluid_factory, p_amb, T_0, _is_quantity
+
+
+# enthalpy of evaporation of water at 0 °C, the ordinate of the Mollier
+# chart is H - r_0*W, so isotherms are almost horizontal
+r_0 = 2501e3
+
+# kinds of isolines and the distance of their default values
+isoline_steps = dict(R=0.1, T=5.0, H=1e4, Vda=0.02, B=5.0)
+
+# the properties of each point of an isoline
+line_properties = ('T','W','H')
+
+
+def _magnitude(v,unit):
+    return v.m_as(unit) if _is_quantity(v) else v
+
+
+def _steps(lo,hi,step,offset=0.0):
+    ''' return tuple of the multiples of step (plus offset) in [lo,hi] '''
+    k = np.arange(np.ceil((lo-offset)/step),np.floor((hi-offset)/step)+1)
+    return tuple(float(round(v,10)) for v in offset + k*step)
+
+
+class HXChart():
+    ''' isolines of humid air at pressure P for T in [T[0],T[1]] (K) and
+        W in [W[0],W[1]] with n points per isoline.
+
+        The values of the isolines are tuples, e.g. R=(0.2,0.4,...) or None
+        for the defaults: multiples of isoline_steps in the range of the
+        chart, R from 0.1 to 1. lines is a dict {kind: {value: line}},
+        each line is a dict of arrays of T, W and H. Points outside of the
+        range of the chart (or of the domain of the engine) are nan,
+        isolines with less than two points in the chart are not in lines.
+        The arrays are read only, because charts are shared.
+    '''
+    def __init__(self,P=p_amb,T=(T_0-20,T_0+50),W=(0.0,0.025),n=101,engine='PropsSI',
+                 R=None,T_lines=None,H=None,Vda=None,B=None):
+        self.P, self.T, self.W, self.n = P, tuple(T), tuple(W), n
+        self.HA = fluid_factory('HumidAir',P_default=P,engine=engine)
+        corners = self.HA.batch(T=np.array(self.T)[:,None],W=np.array(self.W)[None,:])
+        H_range = (float(np.nanmin(corners.H)),float(np.nanmax(corners.H)))
+        V_range = (float(np.nanmin(corners.Vda)),float(np.nanmax(corners.Vda)))
+        self.values = dict(
+            R=_steps(0.1,1.0,isoline_steps['R']) if R is None else tuple(R),
+            T=_steps(*self.T,isoline_steps['T'],T_0) if T_lines is None else tuple(T_lines),
+            H=_steps(*H_range,isoline_steps['H']) if H is None else tuple(H),
+            Vda=_steps(*V_range,isoline_steps['Vda']) if Vda is None else tuple(Vda),
+            # B <= T, isolines of B without points in the chart are dropped
+            B=_steps(*self.T,isoline_steps['B'],T_0) if B is None else tuple(B),
+        )
+        self.lines = {k: self._isolines(k,np.array(v,dtype=float)) for k,v in self.values.items()}
+
+    def __repr__(self):
+        counts = ', '.join(f'{k}: {len(v)}' for k,v in self.lines.items())
+        return f'{self.__class__.__name__}(P={self.P}, T={self.T}, W={self.W}, {counts})'
+
+    def _W_at(self,q,values,**kwargs):
+        ''' return array of W of the points of state q=values and kwargs '''
+        return self.HA.batch(**{q: values},**kwargs).W
+
+    def _isolines(self,q,values):
+        ''' return {value: line} of the isolines q = values '''
+        if not len(values):
+            return dict()
+        T_lo, T_hi = self.T
+        W_lo, W_hi = self.W
+        if q == 'R':
+            # along T up to T_hi or to W_hi
+            along = 'T'
+            lo = np.full(len(values),T_lo)
+            hi = np.fmin(T_hi,self.HA.batch(R=values,W=W_hi).T)
+        elif q == 'T':
+            # along W up to the saturation
+            along = 'W'
+            lo = np.full(len(values),W_lo)
+            hi = np.fmin(W_hi,self._W_at(q,values,R=1.0))
+        elif q == 'B':
+            # along W up to the saturation at T = B, see _wet_bulb_lines(...)
+            along = 'W'
+            lo = np.full(len(values),W_lo)
+            hi = np.fmin(W_hi,self._W_at('T',values,R=1.0))
+        else:
+            # along W, T decreases from T_hi to T_lo or the saturation
+            along = 'W'
+            lo = np.fmax(W_lo,self._W_at(q,values,T=T_hi))
+            hi = np.fmin(np.fmin(W_hi,self._W_at(q,values,R=1.0)),self._W_at(q,values,T=T_lo))
+        # isolines outside of the chart are not passed to the engine,
+        # CP.HAPropsSI fails for the whole array with nan inputs
+        valid = lo <= hi
+        s = np.linspace(0,1,self.n)
+        x = lo[valid,None] + (hi-lo)[valid,None]*s[None,:]
+        arrays = {along: x}
+        if not valid.any():
+            return dict()
+        if q == 'B':
+            arrays['H'] = self._wet_bulb_lines(values[valid],x)
+            arrays['T'] = self.HA.batch(H=arrays['H'],W=x).T
+        else:
+            batch = self.HA.batch(**{q: values[valid,None], along: x})
+            arrays.update({k: getattr(batch,k) for k in line_properties if k != along})
+        # rounding errors at the ends of the isolines
+        outside = (arrays['T'] < T_lo*(1-1e-9)) | (arrays['T'] > T_hi*(1+1e-9))
+        outside |= (arrays['W'] < W_lo-1e-12) | (arrays['W'] > W_hi+1e-12)
+        lines = dict()
+        for i,v in enumerate(values[valid].tolist()):
+            if np.count_nonzero(~outside[i]) < 2:
+                continue
+            line = dict()
+            for k in line_properties:
+                a = np.where(outside[i],np.nan,arrays[k][i])
+                a.setflags(write=False)
+                line[k] = a
+            lines[v] = line
+        return lines
+
+    def _wet_bulb_lines(self,B,W):
+        ''' return the array of H of the points of state with wet bulb
+            temperatures B (one per row) and humidity ratios W.
+
+            By the definition of the wet bulb temperature (adiabatic
+            saturation), H = H_s + (W - W_s)*h_w with the saturated air
+            (W_s, H_s) at T = B and the enthalpy h_w of liquid water (or
+            ice) at B, so an isoline of B is a straight line in (W, H).
+            h_w is the slope to a second point of state at T = B + 0.5 K.
+            The iterative solution of B is needed for this point only.
+            At B = 273.15 K, h_w of water and ice differ, the isoline
+            is the one of liquid water.
+        '''
+        saturated = self.HA.batch(T=B,R=1.0)
+        W_s, H_s = saturated.W, saturated.H
+        second = self.HA.batch(B=B,T=B+0.5)
+        h_w = (second.H-H_s)/(second.W-W_s)
+        return H_s[:,None] + (W-W_s[:,None])*h_w[:,None]
+
+    def _check_pressure(self,P):
+        if not np.allclose(P,self.P,rtol=1e-9):
+            raise Exception(f'the pressure {P} Pa is not the pressure {self.P} Pa of the chart')
+
+    def point(self,p):
+        ''' return dict of T, W and H of the point of state (or batch) p of
+            humid air with the pressure of the chart
+        '''
+        units = type(p).acceptable_args
+        self._check_pressure(_magnitude(p.P,units['P']))
+        return {k: np.asarray(_magnitude(getattr(p,k),units[k]),dtype=float) for k in line_properties}
+
+    def mix_line(self,p_0,p_1,n=51):
+        ''' return dict of arrays of T, W and H of n points of the mixtures
+            p_0.mix(p_1,other_part) with other_part from 0 to 1
+        '''
+        return self.point(p_0.mix(p_1,np.linspace(0,1,n)))
+
+    def coordinates(self,line,chart='mollier'):
+        ''' return (x, y) of the line (or point) in a Mollier chart
+            (x = W, y = H - r_0*W) or in a psychrometric chart (x = T, y = W)
+        '''
+        if chart == 'mollier':
+            return line['W'], line['H'] - r_0*line['W']
+        if chart == 'psychrometric':
+            return line['T'], line['W']
+        raise Exception(f'chart must be "mollier" or "psychrometric", not {chart!r}')
+
+
+@lru_cache(maxsize=32)
+def _chart(*args):
+    return HXChart(*args)
+
+
+def hx_chart(P=p_amb,T=(T_0-20,T_0+50),W=(0.0,0.025),n=101,engine='PropsSI',
+             R=None,T_lines=None,H=None,Vda=None,B=None):
+    ''' return the (cached) HXChart with these arguments, see HXChart '''
+    freeze = lambda v: None if v is None else tuple(float(x) for x in v)
+    return _chart(
+        float(P),freeze(T),freeze(W),int(n),engine,
+        freeze(R),freeze(T_lines),freeze(H),freeze(Vda),freeze(B)
+    )
+
+
+def clear_charts():
+    ''' forget all cached charts '''
+    _chart.cache_clear()
@@ -0,0 +1,286 @@
+''' Columnar tables of points of state.
+
+    A StateTable keeps the values of many points of state as one
+    contiguous float64 array per property (column) with the units of
+    acceptable_args of the fluid class, instead of one dict (and one
+    Quantity per value) per point of state like args, subset(...) or
+    subset_to(...):
+
+    Air = fluid_factory('Air')
+    table = StateTable.evaluate(Air,dict(T=np.linspace(250,350,10**6),P=1e5),['H','D'])
+    table['H']                  # numpy array of 10**6 enthalpies
+    table.save('states')        # directory of .npy files
+    table = StateTable.load('states')
+    table.point(17).H           # point of state of row 17, no call of the engine
+    table.batch(slice(0,1000))  # batch of the first 1000 rows
+
+    Directories of .npy files are loaded with numpy.load(...,mmap_mode='r'),
+    so the columns are read lazily from the files and tables larger than
+    the memory can be opened. Files with the extension .arrow (Arrow IPC,
+    memory mapped without copies) or .parquet need pyarrow.
+'''
+import json
+import math
+import os
+
+import numpy as np
+
+from .fluids import fluid_factory, get_ureg, Units, _is_quantity
+
+
+# file of the metadata in a directory of .npy files
+meta_file = 'table.json'
+
+
+def _arrow_format(path):
+    ''' return 'arrow', 'parquet' or None (directory of .npy files) '''
+    extension = os.path.splitext(str(path))[1]
+    if extension in ('.arrow','.feather'):
+        return 'arrow'
+    if extension in ('.parquet','.pq'):
+        return 'parquet'
+    return None
+
+
+class StateTable():
+    ''' table of points of state of FluidClass. columns is a dict
+        {property: one dimensional array} of magnitudes in the units of
+        FluidClass.acceptable_args, inputs are the names of the columns
+        that define the points of state, e.g. ('T','P'). errors is a dict
+        {property: {row: errormessage}} of the values that are nan.
+
+        Arrays of float64 (including memory maps) are not copied. Columns
+        of properties that are not registered in FluidClass are kept, but
+        they are not values of the points of state of point(...) and batch(...).
+    '''
+    def __init__(self,FluidClass,columns,inputs,errors=None):
+        self.FluidClass = FluidClass
+        self.columns = {q: np.asarray(v,dtype=float) for q,v in columns.items()}
+        self.inputs = tuple(inputs)
+        self.errors = {q: dict() for q in self.columns} if errors is None else errors
+        for k in self.inputs:
+            if k not in self.columns:
+                raise Exception(f'the input {k} is not a column of the table')
+            if k not in FluidClass.acceptable_args:
+                raise Exception(f'{k} is not in acceptable_args of {FluidClass.__name__}')
+        lengths = {v.shape for v in self.columns.values()}
+        if len(lengths) > 1 or any(len(shape) != 1 for shape in lengths):
+            raise Exception(f'the columns must be one dimensional arrays of the same length, not {lengths}')
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.FluidClass.__name__}, rows={len(self)}, columns={list(self.columns)})'
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self,q):
+        ''' return the column of property q '''
+        return self.columns[q]
+
+    @property
+    def units(self):
+        ''' dict {property: unit} of the columns '''
+        acceptable_args = self.FluidClass.acceptable_args
+        return {q: str(acceptable_args.get(q,'')) for q in self.columns}
+
+    def quantity(self,q):
+        ''' return the column of property q as Quantity '''
+        return get_ureg().Quantity(self.columns[q],self.units[q])
+
+    @classmethod
+    def evaluate(cls,FluidClass,inputs,outputs=None,path=None,chunksize=1_000_000,**kwargs):
+        ''' return the table of the points of state defined by inputs (a
+            dict of arrays or values that can be broadcast against each
+            other, Quantities for classes with units) with columns of the
+            inputs and the outputs (default: all properties).
+
+            The rows are evaluated with evaluate_many(...,**kwargs) in
+            chunks of chunksize rows. With path (a directory), the
+            columns are written to .npy files while they are evaluated,
+            so the table does not need to fit into the memory. The table
+            is returned with the columns loaded from these files.
+        '''
+        from .parallel import evaluate_many
+        acceptable_args = FluidClass.acceptable_args
+        outputs = list(acceptable_args) if outputs is None else list(outputs)
+        magnitudes = [
+            np.asarray(v.m_as(acceptable_args[k]) if _is_quantity(v) else v,dtype=float)
+            for k,v in inputs.items()
+        ]
+        shape = np.broadcast_shapes(*(m.shape for m in magnitudes))
+        n = int(np.prod(shape))
+        flat = {k: np.broadcast_to(m,shape).reshape(-1) for k,m in zip(inputs,magnitudes)}
+        names = list(flat) + [q for q in outputs if q not in flat]
+
+        if path is None:
+            columns = {q: np.empty(n) for q in names}
+        else:
+            os.makedirs(path,exist_ok=True)
+            columns = {
+                q: np.lib.format.open_memmap(os.path.join(path,f'{q}.npy'),'w+',float,(n,))
+                for q in names
+            }
+        errors = {q: dict() for q in names}
+        for start in range(0,n,chunksize):
+            chunk = {k: v[start:start+chunksize] for k,v in flat.items()}
+            for k,v in chunk.items():
+                columns[k][start:start+len(v)] = v
+            evaluation = evaluate_many(FluidClass,chunk,outputs,**kwargs)
+            for q in outputs:
+                v = evaluation.values[q]
+                columns[q][start:start+len(v)] = v.magnitude if _is_quantity(v) else v
+                errors[q].update({start+i: e for i,e in evaluation.errors[q].items()})
+        table = cls(FluidClass,columns,tuple(flat),errors)
+        if path is None:
+            return table
+        for v in columns.values():
+            v.flush()
+        table._write_meta(path)
+        return cls.load(path,FluidClass)
+
+    @property
+    def meta(self):
+        ''' all data of the table except the columns, see load(...) '''
+        fluid, factory_kwargs = self.FluidClass._factory_args
+        meta = dict(
+            fluid=fluid,
+            factory_kwargs=factory_kwargs,
+            with_units=issubclass(self.FluidClass,Units),
+            inputs=list(self.inputs),
+            units=self.units,
+            rows=len(self),
+            errors={q: {str(i): e for i,e in errors.items()} for q,errors in self.errors.items() if errors},
+        )
+        try:
+            json.dumps(meta)
+        except TypeError as e:
+            raise Exception(f'the arguments of fluid_factory(...) of {self.FluidClass.__name__} can not be stored: {e}')
+        return meta
+
+    def _write_meta(self,path):
+        with open(os.path.join(path,meta_file),'w',encoding='utf-8') as f:
+            json.dump(self.meta,f,indent=1)
+
+    def save(self,path):
+        ''' save the table to the directory path (one .npy file per
+            column and table.json) or, with the extension .arrow or
+            .parquet, to one file with pyarrow
+        '''
+        kind = _arrow_format(path)
+        if kind is not None:
+            return self._save_arrow(path,kind)
+        meta = self.meta
+        os.makedirs(path,exist_ok=True)
+        for q,v in self.columns.items():
+            np.save(os.path.join(path,f'{q}.npy'),v)
+        # table.json is written last, load(...) never sees an incomplete table
+        with open(os.path.join(path,meta_file),'w',encoding='utf-8') as f:
+            json.dump(meta,f,indent=1)
+
+    def _save_arrow(self,path,kind):
+        import pyarrow as pa
+        table = pa.table(
+            {q: pa.array(v) for q,v in self.columns.items()},
+            metadata={b'fluids': json.dumps(self.meta).encode()},
+        )
+        if kind == 'parquet':
+            import pyarrow.parquet as pq
+            pq.write_table(table,path)
+        else:
+            with pa.OSFile(str(path),'wb') as sink, pa.ipc.new_file(sink,table.schema) as writer:
+                writer.write_table(table)
+
+    @classmethod
+    def load(cls,path,FluidClass=None):
+        ''' load the table saved by save(path). The columns of directories
+            and of .arrow files are memory mapped (read only), the columns
+            of .parquet files are read into memory.
+
+            The fluid class is created with fluid_factory(...) from the
+            arguments that were used to create the class of the saved
+            table, unless FluidClass is given.
+        '''
+        kind = _arrow_format(path)
+        if kind is None:
+            file = os.path.join(path,meta_file)
+            if not os.path.exists(file):
+                raise Exception(f'{path} is not a directory of a StateTable')
+            with open(file,encoding='utf-8') as f:
+                meta = json.load(f)
+            columns = {q: np.load(os.path.join(path,f'{q}.npy'),mmap_mode='r') for q in meta['units']}
+        else:
+            meta, columns = cls._load_arrow(path,kind)
+        if FluidClass is None:
+            FluidClass = fluid_factory(meta['fluid'],with_units=meta['with_units'],**meta['factory_kwargs'])
+        for q,u in meta['units'].items():
+            if q in FluidClass.acceptable_args and str(FluidClass.acceptable_args[q]) != u:
+                raise Exception(f'the unit {u} of column {q} is not the unit of {q} of {FluidClass.__name__}')
+        errors = {q: {int(i): e for i,e in meta['errors'].get(q,dict()).items()} for q in columns}
+        return cls(FluidClass,columns,meta['inputs'],errors)
+
+    @staticmethod
+    def _load_arrow(path,kind):
+        ''' return (meta, columns) of an .arrow or .parquet file '''
+        import pyarrow as pa
+        if kind == 'parquet':
+            import pyarrow.parquet as pq
+            table = pq.read_table(path,memory_map=True)
+        else:
+            table = pa.ipc.open_file(pa.memory_map(str(path),'r')).read_all()
+        meta = json.loads(table.schema.metadata[b'fluids'])
+        columns = dict()
+        for q in meta['units']:
+            chunks = table.column(q).chunks
+            # a single chunk without nulls is a view of the memory map
+            columns[q] = (
+                chunks[0].to_numpy(zero_copy_only=False) if len(chunks) == 1
+                else np.concatenate([c.to_numpy(zero_copy_only=False) for c in chunks])
+            )
+        return meta, columns
+
+    def _row(self,i):
+        ''' return (inputs, values) of row i for the fluid class '''
+        acceptable_args = self.FluidClass.acceptable_args
+        constants = self.FluidClass._constant_args
+        inputs = {k: float(self.columns[k][i]) for k in self.inputs}
+        values = dict()
+        for q,v in self.columns.items():
+            if q in acceptable_args and q not in inputs and q not in constants:
+                v = float(v[i])
+                if not math.isnan(v):
+                    values[q] = v
+        return inputs, values
+
+    def point(self,i,name=None):
+        ''' return the point of state of row i. The values of all columns
+            are cached in the point of state, other properties are
+            determined by the engine on first access.
+        '''
+        inputs, values = self._row(i)
+        if issubclass(self.FluidClass,Units):
+            Q_ = get_ureg().Quantity
+            inputs = {k: Q_(v,self.FluidClass._units[k]) for k,v in inputs.items()}
+        p = self.FluidClass(name=name,**inputs)
+        for q,v in values.items():
+            p._set(q,v)
+        return p
+
+    def points(self,rows=slice(None)):
+        ''' yield the points of state of rows (a slice), see point(...) '''
+        for i in range(len(self))[rows]:
+            yield self.point(i)
+
+    def batch(self,rows=slice(None),name=None):
+        ''' return the batch of points of state of rows (a slice or an
+            array of indices) with the columns as values (nan is nan)
+        '''
+        acceptable_args = self.FluidClass.acceptable_args
+        inputs = {k: self.columns[k][rows] for k in self.inputs}
+        if issubclass(self.FluidClass,Units):
+            Q_ = get_ureg().Quantity
+            inputs = {k: Q_(v,self.FluidClass._units[k]) for k,v in inputs.items()}
+        batch = self.FluidClass.batch(name=name,**inputs)
+        for q,v in self.columns.items():
+            if q in acceptable_args and q not in self.inputs and q not in self.FluidClass._constant_args:
+                batch._set(q,np.asarray(v[rows]))
+        return batch
@@ -0,0 +1,240 @@
+''' Engines are alternatives to CP.PropsSI as _generic_function of a Fluid.
+
+    An engine is a callable with the same signature as CP.PropsSI:
+
+        engine(output, name1, value1, name2, value2, fluid)
+
+    so it can replace CP.PropsSI in every class created by
+    fluid_factory(...) without changing Point_of_State.
+'''
+from functools import lru_cache
+import math
+import re
+import threading
+
+import CoolProp.CoolProp as CP
+import numpy as np
+
+
+@lru_cache(maxsize=None)
+def parameter_index(name):
+    ''' return the CoolProp parameter index of name, e.g. 'H' -> CP.iHmass.
+        CP.get_parameter_index parses the string on each call,
+        so the result is cached.
+    '''
+    return CP.get_parameter_index(name)
+
+
+_derivative_pattern = re.compile(r'd\((\w+)\)/d\((\w+)\)\|(\w+)$')
+
+
+@lru_cache(maxsize=None)
+def derivative_indices(name):
+    ''' return the parameter indices (of, wrt, constant) of the name of
+        a partial derivative in CP.PropsSI, e.g. 'd(H)/d(T)|P', or None
+    '''
+    match = _derivative_pattern.match(name)
+    if match is None:
+        return None
+    return tuple(parameter_index(q) for q in match.groups())
+
+
+def keyed_output(state,name):
+    ''' return output name (a property or a partial derivative like
+        'd(H)/d(T)|P') of the AbstractState state
+    '''
+    indices = derivative_indices(name)
+    if indices is None:
+        return state.keyed_output(parameter_index(name))
+    return state.first_partial_deriv(*indices)
+
+
+def split_fluid(fluid,backend='HEOS'):
+    ''' split a fluid string like 'IF97::Water' into ('IF97','Water').
+        If fluid contains no backend, backend is used.
+    '''
+    if '::' in fluid:
+        backend, fluid = fluid.split('::',1)
+    return backend, fluid
+
+
+# backends of CoolProp that interpolate in tables of another backend.
+# They are only available in the low level interface (AbstractState)
+tabular_backends = ('BICUBIC','TTSE')
+
+
+def coolprop_fluid(fluid,backend=None):
+    ''' return the fluid string of fluid with backend for CoolProp,
+        e.g. ('Water','IF97') -> 'IF97::Water' and ('Water','BICUBIC')
+        -> 'BICUBIC&HEOS::Water'. Without backend, fluid is returned.
+    '''
+    if backend is None:
+        return fluid
+    if '::' in fluid:
+        raise Exception(f'fluid {fluid} already defines a backend, backend {backend} is not possible')
+    if backend in tabular_backends:
+        backend = f'{backend}&HEOS'
+    return f'{backend}::{fluid}'
+
+
+def is_tabular(fluid):
+    ''' return True if the backend of fluid is a tabular backend '''
+    return '&' in split_fluid(fluid)[0]
+
+
+def eos_fluid(fluid):
+    ''' return the fluid string of CP.PropsSI for the equation of state
+        of fluid. Tabular backends like 'BICUBIC&HEOS::Water' use the
+        backend of their tables (here: 'HEOS::Water').
+    '''
+    if not is_tabular(fluid):
+        return fluid
+    backend, name = split_fluid(fluid)
+    return f'{backend.rpartition("&")[2]}::{name}'
+
+
+class AbstractStateFunction():
+    ''' AbstractStateFunction uses one CP.AbstractState for all points
+        of state of a fluid.
+
+        The state is flashed (AbstractState.update) only if the inputs
+        differ from the inputs of the last call. Therefore all properties
+        of a point of state, e.g. point.args, are read from one flash
+        instead of one CP.PropsSI call (and one flash) for each property.
+
+        Air = fluid_factory('Air',engine='AbstractState')
+
+        Each thread has its own AbstractState, so threads never read
+        the flash of another thread.
+    '''
+    def __init__(self,fluid,backend='HEOS'):
+        self.backend, self.fluid = split_fluid(fluid,backend)
+        self._local = threading.local()
+        # raises for unknown fluids
+        self.state
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.fluid!r},backend={self.backend!r})'
+
+    @property
+    def state(self):
+        ''' the AbstractState of this thread '''
+        local = self._local
+        try:
+            return local.state
+        except AttributeError:
+            local.state = CP.AbstractState(self.backend,self.fluid)
+            # inputs (name1,value1,name2,value2) of the last successful update
+            local.inputs = None
+            return local.state
+
+    @state.setter
+    def state(self,state):
+        ''' replace the AbstractState of this thread '''
+        self._local.state = state
+        self._local.inputs = None
+
+    def update(self,name1,value1,name2,value2):
+        ''' flash self.state to the given inputs, if this is not
+            the state of the last update in this thread
+        '''
+        state = self.state
+        local = self._local
+        inputs = (name1,value1,name2,value2)
+        if inputs != local.inputs:
+            # a failed update must not be taken as the current state
+            local.inputs = None
+            pair, v1, v2 = CP.generate_update_pair(
+                parameter_index(name1),value1,parameter_index(name2),value2
+            )
+            state.update(pair,v1,v2)
+            local.inputs = inputs
+        return state
+
+    def outputs(self,outputs,name1,value1,name2,value2,fluid=None):
+        ''' return list of values of outputs after one update
+            of self.state. Outputs that are not defined for the
+            state are inf.
+        '''
+        state = self.update(name1,value1,name2,value2)
+        res = []
+        for o in outputs:
+            try:
+                res.append(keyed_output(state,o))
+            except ValueError:
+                res.append(math.inf)
+        return res
+
+    def __call__(self,output,name1,value1,name2,value2,fluid=None):
+        if np.ndim(value1) or np.ndim(value2):
+            # like CP.PropsSI, return inf for states that can not be determined
+            value1, value2 = np.broadcast_arrays(value1,value2)
+            res = np.full(value1.shape,np.inf)
+            for i,(v1,v2) in enumerate(zip(value1,value2)):
+                try:
+                    res[i] = self(output,name1,v1,name2,v2)
+                except ValueError:
+                    pass
+            return res
+        return keyed_output(self.update(name1,value1,name2,value2),output)
+
+
+def bulk_function(engine,fluid):
+    ''' return function(outputs,name1,value1,name2,value2,fluid) that
+        determines all outputs of a state with one call of engine or None,
+        if engine has no such function. Outputs that are not defined for
+        the state are inf, a ValueError is raised if no output is defined
+        (e.g. if the inputs do not define a state).
+    '''
+    if isinstance(engine,AbstractStateFunction):
+        return engine.outputs
+    if engine is not CP.PropsSI:
+        return None
+    backend, name = split_fluid(fluid)
+    if '&' in name or '[' in name:
+        # mixtures need mole fractions
+        return None
+    def bulk(outputs,name1,value1,name2,value2,*args):
+        res = CP.PropsSImulti(outputs,name1,[value1],name2,[value2],backend,[name],[1.0])
+        if res:
+            return res[0]
+        # no output is defined, use CP.PropsSI for the errormessage
+        values, message = [], None
+        for o in outputs:
+            try:
+                values.append(CP.PropsSI(o,name1,value1,name2,value2,fluid))
+            except ValueError as e:
+                values.append(math.inf)
+                message = message or str(e)
+        if all(math.isinf(v) for v in values):
+            raise ValueError(message)
+        return values
+    return bulk
+
+
+def make_engine(engine,fluid,**options):
+    ''' return the _generic_function for fluid_factory(fluid,engine=engine).
+        engine 'PropsSI' is the default and returns CP.PropsSI (or
+        CP.HAPropsSI for humid air). Humid air has the engine 'ideal',
+        see psychrometrics.py. options are passed to the engine, e.g. the
+        domain of the table for the engine 'table'.
+    '''
+    if engine == 'PropsSI':
+        if fluid == 'HumidAir':
+            return CP.HAPropsSI
+        # CP.PropsSI can not use tabular backends
+        return AbstractStateFunction(fluid) if is_tabular(fluid) else CP.PropsSI
+    if fluid == 'HumidAir':
+        if engine == 'ideal':
+            from .psychrometrics import ideal_HAPropsSI
+            return ideal_HAPropsSI
+        raise Exception(f'unknown engine {engine} for fluid {fluid}')
+    if engine == 'AbstractState':
+        return AbstractStateFunction(fluid,**options)
+    if engine == 'table':
+        if is_tabular(fluid):
+            raise Exception(f'the engine table needs a backend of CP.PropsSI, not {fluid}')
+        # avoid a circular import, tables uses AbstractStateFunction
+        from .tables import TableFunction
+        return TableFunction(fluid,**options)
+    raise Exception(f'unknown engine {engine} for fluid {fluid}')
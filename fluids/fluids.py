@@ -1,22 +1,63 @@
 from abc import ABC, abstractmethod # abstractstaticmethod
+from array import array
+from functools import lru_cache
+import math
+import threading
 
-import CoolProp.CoolProp as CP
+import numpy as np
 
 
-# for working with physical units
-from pint import UnitRegistry
-ureg = UnitRegistry()
+# pint and CoolProp are imported on first use, so that importing
+# fluids is fast (e.g. for short-lived scripts and worker processes).
+# ureg, Quantity and Q_ are created by get_ureg() on first access
+# of one of these module attributes, see __getattr__ below.
+_ureg = None
 
-# set default printing format
-#ureg.default_format = "~P"
-ureg.formatter.default_format = "~P"
+def get_ureg():
+    ''' return the UnitRegistry of fluids and create it on first use '''
+    global _ureg, ureg, Quantity, Q_
+    if _ureg is None:
+        # for working with physical units
+        from pint import UnitRegistry
+        registry = UnitRegistry()
 
-# percent and part per Million (ppM) are frequently used in HVAC
-ureg.define('percent=1e-2=%')
-ureg.define('ppM=1e-6')
+        # set default printing format
+        #registry.default_format = "~P"
+        registry.formatter.default_format = "~P"
+
+        # percent and part per Million (ppM) are frequently used in HVAC
+        registry.define('percent=1e-2=%')
+        registry.define('ppM=1e-6')
+
+        # Q_ is a shortcut for Quantity
+        Quantity = Q_ = registry.Quantity
+
+        # make base_value (and bv) properties of Q_
+        Q_.base_value = Q_.bv = property(base_value)
+        ureg = _ureg = registry
+    return _ureg
+
+
+def __getattr__(name):
+    ''' create ureg, Quantity and Q_ on first access (PEP 562) '''
+    if name in ('ureg','Quantity','Q_'):
+        get_ureg()
+        return globals()[name]
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def _is_quantity(v):
+    ''' return True if v is a Quantity. There are no
+        Quantities as long as there is no UnitRegistry.
+    '''
+    return _ureg is not None and isinstance(v,_ureg.Quantity)
+
+
+def _coolprop():
+    ''' return the module CoolProp.CoolProp and import it on first use '''
+    import CoolProp.CoolProp as CP
+    return CP
 
-# Q_ is a shortcut for Quantity
-Quantity = Q_ = ureg.Quantity
 
 # make it easy to return the value
 # of a quantity q in base_units of q
@@ -24,13 +65,43 @@ def base_value(q):
     ''' return value of Quantity q in base units'''
     return q.to_base_units().magnitude
 
-# make base_value (and bv) properties of Q_
-Q_.base_value = Q_.bv = property(base_value)
 
 
+class PropertyError(ValueError):
+    ''' a property arg that can not be determined for a point of state.
+        code is one of
+          - 'state': none of the requested properties can be determined,
+            e.g. if the inputs do not define a state
+          - 'undefined': arg is not defined for this state
+          - 'error': any other exception of the engine
+        PropertyErrors are returned by Point_of_State.outputs(...), not raised.
+    '''
+    def __init__(self,arg,code,message):
+        super().__init__(message)
+        self.arg = arg
+        self.code = code
+        self.message = message
+    
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.arg!r},{self.code!r},{self.message!r})'
+
 
 T_0 = 273.15 # K, 0°C
 p_amb = 101325 # Pa, normal pressure (Normaldruck)
+
+# shared tuples of the names of the inputs of points of state
+_input_names = dict()
+# classes created by fluid_factory(...) by their arguments
+_fluid_classes = dict()
+# _zeros*n is an exactly allocated array of n floats
+_zeros = array('d',[0.0])
+
+# points of state and fluid classes are shared by threads. _cache_lock
+# serializes the values cached in points of state after their creation
+# (self._values may be replaced by a larger array), _class_lock the
+# changes of classes (register, unregister) and fluid_factory(...)
+_cache_lock = threading.Lock()
+_class_lock = threading.RLock()
     
 
 class Point_of_State(ABC):
@@ -44,14 +115,79 @@ class Point_of_State(ABC):
         of the corresponding fluid. These properties are determined 
         using CoolProp.    
     '''
+    # points of state are kept in large numbers, so they have no __dict__.
+    # Inputs and cached values of registered properties are floats in
+    # self._values at the position of the property in cls._index,
+    # bit i of self._valid is set if self._values[i] is a value.
+    # Other values (e.g. arrays of batches) are kept in self._extra.
+    __slots__ = ('name','_inputs','_values','_valid','_extra')
+    
+    # position of each registered property in self._values, see register(...)
+    _index = dict()
+    _size = 0
+    
     def __init__(self, **kwargs):
+        # space for the inputs, self._values grows with the first
+        # value of a property at a higher position
+        index = self._index
+        size = max([index.get(k,-1) for k in kwargs],default=-1) + 1
+        self._values = _zeros*size
+        self._valid = 0
+        self._extra = None
+        # the names of the inputs are shared by all points of state
+        # with the same inputs
+        names = tuple(kwargs)
+        self._inputs = _input_names.setdefault(names,names)
+        
         # init given values as internal variables
         for k,v in kwargs.items():
-            setattr(self, f'_{k}',v)
-        
-        # self._arg_list is used to determine other values
-        # with the help of the CoolProp package
-        self._arg_list = [v for t in kwargs.items() for v in t]
+            self._set(k,v)
+        if self._validation == 'strict':
+            error = self._domain_error()
+            if error is not None:
+                raise PropertyError(*error)
+    
+    def _set(self,k,v):
+        ''' store value v of input or property k '''
+        i = self._index.get(k)
+        if i is not None:
+            values = self._values
+            if i >= len(values):
+                # grow exactly to the size needed for position i
+                values = self._values = values + _zeros*(i+1-len(values))
+            try:
+                values[i] = v
+            except TypeError:
+                pass
+            else:
+                self._valid |= 1 << i
+                return
+        if self._extra is None:
+            self._extra = dict()
+        self._extra[k] = v
+    
+    def _cache(self,k,v):
+        ''' store value v of property k in a point of state that may be
+            shared by threads. Readers never see a valid bit without
+            the value, see _set(...)
+        '''
+        with _cache_lock:
+            self._set(k,v)
+    
+    def _get(self,k):
+        ''' return stored value of input or property k or None '''
+        i = self._index.get(k)
+        if i is not None and self._valid >> i & 1:
+            return self._values[i]
+        extra = self._extra
+        return None if extra is None else extra.get(k)
+    
+    @property
+    def _arg_list(self):
+        ''' list of names and values of the inputs, used to determine
+            other values with the help of the CoolProp package
+        '''
+        return [v for k in self._inputs for v in (k,self._get(k))]
         
     # this is implemented in derived classes
     #@abstractstaticmethod
@@ -67,6 +203,16 @@ class Point_of_State(ABC):
     # defined in derived classes
     #acceptable_args = None
     
+    # optional memo cache shared by all points of state, see cache.py
+    _memo = None
+    
+    @classmethod
+    def _memo_namespace(cls):
+        ''' points of state with the same namespace and the same
+            _arg_list share the values in the memo cache
+        '''
+        return (cls._generic_function, getattr(cls,'_fluid',None))
+    
     def _generic_property(self, arg):
         ''' works only if arg is in self.acceptable_args
             
@@ -85,39 +231,185 @@ class Point_of_State(ABC):
         #if not arg in self.acceptable_args:
         #    raise Exception(f'dont know property {arg}')
         
-        v = getattr(self, f'_{arg}',None)
+        i = self._index.get(arg)
+        if i is not None and self._valid >> i & 1:
+            return self._values[i]
+        v = self._get(arg)
         if v is None:
+            # constants are kept in the constants table of the class
+            if arg in self._constant_args:
+                return self._constant(arg)
             # determine and save property for further use
-            v = self._generic_function(arg,*self._arg_list)
-            setattr(self,f'_{arg}',v)
+            memo = self._memo
+            if memo is None:
+                v = self._backend(arg)
+            else:
+                v = memo.lookup(self,arg)
+            self._cache(arg,v)
+        return v
+    
+    def _backend(self,arg):
+        ''' determine property arg by self._generic_function.
+            This is the only call of the engine for a property,
+            see instrumentation.py
+        '''
+        if self._validation is not None:
+            error = self._domain_error()
+            if error is not None:
+                raise PropertyError(arg,'state',error[2])
+        return self._generic_function(arg,*self._arg_list)
+    
+    # None: all inputs are passed to the engine, 'mask': inputs outside
+    # of the domain of the class (see domain(...)) are errors of all
+    # properties without a call of the engine, nan in batches,
+    # 'strict': such inputs raise a PropertyError on creation
+    _validation = None
+    
+    @classmethod
+    def _input_bounds(cls,k,inputs):
+        ''' return (lower bound, upper bound) of input k of points of
+            state with the names of inputs or None, see Fluid
+        '''
+        return None
+    
+    @classmethod
+    def _domain(cls,inputs):
+        ''' return tuple of (k, lower bound, upper bound) of the
+            bounded inputs k of points of state with the names of
+            inputs. The bounds are determined once per class and inputs.
+        '''
+        table = cls.__dict__.get('_domains')
+        if table is None:
+            table = cls._domains = dict()
+        domain = table.get(inputs)
+        if domain is None:
+            domain = []
+            for k in inputs:
+                bounds = cls._input_bounds(k,inputs)
+                if bounds is not None:
+                    domain.append((k,*bounds))
+            domain = table[inputs] = tuple(domain)
+        return domain
+    
+    @classmethod
+    def domain(cls,*inputs):
+        ''' return dict {input: (lower bound, upper bound)} of the
+            valid values of the inputs of points of state with the
+            names of inputs, e.g. Air.domain('T','P'). The bounds are
+            magnitudes in the units of acceptable_args.
+        '''
+        return {k: (lo,hi) for k,lo,hi in cls._domain(tuple(inputs))}
+    
+    def _domain_error(self):
+        ''' return (input, 'state', message) of the first input
+            outside of the domain of the class or None
+        '''
+        for k,lo,hi in self._domain(self._inputs):
+            v = self._get(k)
+            # also true for nan
+            if not lo <= v <= hi:
+                return (k,'state',f'{k} = {v} is not in [{lo}, {hi}], the domain of {self.__class__.__name__} for inputs {self._inputs}')
+        return None
+    
+    # names of registered properties that do not depend on the state,
+    # e.g. the critical point. Their values are determined once per class
+    _constant_args = frozenset()
+    
+    @classmethod
+    def _constant_function(cls,arg):
+        ''' return the value of the constant arg, see Fluid '''
+        raise Exception(f'{cls.__name__} has no constant {arg}')
+    
+    @classmethod
+    def _constant(cls,arg):
+        ''' return the value of constant arg from the constants table
+            of cls. The table is filled with all registered constants on
+            first use, other constants (like Ttriple) on first use of arg.
+        '''
+        table = cls.__dict__.get('_constants')
+        if table is None:
+            table = cls._constants = dict()
+            for q in cls._constant_args:
+                try:
+                    table[q] = cls._constant_function(q)
+                except ValueError:
+                    # raised on access of q
+                    pass
+        v = table.get(arg)
+        if v is None:
+            v = table[arg] = cls._constant_function(arg)
         return v
     
     @classmethod
-    def register(cls,q,u):
+    def constants(cls):
+        ''' return dict of the values of all constants of cls '''
+        return {k: cls._constant(k) for k in cls.acceptable_args if k in cls._constant_args}
+    
+    @classmethod
+    def _changed(cls):
+        ''' fluid_factory(...) returns the same class for the same
+            arguments as long as this class is not changed
+        '''
+        key = cls.__dict__.get('_factory_key')
+        if _fluid_classes.get(key) is cls:
+            del _fluid_classes[key]
+    
+    @classmethod
+    def register(cls,q,u,constant=False):
         ''' register quantity q with unit u in cls.acceptable_args
-            and define q as property of cls
+            and define q as property of cls. 
+            
+            If constant is True, the value of q does not depend on the
+            state (like the critical point) and is determined only once
+            for all points of state of cls.
         '''
-        if q in cls.acceptable_args:
-            raise Exception(f'Property {q} is already registered in {__class__}')
-        cls.acceptable_args[q]=u
-        setattr(cls,q,property(lambda self, arg=q: self._generic_property(arg)))
+        with _class_lock:
+            if q in cls.acceptable_args:
+                raise Exception(f'Property {q} is already registered in {__class__}')
+            cls._changed()
+            cls.acceptable_args[q]=u
+            if constant:
+                cls._constant_args = cls._constant_args | {q}
+            else:
+                # positions are never reused, so values of unregistered
+                # properties are never taken for other properties
+                if '_index' not in cls.__dict__:
+                    cls._index = dict(cls._index)
+                cls._index[q] = cls._size
+                cls._size += 1
+            # the property is defined last, so other threads only
+            # use q when it is completely registered
+            setattr(cls,q,property(lambda self, arg=q: self._generic_property(arg)))
             
     @classmethod
     def unregister(cls,q):
         ''' delete quantity q from cls.acceptable_args
             and delete property q from cls
         '''
-        if not q in cls.acceptable_args:
-            raise Exception(f'Property {q} not found in {__class__}')
-        del cls.acceptable_args[q]
-        delattr(cls,q)
+        with _class_lock:
+            if not q in cls.acceptable_args:
+                raise Exception(f'Property {q} not found in {__class__}')
+            cls._changed()
+            # the property is deleted first, see register(...)
+            delattr(cls,q)
+            del cls.acceptable_args[q]
+            if q in cls._constant_args:
+                cls._constant_args = cls._constant_args - {q}
+                cls.__dict__.get('_constants',dict()).pop(q,None)
+            if '_index' in cls.__dict__:
+                cls._index.pop(q,None)
         
     @property
     def args(self):
         ''' return dict of values of all known properties
             (variables of state) in self.acceptable_args 
         '''
-        return {k:getattr(self,k) for k in self.acceptable_args}
+        res = self.outputs()
+        for k,v in res.items():
+            if isinstance(v,PropertyError):
+                # raise the exception of the engine
+                res[k] = getattr(self,k)
+        return res
     
     @property
     def args_or_errormessages(self):
@@ -129,16 +421,69 @@ class Point_of_State(ABC):
             returned for this arg instead.
             
             This method is useful for interactive exploration of
-            a point of state only.
+            a point of state only. The errormessages are PropertyErrors,
+            see outputs(...).
+        '''
+        return self.outputs()
+    
+    # function(outputs,name1,value1,name2,value2,fluid) of the engine
+    # that returns the values of all outputs (inf if not defined), see
+    # engines.bulk_function(...)
+    _bulk_function = None
+    
+    def outputs(self,*args):
+        ''' return dict {arg: value or PropertyError} for args (default:
+            all properties in self.acceptable_args) without raising.
+            
+            All values that are not known are determined by one call of
+            the bulk function of the engine, if it has one.
         '''
+        args = args or tuple(self.acceptable_args)
         res = dict()
-        for k in self.acceptable_args:
-            try:
-                v = getattr(self,k)
-            except Exception as e:
-                v = e
-            res[k] = v
-        return res
+        missing = []
+        for arg in args:
+            v = self._get(arg)
+            if v is not None:
+                res[arg] = v
+            elif arg in self._constant_args:
+                try:
+                    res[arg] = self._constant(arg)
+                except Exception as e:
+                    res[arg] = PropertyError(arg,'error',str(e))
+            else:
+                missing.append(arg)
+        if missing:
+            for arg,v in zip(missing,self._bulk_backend(missing)):
+                res[arg] = v
+                if not isinstance(v,PropertyError):
+                    self._cache(arg,v)
+        return {arg: res[arg] for arg in args}
+    
+    def _bulk_backend(self,args):
+        ''' return list of values or PropertyErrors of args '''
+        if self._validation is not None:
+            error = self._domain_error()
+            if error is not None:
+                return [PropertyError(arg,'state',error[2]) for arg in args]
+        bulk = self._bulk_function
+        memo = self._memo
+        if bulk is None or memo is not None:
+            # one call of the engine (or lookup in the memo cache) per arg
+            res = []
+            for arg in args:
+                try:
+                    res.append(self._backend(arg) if memo is None else memo.lookup(self,arg))
+                except Exception as e:
+                    res.append(PropertyError(arg,'error',str(e)))
+            return res
+        try:
+            values = bulk(args,*self._arg_list)
+        except ValueError as e:
+            return [PropertyError(arg,'state',str(e)) for arg in args]
+        return [
+            v if math.isfinite(v) else PropertyError(arg,'undefined',f'{arg} is not defined for {self._arg_list}')
+            for arg,v in zip(args,values)
+        ]
     
     def subset(self,*args):
         ''' return dict with values for specified properties 
@@ -147,6 +492,31 @@ class Point_of_State(ABC):
         '''
         return {k: getattr(self,k) for k in args if k in self.acceptable_args}
 
+    @classmethod
+    def batch(cls,name=None,**kwargs):
+        ''' return a batch of points of state of cls.
+        
+            The inputs are NumPy arrays (or values that can be
+            broadcast against each other), e.g.
+            
+            Air = fluid_factory('Air')
+            states = Air.batch(T=np.linspace(273.15,373.15,1000),P=1e5)
+            states.H # numpy array of 1000 enthalpies
+            
+            Each property is determined by one vectorized call of 
+            cls._generic_function and returned as array with the
+            shape of the broadcast inputs.
+        '''
+        if issubclass(cls,Batch):
+            return cls(name=name,**kwargs)
+        # each class gets its own batch class, which is a
+        # subclass of cls and knows all properties registered in cls
+        batch_class = cls.__dict__.get('_batch_class')
+        if batch_class is None:
+            batch_class = type(f'{cls.__name__}_Batch', (Batch,cls), dict())
+            cls._batch_class = batch_class
+        return batch_class(name=name,**kwargs)
+
 class Fluid(Point_of_State):
     ''' This class is for fluids that use CP.PropsSI 
     
@@ -190,17 +560,99 @@ class Fluid(Point_of_State):
     # acceptable_args is defined in fluid_factory(...)
     #acceptable_args = None 
     
-    _generic_function = staticmethod(CP.PropsSI)
+    # fluid_factory(...) uses CP.PropsSI itself, see engines.make_engine(...)
+    @staticmethod
+    def _generic_function(*args):
+        return _coolprop().PropsSI(*args)
     #@staticmethod
     #def _generic_function(*args):
     #    ''' this is the concrete function CP.PropsSi '''
     #    return CP.PropsSI(*args)
 
     
+    __slots__ = ()
+    
     def __init__(self,name=None, **kwargs):
         self.name = name
         super().__init__(**kwargs)
-        self._arg_list.append(self._fluid)
+    
+    @property
+    def _arg_list(self):
+        return super()._arg_list + [self._fluid]
+    
+    @classmethod
+    def _constant_function(cls,arg):
+        ''' constants are trivial outputs of CP.PropsSI. Tabular backends
+            like 'BICUBIC&HEOS' have the constants of the backend of
+            their tables (here: 'HEOS').
+        '''
+        from .engines import eos_fluid
+        return _coolprop().PropsSI(arg,eos_fluid(cls._fluid))
+    
+    @classmethod
+    def saturation(cls,n=200):
+        ''' return the saturation.SaturationTable of the fluid with n
+            nodes. It is built on first use and shared by all classes of
+            the fluid.
+        '''
+        from .engines import eos_fluid
+        from .saturation import saturation_table
+        return saturation_table(eos_fluid(cls._fluid),n)
+    
+    def derivative(self,of,wrt,constant):
+        ''' return the partial derivative of property of with respect to
+            wrt at constant property constant, e.g. derivative('H','T','P')
+            is (dH/dT)_P and derivative('D','P','H') is (dD/dP)_H.
+            
+            The derivative is determined analytically by CoolProp (like
+            CP.PropsSI('d(H)/d(T)|P',...)) and cached like the properties.
+        '''
+        return self._derivatives([f'd({of})/d({wrt})|{constant}'])[0]
+    
+    def jacobian(self,*outputs):
+        ''' return array J of the partial derivatives of outputs with
+            respect to the two inputs x of the point of state:
+            J[i,j] = (d outputs[i]/d x[j]) at constant x[1-j].
+            
+            Air(T=300,P=1e5).jacobian('H','D') # [[dH/dT, dH/dP], [dD/dT, dD/dP]]
+            
+            For batches, J has the shape (len(outputs),2) + shape of the
+            batch. The values are magnitudes in the units of acceptable_args
+            (also for classes with units). All derivatives that are not
+            known are determined by one call of the bulk function of the
+            engine, if it has one.
+        '''
+        x = self._inputs
+        keys = [f'd({q})/d({x[j]})|{x[1-j]}' for q in outputs for j in (0,1)]
+        values = self._derivatives(keys)
+        return np.reshape(values,(len(outputs),2)+np.shape(values[0]))
+    
+    def _derivatives(self,keys):
+        ''' return list of magnitudes of the derivatives keys like
+            'd(H)/d(T)|P'. Raise the first PropertyError.
+        '''
+        values = list(Point_of_State.outputs(self,*keys).values())
+        for v in values:
+            if isinstance(v,PropertyError):
+                raise v
+        return values
+    
+    @classmethod
+    def _input_bounds(cls,k,inputs):
+        ''' the range of the equation of state of the fluid. In the two
+            phase region (Q is an input), T and P are limited by the
+            triple point and the critical point.
+        '''
+        two_phase = 'Q' in inputs
+        try:
+            if k == 'T':
+                return (cls._constant('Ttriple'),cls._constant('Tcrit')) if two_phase else (cls._constant('Tmin'),cls._constant('Tmax'))
+            if k == 'P':
+                return (cls._constant('ptriple'),cls._constant('Pcrit')) if two_phase else (0.0,cls._constant('pmax'))
+        except (ValueError,KeyError):
+            # e.g. incompressible fluids have no critical point
+            return None
+        return {'Q': (0.0,1.0), 'D': (0.0,math.inf)}.get(k)
         
 # dict of some acceptable args (variables of state) for fluids
 Fluids_acceptable_args =  {
@@ -209,6 +661,11 @@ Fluids_acceptable_args =  {
     'M': 'kg/mol', 'C': 'J/kg/K', 'CVMASS': 'J/kg/K', 'Q': '', 'Z': '', 'V': 'Pa*s'
 }
 
+# args of Fluids_acceptable_args that are constants of the fluid. Other
+# constants (e.g. Ttriple and Tmax for the domain, see _input_bounds(...))
+# are kept in the constants table without being registered
+Fluids_constants = ('Pcrit', 'Tcrit', 'M')
+
 
 class HAPoint_of_State(Point_of_State):
     ''' this class is for humid air and uses CP.HAPropsSI as _generic_function. 
@@ -246,12 +703,16 @@ class HAPoint_of_State(Point_of_State):
         p_0u.args # all Properties as dict of Quantities
     '''
     
-    _generic_function = staticmethod(CP.HAPropsSI)
+    # fluid_factory(...) uses CP.HAPropsSI itself, see engines.make_engine(...)
+    @staticmethod
+    def _generic_function(*args):
+        return _coolprop().HAPropsSI(*args)
     #@staticmethod
     #def _generic_function(*args):
     #    ''' this is for CP.PropsSi '''
     #    return CP.HAPropsSI(*args)
-
+    
+    __slots__ = ()
 
     def __init__(self,name=None, **kwargs):
         self.name = name
@@ -262,12 +723,13 @@ class HAPoint_of_State(Point_of_State):
         
         # in some cases the dict of kwargs has to be changed.
         # in these cases, the original values are kept
-        # in internal variables and not determined from
+        # in known and not determined from
         # CP.HAPropsSI. To simplify this process, first
         # an arg_dict is created. This finally determines
         # self._args_list
         arg_dict = {k:v for k,v in kwargs.items()}
         arg_dict['P'] = P
+        known = dict()
         
         epsilon = 0.621945 # M_Water/M_Air
         
@@ -277,7 +739,7 @@ class HAPoint_of_State(Point_of_State):
             # I found this workaround as comment from
             # srnogueira on https://github.com/CoolProp/CoolProp/issues/2032
             del arg_dict['W']
-            W = self._W = kwargs['W']
+            W = known['W'] = kwargs['W']
             arg_dict['psi_w'] = W/(epsilon+W)
                                     
         if 'D' in kwargs and 'R' in kwargs:
@@ -287,14 +749,27 @@ class HAPoint_of_State(Point_of_State):
             # be independent of T. So any value of T can be used
             # as dummy Temperature to determine psi_w from (D,T,P)
             del arg_dict['D']
-            D = self._D = kwargs['D']
+            D = known['D'] = kwargs['D']
             
-            # determine psi_w from P,D (and T=T_0 as dummy)
-            psi_w = arg_dict['psi_w'] = CP.HAPropsSI('psi_w','P',P,'D',D,'T',T_0)
-            self._W = epsilon*psi_w/(1-psi_w)
+            # determine psi_w from P,D (and T=T_0 as dummy).
+            # self._generic_function is vectorized for a batch
+            psi_w = arg_dict['psi_w'] = self._generic_function('psi_w','P',P,'D',D,'T',T_0)
+            known['W'] = epsilon*psi_w/(1-psi_w)
         
         super().__init__(**arg_dict)
+        for k,v in known.items():
+            self._set(k,v)
+    
     
+    # the range of CP.HAPropsSI
+    _bounds = {
+        'T': (130.0,623.15), 'B': (130.0,623.15), 'D': (130.0,623.15),
+        'P': (100.0,1e7), 'R': (0.0,1.0), 'W': (0.0,math.inf), 'psi_w': (0.0,1.0)
+    }
+    
+    @classmethod
+    def _input_bounds(cls,k,inputs):
+        return cls._bounds.get(k)
     
     def dew_point(self,name=None):
         ''' The dew_point is defined by T=self.D and R=1 '''
@@ -311,13 +786,17 @@ class HAPoint_of_State(Point_of_State):
                mix.H = (1-other_part)*self.H + other_part*other.H
                      = self.H + other_part*(other.H-self.H)
             where 0<= other_part <= 1
+            
+            If other_part is an array (or self or other is a batch),
+            the result is a batch of all mixtures, e.g. the mixing line
+            p_0.mix(p_1,np.linspace(0,1,101))
         '''
-        if not (0 <= other_part <= 1):
+        if _is_quantity(other_part):
+            # e.g. Q_(30,'percent')
+            other_part = other_part.m_as('')
+        if not np.all((0 <= np.asarray(other_part)) & (np.asarray(other_part) <= 1)):
             raise Exception(f'other_part = {other_part} is not in [0,1]')
-            
-        x = self.W + other_part*(other.W-self.W)
-        h = self.H + other_part*(other.H-self.H)
-        return self.__class__(W=x,H=h,name=name)
+        return self._line(other,other_part,name)
     
     def hom_coord(self,other,lambda_,name=None):
         ''' hom_coord means to treat (1-lambda_) and lambda_
@@ -330,9 +809,20 @@ class HAPoint_of_State(Point_of_State):
             
             For 0 <= lambda_ <= 1, self.mix and self.hom_coord 
             is the same point of state.
+            
+            If lambda_ is an array (or self or other is a batch),
+            the result is a batch.
+        '''
+        return self._line(other,lambda_,name)
+    
+    def _line(self,other,lambda_,name):
+        ''' point of state or batch on the line from self to other
+            in the vector space <W,H>
         '''
         x = self.W + lambda_*(other.W-self.W)
         h = self.H + lambda_*(other.H-self.H)
+        if np.ndim(getattr(x,'magnitude',x)) or isinstance(self,Batch):
+            return self.batch(W=x,H=h,name=name)
         return self.__class__(W=x,H=h,name=name)
 
 # dict of some acceptable args (variables of state) for humid air
@@ -343,24 +833,116 @@ HAPoint_of_State_acceptable_args = {
 }
 
 
+@lru_cache(maxsize=None)
+def _unit(u):
+    ''' return the pint Unit of u (string or Unit). 
+        Parsing of unit strings is done only once.
+    '''
+    return get_ureg().Unit(u)
+
+
+@lru_cache(maxsize=None)
+def _conversion(from_unit,to_unit):
+    ''' return (scale,offset) to convert a magnitude m from from_unit
+        to_unit by m*scale + offset. This is exact for all multiplicative
+        units and for offset units like 'degC'.
+    '''
+    Q = get_ureg().Quantity
+    offset = Q(0.0,from_unit).m_as(to_unit)
+    scale = Q(1.0,from_unit).m_as(to_unit) - offset
+    return scale, offset
+
+
+def _convert(m,from_unit,to_unit):
+    ''' convert magnitude (or array of magnitudes) m from from_unit to_unit '''
+    scale, offset = _conversion(from_unit,to_unit)
+    return m*scale + offset if offset else m*scale
+
+
+def _round(m,n):
+    ''' round a magnitude or an array of magnitudes m to n digits '''
+    return np.round(m,n) if isinstance(m,np.ndarray) else round(m,n)
+
+
 class Units():
+    ''' Units is a mixin for points of state with Quantities as 
+        inputs and results.
+        
+        The pint Units of all properties in acceptable_args are parsed
+        once per class in register(...), the factors to convert from and
+        to these units are determined once per pair of units. So
+        the conversions of inputs and results are simple multiplications
+        of the magnitudes. Batches of points of state have Quantities of
+        arrays with one unit per property.
+    '''
+    __slots__ = ()
+    
     def __init__(self,name=None, **kwargs):
-        units = self.acceptable_args
-        # treat v and Q_(v,'')  as the same Quantity Q_(v,'')
-        # only do this for dimensionless values because this
-        # may lead to ambigious results for offset units like 'degC'
-        one = Q_(1,'')
-        myargs = {k:v*one if units[k]==ureg.dimensionless else v for k,v in kwargs.items()}
+        units = self._units
+        myargs = dict()
+        for k,v in kwargs.items():
+            unit = units[k]
+            if isinstance(v,Q_):
+                # convert to corresponding units and strip units
+                myargs[k] = _convert(v.magnitude,v._units,unit._units)
+            elif unit.dimensionless:
+                # treat v and Q_(v,'')  as the same Quantity Q_(v,'')
+                # only do this for dimensionless values because this
+                # may lead to ambigious results for offset units like 'degC'
+                myargs[k] = v
+            else:
+                raise Exception(f'{k} = {v} needs a unit compatible with {unit}')
 
-        # convert to corresponding units and strip units to define point of state
-        super().__init__(name=name,**{k: v.m_as(units[k]) for k,v in myargs.items()})
+        # define point of state with the stripped values
+        super().__init__(name=name,**myargs)
+    
+    @classmethod
+    def register(cls,q,u,constant=False):
+        ''' register quantity q with unit u and keep the pint Unit of u '''
+        with _class_lock:
+            if q in cls.acceptable_args:
+                # raises the exception
+                super().register(q,u,constant)
+            # each class has its own dict of units, like acceptable_args.
+            # The unit is known before the property is defined
+            if '_units' not in cls.__dict__:
+                cls._units = dict(getattr(cls,'_units',dict()))
+            cls._units[q] = _unit(u)
+            super().register(q,u,constant)
+    
+    @classmethod
+    def unregister(cls,q):
+        with _class_lock:
+            super().unregister(q)
+            if '_units' in cls.__dict__:
+                del cls._units[q]
+    
+    @classmethod
+    def constants(cls):
+        return {k: Q_(v,cls._units[k]) for k,v in super().constants().items()}
+    
+    def outputs(self,*args):
+        units = self._units
+        return {
+            k: v if isinstance(v,PropertyError) else Q_(v,units[k])
+            for k,v in super().outputs(*args).items()
+        }
+    
+    def derivative(self,of,wrt,constant):
+        ''' return the partial derivative as Quantity, see Fluid '''
+        return Q_(super().derivative(of,wrt,constant),self._units[of]/self._units[wrt])
     
     def _generic_property(self,arg):
         ''' Determine value from super()._generic_property() 
             and apply unit to the result
         '''
-        units = self.acceptable_args
-        return Q_(super()._generic_property(arg), units[arg])
+        return Q_(super()._generic_property(arg), self._units[arg])
+    
+    def _to(self,q,u):
+        ''' return the magnitude of property q in unit u '''
+        unit = self._units[q]
+        m = super()._generic_property(q)
+        return m if u is None else _convert(m,unit._units,_unit(u)._units)
     
     def subset_to(self,**kwargs):
         ''' each kwarg is a dict of up to three values:
@@ -372,10 +954,9 @@ class Units():
             q = v['q']
             u = v.get('u',None)
             n = v.get('n',None)
-            res = getattr(self,q)
-            if u is not None: res = res.to(u) 
-            if n is not None: res = res.round(n)
-            return res
+            res = self._to(q,u)
+            if n is not None: res = _round(res,n)
+            return Q_(res,self._units[q] if u is None else _unit(u))
         return {k:get_kwarg(v) for k,v in kwargs.items()}
     
     def subset_m_as(self,**kwargs):
@@ -388,9 +969,8 @@ class Units():
             q = v['q']
             u = v.get('u',None)
             n = v.get('n',None)
-            res = getattr(self,q)
-            res = res.m_as(u) if u is not None else res.m
-            return round(res,n) if n is not None else res
+            res = self._to(q,u)
+            return _round(res,n) if n is not None else res
 
         return {k:get_kwarg(v) for k,v in kwargs.items()}
         
@@ -401,14 +981,227 @@ class Units():
             print(f'{k:>5} = {v}')
 
 
+def _vectorized(function,args,size):
+    ''' return array of size values of function(*args) with arrays in args.
+    
+        CP.PropsSI returns inf for a point of state that can not be
+        determined, CP.HAPropsSI raises an exception for the whole
+        array. In both cases, the value is replaced by nan.
+    '''
+    try:
+        v = np.array(function(*args),dtype=float)
+    except ValueError:
+        v = np.full(size,np.nan)
+        for i in range(size):
+            try:
+                v[i] = function(*(a[i] if isinstance(a,np.ndarray) else a for a in args))
+            except ValueError:
+                pass
+    v[np.isinf(v)] = np.nan
+    return v
+
+
+class Batch():
+    ''' Batch is a mixin for a point of state with array inputs.
+    
+        All inputs are broadcast against each other. The results
+        are NumPy arrays with the broadcast shape of the inputs.
+        A batch class is created by Point_of_State.batch(...) and is
+        a subclass of the class of the scalar point of state, so it
+        knows all registered properties (and units, if any).
+        
+        Points of state that can not be determined by the
+        _generic_function are returned as nan.
+    '''
+    # arrays are not cached in the memo cache
+    _memo = None
+    # the bulk functions of the engines only accept scalars
+    _bulk_function = None
+    
+    def _set(self,k,v):
+        ''' arrays are kept in self._extra '''
+        if self._extra is None:
+            self._extra = dict()
+        self._extra[k] = v
+    
+    def __init__(self,name=None, **kwargs):
+        # strip units (if any) to broadcast the magnitudes
+        magnitudes = [np.asarray(getattr(v,'magnitude',v),dtype=float) for v in kwargs.values()]
+        self.shape = np.broadcast_shapes(*(m.shape for m in magnitudes))
+        self.size = int(np.prod(self.shape))
+        
+        # the generic functions only accept one dimensional arrays
+        flat = dict()
+        for (k,v),m in zip(kwargs.items(),magnitudes):
+            m = np.broadcast_to(m,self.shape).ravel()
+            flat[k] = Q_(m,v.units) if _is_quantity(v) else m
+        super().__init__(name=name,**flat)
+        if self._validation == 'strict':
+            mask = self._domain_mask()
+            if mask is not None:
+                i = int(np.argmin(mask))
+                for k,lo,hi in self._domain(self._inputs):
+                    v = np.broadcast_to(self._get(k),(self.size,))[i]
+                    if not lo <= v <= hi:
+                        raise PropertyError(k,'state',(
+                            f'{self.size-int(mask.sum())} of {self.size} points of state are not in the domain '
+                            f'of {self.__class__.__name__}, first: {k}[{i}] = {v} is not in [{lo}, {hi}]'
+                        ))
+    
+    def __len__(self):
+        return self.shape[0] if self.shape else 1
+    
+    def _domain_error(self):
+        ''' points of state outside of the domain are nan, see _domain_mask() '''
+        return None
+    
+    def _domain_mask(self):
+        ''' return boolean array of the points of state with all inputs in
+            the domain of the class or None, if all inputs are in the domain
+        '''
+        mask = self.__dict__.get('_mask',False)
+        if mask is False:
+            mask = np.ones(self.size,dtype=bool)
+            for k,lo,hi in self._domain(self._inputs):
+                v = self._get(k)
+                mask &= (lo <= v) & (v <= hi)
+            mask = self._mask = None if mask.all() else mask
+        return mask
+        
+    def _generic_function(self,*args):
+        ''' call _generic_function of the scalar class with arrays,
+            see _vectorized(...). With validation, points of state outside of the domain of
+            the class are nan and not passed to the _generic_function.
+        '''
+        function = super()._generic_function
+        # the inputs are not known yet in HAPoint_of_State.__init__(...)
+        if self._validation is None or getattr(self,'_inputs',None) is None:
+            return _vectorized(function,args,self.size)
+        mask = self._domain_mask()
+        if mask is None:
+            return _vectorized(function,args,self.size)
+        v = np.full(self.size,np.nan)
+        n = int(mask.sum())
+        if n:
+            v[mask] = _vectorized(
+                function,[a[mask] if isinstance(a,np.ndarray) and a.shape == mask.shape else a for a in args],n
+            )
+        return v
+    
+    def _generic_property(self,arg):
+        ''' return the (cached) array of property arg with the shape of
+            the inputs. Scalar values (like the default pressure of humid 
+            air) are broadcast to this shape.
+        '''
+        return self._reshape(super()._generic_property(arg))
+    
+    def _reshape(self,v):
+        ''' return v broadcast to the shape of the inputs '''
+        return np.reshape(np.broadcast_to(v,(self.size,)),self.shape)
+    
+    def outputs(self,*args):
+        ''' arrays with the shape of the inputs, constants are broadcast
+            to this shape, see Point_of_State
+        '''
+        res = dict()
+        for k,v in super().outputs(*args).items():
+            if isinstance(v,PropertyError):
+                res[k] = v
+            elif _is_quantity(v):
+                res[k] = Q_(self._reshape(v.magnitude),v.units)
+            else:
+                res[k] = self._reshape(v)
+        return res
+    
+    def _derivatives(self,keys):
+        ''' arrays of derivatives with the shape of the inputs, see Fluid '''
+        return [self._reshape(v) for v in super()._derivatives(keys)]
+
+
 def fluid_factory(fluid,with_units=False,**kwargs):
+    ''' return a class for points of state of fluid.
+    
+        fluid is 'HumidAir' or the name of a fluid in CoolProp, e.g. 'Air'.
+        If with_units is True, all values are Quantities.
+        
+        The classes are memoized by their arguments, so fluid_factory('Air')
+        is fluid_factory('Air'). After register(...) or unregister(...)
+        of a property, the class is no longer returned by fluid_factory.
+        
+        Keyword arguments:
+          - P_default: default pressure of humid air (defaults to p_amb)
+          - engine: 'PropsSI' (default), 'AbstractState' or 'table' 
+            for fluids and 'PropsSI' (default) or 'ideal' for humid air,
+            see engines.make_engine(...)
+          - engine_options: dict of options of the engine, e.g. the domain
+            of the table for engine='table', see tables.PropertyTable
+          - backend: backend of CoolProp for fluids, e.g. 'HEOS' (default),
+            'IF97', 'BICUBIC', 'TTSE' (tables of 'HEOS') or 'INCOMP'. The
+            tabular backends 'BICUBIC' and 'TTSE' use an AbstractState
+            as engine, because CP.PropsSI does not support them
+          - validation: None (default), 'mask' or 'strict'. With 'mask',
+            inputs outside of the domain of the fluid (see domain(...))
+            are not passed to the engine, the properties of such points
+            of state are errors (nan in batches). With 'strict', such
+            inputs raise a PropertyError on creation of the point of state
+          - saturation_table: if True (or a dict of options like
+            dict(n=200,tolerance=1e-4)), points of state of fluids in the
+            two phase region defined by P or T and one of Q, H, S or U are
+            determined from the saturation table of the fluid instead of
+            the engine, see saturation.SaturationFunction
+    '''
+    # keep the arguments to create the same class without units,
+    # e.g. in other processes, see parallel.py
+    factory_kwargs = dict(kwargs)
+    if 'P_default' in kwargs:
+        P_default = kwargs['P_default']
+        factory_kwargs['P_default'] = P_default.bv if _is_quantity(P_default) else P_default
+    
+    key = (fluid, with_units, _freeze(factory_kwargs))
+    try:
+        ThisFluid = _fluid_classes.get(key)
+    except TypeError:
+        # e.g. arrays in engine_options, such classes are not memoized
+        key = ThisFluid = None
+    if ThisFluid is not None:
+        return ThisFluid
+    with _class_lock:
+        # another thread may have created the class in the meantime
+        ThisFluid = None if key is None else _fluid_classes.get(key)
+        if ThisFluid is None:
+            ThisFluid = _new_fluid_class(fluid,with_units,kwargs,factory_kwargs,key)
+    return ThisFluid
+
+
+def _new_fluid_class(fluid,with_units,kwargs,factory_kwargs,key):
+    ''' create the class of fluid_factory(fluid,with_units,**kwargs) and
+        memoize it by key (if key is not None)
+    '''
+    validation = kwargs.pop('validation',None)
+    if validation not in (None,'mask','strict'):
+        raise Exception(f'validation must be None, "mask" or "strict", not {validation!r}')
+    
+    # CoolProp and the engines are imported on first use
+    from .engines import make_engine, bulk_function, coolprop_fluid, eos_fluid
+    if with_units:
+        get_ureg()
+    
     if fluid == 'HumidAir':
+        if 'backend' in kwargs:
+            raise Exception(f'{fluid} has no backend, use the engine instead')
+        if 'saturation_table' in kwargs:
+            raise Exception(f'{fluid} has no saturation table')
+        # the engine 'ideal' replaces CP.HAPropsSI by ideal gas equations
+        attributes = dict(
+            __slots__=(),
+            _generic_function=staticmethod(make_engine(kwargs.pop('engine','PropsSI'),fluid)),
+        )
+        
         if with_units:
-            ThisFluid = type(f'{fluid}_with_Units', (Units, HAPoint_of_State), dict())
-            ThisFluid._P_default = kwargs.pop('P_default',Q_(p_amb,'Pa')).bv
+            ThisFluid = type(f'{fluid}_with_Units', (Units, HAPoint_of_State), attributes)
         else:
-            ThisFluid = type(f'{fluid}',(HAPoint_of_State,), dict())
-            ThisFluid._P_default = kwargs.pop('P_default',p_amb)        
+            ThisFluid = type(f'{fluid}',(HAPoint_of_State,), attributes)
+        ThisFluid._P_default = factory_kwargs.get('P_default',p_amb)
 
         # register the above acceptable args
         ThisFluid.acceptable_args = dict()
@@ -417,20 +1210,60 @@ def fluid_factory(fluid,with_units=False,**kwargs):
 
 
     else:
+        # the fluid string of CoolProp, e.g. 'IF97::Water'
+        cp_fluid = coolprop_fluid(fluid,kwargs.pop('backend',None))
+        
+        # the engine determines the _generic_function of ThisFluid.
+        # It defaults to CP.PropsSI, see engines.make_engine(...)
+        attributes = {'__slots__': (), '_fluid': cp_fluid}
+        generic_function = make_engine(
+            kwargs.pop('engine','PropsSI'),
+            cp_fluid,
+            **kwargs.pop('engine_options',dict())
+        )
+        saturation_options = kwargs.pop('saturation_table',False)
+        if saturation_options:
+            # the table is built on first use in the two phase region
+            from .saturation import SaturationFunction
+            generic_function = SaturationFunction(
+                generic_function,
+                eos_fluid(cp_fluid),
+                **(saturation_options if isinstance(saturation_options,dict) else dict())
+            )
+        attributes['_generic_function'] = staticmethod(generic_function)
+        bulk = bulk_function(generic_function,cp_fluid)
+        if bulk is not None:
+            attributes['_bulk_function'] = staticmethod(bulk)
+        
         if with_units:
-            ThisFluid = type(f'{fluid}_with_Units', (Units,Fluid),{'_fluid': fluid})
+            ThisFluid = type(f'{cp_fluid}_with_Units', (Units,Fluid),attributes)
         else:
-            ThisFluid = type(f'{fluid}', (Fluid,), {'_fluid': fluid})
+            ThisFluid = type(f'{cp_fluid}', (Fluid,), attributes)
         
         # (re)define ThisFluid.acceptable_args to ensure,
         # each fluid has its own dict of acceptable_args
         ThisFluid.acceptable_args = dict()
         for k,v in Fluids_acceptable_args.items():
-            ThisFluid.register(k,v)
-        
+            ThisFluid.register(k,v,constant=k in Fluids_constants)
+    
+    ThisFluid._validation = validation
+    ThisFluid._factory_args = (fluid, factory_kwargs)
+    if key is not None:
+        ThisFluid._factory_key = key
+        _fluid_classes[key] = ThisFluid
+    
     return ThisFluid
 
 
+def _freeze(v):
+    ''' return a hashable version of the dicts, lists and tuples in v '''
+    if isinstance(v,dict):
+        return tuple(sorted((k,_freeze(x)) for k,x in v.items()))
+    if isinstance(v,(list,tuple)):
+        return tuple(_freeze(x) for x in v)
+    return v
+
+
 ha_subset = dict(
     t=dict(q='T',u='degC',n=1),
     phi=dict(q='R',u='percent',n=1),
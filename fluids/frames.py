@@ -0,0 +1,134 @@
+''' Evaluation of points of state for the rows of pandas DataFrames.
+
+    import pandas as pd
+    import fluids.frames # registers the accessor DataFrame.fluids
+    Air = fluid_factory('Air')
+    df = pd.DataFrame(dict(temp_K=[280.0,300.0],p_Pa=1e5))
+    df.fluids.evaluate(Air,inputs={'T':'temp_K','P':'p_Pa'},outputs=['H','D'])
+
+    The accessor is registered by import fluids, if pandas is already
+    imported, otherwise by import fluids.frames.
+
+    Large CSV (or Parquet, with pyarrow) files are evaluated chunk by
+    chunk, so the memory is bounded by the size of a chunk:
+
+    evaluate_file(Air,'log.csv','states.csv',inputs={'T':'temp_K','P':'p_Pa'},outputs=['H'])
+'''
+import os
+
+import numpy as np
+import pandas as pd
+
+from .fluids import _convert, _is_quantity
+from .parallel import evaluate_many
+
+
+def evaluate_frame(FluidClass,df,inputs,outputs=None,units=None,prefix='',errors='nan',workers=1,chunksize=None):
+    ''' return a copy of DataFrame df with a column prefix+q for each
+        property q in outputs (default: all properties of FluidClass).
+
+        inputs is a dict {property: column name or value}, e.g.
+        {'T':'temp_K','P':1e5}. The columns and values are magnitudes in
+        the units of FluidClass.acceptable_args or, if property is a key
+        of the dict units, in units[property], e.g. {'T':'degC'}. The
+        output columns have the same units.
+
+        Points of state that can not be determined are nan (errors='nan')
+        or raise an Exception (errors='raise'). The points of state are
+        evaluated with evaluate_many(...) with workers processes.
+    '''
+    if errors not in ('nan','raise'):
+        raise Exception(f'errors must be "nan" or "raise", not {errors!r}')
+    units = dict() if units is None else units
+    acceptable_args = FluidClass.acceptable_args
+    n = len(df)
+    magnitudes = dict()
+    for k,c in inputs.items():
+        if k not in acceptable_args:
+            raise Exception(f'{k} is not in acceptable_args of {FluidClass.__name__}')
+        if isinstance(c,str):
+            if c not in df.columns:
+                raise Exception(f'column {c!r} for {k} is not in the DataFrame')
+            m = df[c].to_numpy(dtype=float)
+        else:
+            m = np.full(n,c.m_as(units.get(k,acceptable_args[k])) if _is_quantity(c) else c,dtype=float)
+        if k in units:
+            m = _convert(m,units[k],acceptable_args[k])
+        magnitudes[k] = m
+
+    outputs = list(acceptable_args) if outputs is None else list(outputs)
+    res = df.copy()
+    if n == 0:
+        for q in outputs:
+            res[prefix+q] = np.empty(0)
+        return res
+    evaluation = evaluate_many(FluidClass,magnitudes,outputs,workers=workers,chunksize=chunksize)
+    for q in outputs:
+        if errors == 'raise' and evaluation.errors[q]:
+            i,e = next(iter(evaluation.errors[q].items()))
+            raise Exception(f'{q} of row {df.index[i]!r}: {e}')
+        v = evaluation.values[q]
+        if _is_quantity(v):
+            v = v.m_as(acceptable_args[q])
+        res[prefix+q] = _convert(v,acceptable_args[q],units[q]) if q in units else v
+    return res
+
+
+def read_chunks(path,chunksize=100_000,**kwargs):
+    ''' yield DataFrames of at most chunksize rows of the CSV or
+        Parquet file path. kwargs are passed to pd.read_csv(...).
+    '''
+    if os.path.splitext(path)[1] in ('.parquet','.pq'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize,**kwargs):
+            yield batch.to_pandas()
+    else:
+        with pd.read_csv(path,chunksize=chunksize,**kwargs) as reader:
+            yield from reader
+
+
+def stream(FluidClass,chunks,inputs,outputs=None,**kwargs):
+    ''' yield evaluate_frame(FluidClass,chunk,inputs,outputs,**kwargs)
+        for each DataFrame chunk of the iterable chunks
+    '''
+    for chunk in chunks:
+        yield evaluate_frame(FluidClass,chunk,inputs,outputs,**kwargs)
+
+
+def evaluate_file(FluidClass,source,destination,inputs,outputs=None,chunksize=100_000,read_kwargs=None,**kwargs):
+    ''' evaluate the rows of the CSV or Parquet file source chunk by
+        chunk (see evaluate_frame(...)) and write all columns to the CSV
+        or Parquet file destination. Return the number of rows.
+    '''
+    chunks = read_chunks(source,chunksize,**(dict() if read_kwargs is None else read_kwargs))
+    parquet = os.path.splitext(destination)[1] in ('.parquet','.pq')
+    writer = None
+    rows = 0
+    try:
+        for df in stream(FluidClass,chunks,inputs,outputs,**kwargs):
+            if parquet:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(df,preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(destination,table.schema)
+                writer.write_table(table)
+            else:
+                df.to_csv(destination,mode='w' if rows == 0 else 'a',header=rows == 0,index=False)
+            rows += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+@pd.api.extensions.register_dataframe_accessor('fluids')
+class FluidsAccessor():
+    ''' df.fluids.evaluate(FluidClass,inputs,outputs,...) is
+        evaluate_frame(FluidClass,df,inputs,outputs,...)
+    '''
+    def __init__(self,df):
+        self._df = df
+
+    def evaluate(self,FluidClass,inputs,outputs=None,**kwargs):
+        return evaluate_frame(FluidClass,self._df,inputs,outputs,**kwargs)
@@ -0,0 +1,198 @@
+''' Instrumentation of the properties of points of state.
+
+    from fluids import fluid_factory, enable_instrumentation
+    instrumentation = enable_instrumentation()
+    Air = fluid_factory('Air')
+    Air(T=273.15,P=1e5).args
+    instrumentation.report() # calls, hits, misses, errors and time per property
+
+    While enabled, each access of a property is counted, also the
+    properties read with outputs(...), args or args_or_errormessages. A miss is a
+    call of the engine (e.g. CP.PropsSI) of the class of the point of
+    state, all other accesses are hits (values cached in the point of
+    state, in the memo cache or in the constants table of the class).
+    The latencies of the calls of the engine are kept in histograms.
+    One call of the bulk function of an engine (see Point_of_State.outputs)
+    counts as a miss of each of its properties with an equal share of
+    the time.
+
+    Hooks are called after each call of the engine with an Event, e.g.
+    to export the calls to a metrics system:
+
+    instrumentation.add_hook(lambda event: statsd.timing(event.arg,event.seconds))
+
+    Instrumentation replaces Point_of_State._generic_property,
+    Point_of_State.outputs, Point_of_State._backend and
+    Point_of_State._bulk_backend while it is enabled, so there is no overhead while it is disabled.
+'''
+import math
+import threading
+from collections import Counter, defaultdict, namedtuple
+from time import perf_counter
+
+from .fluids import Point_of_State
+
+
+# one call of the engine of cls for property arg. error is the
+# exception raised by the engine or None
+Event = namedtuple('Event',['cls','arg','seconds','error'])
+
+
+class Instrumentation():
+    ''' counters, latency histograms and hooks of the properties of
+        points of state. All counters are dicts with keys (cls,arg),
+        the keys of errors are (cls,arg,name of the exception).
+
+        The histogram of (cls,arg) counts the calls of the engine by
+        latency. Bucket b counts the calls with a latency in
+        [2**(b-1),2**b) µs. The counters are updated under a lock, so
+        points of state of all threads are counted.
+    '''
+    def __init__(self):
+        self.hooks = []
+        self._lock = threading.Lock()
+        self.reset()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(calls={sum(self.calls.values())}, misses={sum(self.misses.values())})'
+
+    def reset(self):
+        ''' reset all counters and histograms '''
+        with self._lock:
+            self.calls = Counter()
+            self.misses = Counter()
+            self.errors = Counter()
+            self.seconds = Counter()
+            self.histograms = defaultdict(Counter)
+
+    def add_hook(self,hook):
+        ''' call hook(event) after each call of an engine. Exceptions
+            of hooks are not caught.
+        '''
+        self.hooks.append(hook)
+
+    def remove_hook(self,hook):
+        self.hooks.remove(hook)
+
+    def count(self,cls,args):
+        ''' count an access of each property in args of cls '''
+        with self._lock:
+            calls = self.calls
+            for arg in args:
+                calls[(cls,arg)] += 1
+
+    def record(self,cls,arg,seconds,error=None):
+        ''' record a call of the engine of cls for property arg '''
+        key = (cls,arg)
+        with self._lock:
+            self.misses[key] += 1
+            self.seconds[key] += seconds
+            self.histograms[key][math.frexp(seconds*1e6)[1]] += 1
+            if error is not None:
+                self.errors[(cls,arg,type(error).__name__)] += 1
+        if self.hooks:
+            event = Event(cls,arg,seconds,error)
+            for hook in self.hooks:
+                hook(event)
+
+    def histogram(self,cls,arg):
+        ''' return dict {upper bound of latency in s: number of calls}
+            of the calls of the engine of cls for property arg
+        '''
+        with self._lock:
+            histogram = dict(self.histograms.get((cls,arg),dict()))
+        return {2.0**b*1e-6: n for b,n in sorted(histogram.items())}
+
+    def report(self):
+        ''' return list of dicts with the counters of each fluid class
+            and property, most expensive (total time) first
+        '''
+        with self._lock:
+            calls, misses, seconds = Counter(self.calls), Counter(self.misses), Counter(self.seconds)
+            errors = Counter()
+            for (cls,arg,name),n in self.errors.items():
+                errors[(cls,arg)] += n
+        rows = []
+        for key in set(calls) | set(misses):
+            cls, arg = key
+            rows.append(dict(
+                fluid=cls.__name__,
+                property=arg,
+                calls=calls[key],
+                hits=max(calls[key]-misses[key],0),
+                misses=misses[key],
+                errors=errors[key],
+                seconds=seconds[key],
+            ))
+        return sorted(rows,key=lambda row: -row['seconds'])
+
+
+# the original methods of Point_of_State
+_generic_property = Point_of_State._generic_property
+_outputs = Point_of_State.outputs
+_backend = Point_of_State._backend
+_bulk_backend = Point_of_State._bulk_backend
+
+# the enabled Instrumentation or None
+_instrumentation = None
+
+
+def _counted_generic_property(self,arg):
+    _instrumentation.count(type(self),(arg,))
+    return _generic_property(self,arg)
+
+
+def _counted_outputs(self,*args):
+    _instrumentation.count(type(self),args or tuple(self.acceptable_args))
+    return _outputs(self,*args)
+
+
+def _timed_backend(self,arg):
+    start = perf_counter()
+    try:
+        v = _backend(self,arg)
+    except Exception as e:
+        _instrumentation.record(type(self),arg,perf_counter()-start,e)
+        raise
+    _instrumentation.record(type(self),arg,perf_counter()-start)
+    return v
+
+
+def _timed_bulk_backend(self,args):
+    if self._bulk_function is None or self._memo is not None:
+        # calls self._backend for each arg
+        return _bulk_backend(self,args)
+    start = perf_counter()
+    values = _bulk_backend(self,args)
+    seconds = (perf_counter()-start)/len(args)
+    for arg,v in zip(args,values):
+        _instrumentation.record(type(self),arg,seconds,v if isinstance(v,Exception) else None)
+    return values
+
+
+def enable_instrumentation(instrumentation=None):
+    ''' enable instrumentation (default: a new Instrumentation)
+        for all points of state and return it
+    '''
+    global _instrumentation
+    _instrumentation = Instrumentation() if instrumentation is None else instrumentation
+    Point_of_State._generic_property = _counted_generic_property
+    Point_of_State.outputs = _counted_outputs
+    Point_of_State._backend = _timed_backend
+    Point_of_State._bulk_backend = _timed_bulk_backend
+    return _instrumentation
+
+
+def disable_instrumentation():
+    ''' restore the methods of Point_of_State without instrumentation '''
+    global _instrumentation
+    Point_of_State._generic_property = _generic_property
+    Point_of_State.outputs = _outputs
+    Point_of_State._backend = _backend
+    Point_of_State._bulk_backend = _bulk_backend
+    _instrumentation = None
+
+
+def get_instrumentation():
+    ''' return the enabled Instrumentation or None '''
+    return _instrumentation
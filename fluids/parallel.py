@@ -0,0 +1,191 @@
+''' Parallel evaluation of many points of state in a process pool.
+
+    Air = fluid_factory('Air')
+    res = evaluate_many(
+        Air,
+        dict(T=np.linspace(250,350,1_000_000),P=1e5),
+        ['H','D','S'],
+        workers=8
+    )
+    res.values['H'] # numpy array of 1_000_000 enthalpies
+    res.errors['H'] # {index: errormessage} of all failed points of state
+
+    The inputs are split into chunks. Each chunk is evaluated as a batch
+    in one of the worker processes. Each worker creates the fluid class
+    once with fluid_factory(...) from the arguments that were used to
+    create FluidClass.
+
+    With pool='thread', the chunks are evaluated by a pool of threads of
+    this process. The threads only run the calls of CoolProp in parallel
+    on a free-threaded build of Python (python3.13t, sys._is_gil_enabled()
+    is False), with the GIL they avoid the start of processes and the
+    transfer of the results.
+'''
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from .fluids import fluid_factory, Units, get_ureg, _is_quantity
+
+
+class Evaluation():
+    ''' result of evaluate_many(...).
+
+        values is a dict of contiguous float64 arrays (or Quantities,
+        if the fluid class has units) with the shape of the inputs.
+        errors is a dict {property: {index: errormessage}} of the points
+        of state that could not be determined. Their values are nan.
+        The index is the index in the flattened inputs.
+    '''
+    def __init__(self,values,errors):
+        self.values = values
+        self.errors = errors
+
+    def __repr__(self):
+        n = sum(len(e) for e in self.errors.values())
+        return f'{self.__class__.__name__}(properties={list(self.values)}, errors={n})'
+
+
+# the fluid class of a worker process, defined by _init_worker(...)
+_worker_class = None
+
+
+def _make_class(factory_args,units,constants=()):
+    ''' create the fluid class without units from the arguments of
+        fluid_factory(...), the units of all registered properties
+        and the names of the constants
+    '''
+    fluid, kwargs = factory_args
+    FluidClass = fluid_factory(fluid,**kwargs)
+    if all(q in FluidClass.acceptable_args for q in units):
+        return FluidClass
+    # properties registered after the creation of the fluid class are
+    # registered in a subclass, the class of fluid_factory(...) is
+    # shared and must not change
+    FluidClass = type(FluidClass.__name__,(FluidClass,),dict(
+        __slots__=(),
+        acceptable_args=dict(FluidClass.acceptable_args),
+    ))
+    for q,u in units.items():
+        if q not in FluidClass.acceptable_args:
+            FluidClass.register(q,u,constant=q in constants)
+    return FluidClass
+
+
+def _init_worker(factory_args,units,constants):
+    ''' create the fluid class of a worker process exactly once '''
+    global _worker_class
+    _worker_class = _make_class(factory_args,units,constants)
+
+
+def _evaluate_chunk(inputs,properties,FluidClass=None):
+    ''' evaluate a chunk of inputs as batch. For each point of state
+        that is nan in the batch, the errormessage is determined from a
+        single point of state.
+    '''
+    FluidClass = _worker_class if FluidClass is None else FluidClass
+    batch = FluidClass.batch(**inputs)
+    values, errors = dict(), dict()
+    for q in properties:
+        try:
+            # a writable copy, the arrays of batches are read only views
+            v = np.array(getattr(batch,q),dtype=float)
+        except Exception:
+            v = np.full(batch.size,np.nan)
+        errors[q] = dict()
+        for i in np.flatnonzero(np.isnan(v)):
+            try:
+                v[i] = getattr(FluidClass(**{k: x[i] for k,x in inputs.items()}),q)
+            except Exception as e:
+                errors[q][int(i)] = str(e)
+        values[q] = v
+    return values, errors
+
+
+def _split(inputs,chunksize):
+    ''' yield (start, chunk of inputs) '''
+    n = len(next(iter(inputs.values())))
+    for start in range(0,n,chunksize):
+        yield start, {k: v[start:start+chunksize] for k,v in inputs.items()}
+
+
+def evaluate_many(FluidClass,inputs,properties=None,workers=None,chunksize=None,pool='process'):
+    ''' evaluate properties for all points of state defined by inputs.
+
+        FluidClass is a class created by fluid_factory(...), inputs is a
+        dict of arrays (or values that can be broadcast against each
+        other) and properties is a list of registered properties
+        (default: all properties in FluidClass.acceptable_args).
+
+        workers is the number of processes or threads (default:
+        os.cpu_count()) of the pool ('process' or 'thread'). With
+        workers=1, all points of state are evaluated in this thread.
+        chunksize is the number of points of state of a task.
+    '''
+    if not hasattr(FluidClass,'_factory_args'):
+        raise Exception(f'{FluidClass} is not created by fluid_factory(...)')
+    if pool not in ('process','thread'):
+        raise Exception(f'pool must be "process" or "thread", not {pool!r}')
+    units = FluidClass.acceptable_args
+    properties = list(units) if properties is None else list(properties)
+    with_units = issubclass(FluidClass,Units)
+
+    # the workers use the class without units, so inputs are
+    # converted to the units of acceptable_args in this process
+    magnitudes = [
+        np.asarray(v.m_as(units[k]) if _is_quantity(v) else v,dtype=float)
+        for k,v in inputs.items()
+    ]
+    shape = np.broadcast_shapes(*(m.shape for m in magnitudes))
+    flat = {
+        k: np.ascontiguousarray(np.broadcast_to(m,shape).ravel())
+        for k,m in zip(inputs,magnitudes)
+    }
+    n = int(np.prod(shape))
+
+    workers = os.cpu_count() if workers is None else workers
+    if chunksize is None:
+        chunksize = max(1,math.ceil(n/(4*workers)))
+
+    values = {q: np.empty(n) for q in properties}
+    errors = {q: dict() for q in properties}
+    def collect(start,result):
+        chunk_values, chunk_errors = result
+        for q in properties:
+            values[q][start:start+len(chunk_values[q])] = chunk_values[q]
+            errors[q].update({start+i: e for i,e in chunk_errors[q].items()})
+
+    if workers == 1 or n <= chunksize:
+        LocalClass = _make_class(FluidClass._factory_args,units,FluidClass._constant_args)
+        for start,chunk in _split(flat,chunksize):
+            collect(start,_evaluate_chunk(chunk,properties,LocalClass))
+    elif pool == 'thread':
+        # the threads share the class, each chunk is a batch of its own
+        LocalClass = _make_class(FluidClass._factory_args,units,FluidClass._constant_args)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                (start,executor.submit(_evaluate_chunk,chunk,properties,LocalClass))
+                for start,chunk in _split(flat,chunksize)
+            ]
+            for start,future in futures:
+                collect(start,future.result())
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(FluidClass._factory_args,dict(units),FluidClass._constant_args),
+        ) as executor:
+            futures = [
+                (start,executor.submit(_evaluate_chunk,chunk,properties))
+                for start,chunk in _split(flat,chunksize)
+            ]
+            for start,future in futures:
+                collect(start,future.result())
+
+    values = {q: v.reshape(shape) for q,v in values.items()}
+    if with_units:
+        Q_ = get_ureg().Quantity
+        values = {q: Q_(v,units[q]) for q,v in values.items()}
+    return Evaluation(values,errors)
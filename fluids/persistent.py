@@ -0,0 +1,259 @@
+''' A persistent memo cache for properties of points of state in SQLite.
+
+    The LRU memo cache of cache.py lives in one process. PersistentCache
+    keeps the values in a SQLite database, so that they are shared by
+    all processes on a host and by later sessions, e.g.
+
+    from fluids import fluid_factory, enable_persistent_cache
+    enable_persistent_cache(max_bytes=100_000_000)
+    Air = fluid_factory('Air')
+    Air(T=273.15,P=1e5).H # determined once, then taken from the database
+
+    The key of a value is (namespace, inputs, arg, version). The namespace
+    is the fluid, the backend, the engine and the options of the engine
+    from the arguments of fluid_factory(...), the inputs are the
+    (normalized) _arg_list of the point of state, the version is the
+    version of CoolProp that determined the value. Processes with other
+    versions of CoolProp can share the database, they never see (or
+    delete) the values of each other. Values of versions that are no
+    longer used are deleted by the eviction of the oldest values.
+    Values that are nan (e.g. of states that can not be determined) are
+    stored, too, so they are not determined again.
+
+    The database uses write-ahead logging, so readers do not block the
+    writer. New values are written in transactions of flush_every values
+    and when the process exits. If the database is larger than max_bytes,
+    the oldest values are deleted.
+'''
+import math
+import os
+import sqlite3
+import threading
+import weakref
+from multiprocessing import util
+
+from .cache import normalize
+from .fluids import Point_of_State, _freeze, _coolprop
+
+
+# version of the layout of the database
+schema_version = 4
+
+
+def default_path():
+    ''' database file, defined by the environment variable
+        FLUIDS_CACHE_FILE or ~/.cache/fluids/states.sqlite
+    '''
+    return os.environ.get(
+        'FLUIDS_CACHE_FILE',
+        os.path.join(os.path.expanduser('~'),'.cache','fluids','states.sqlite')
+    )
+
+
+def namespace(cls):
+    ''' return the persistent namespace of the values of points of
+        state of cls or None, if cls is not created by fluid_factory(...)
+    '''
+    factory_args = getattr(cls,'_factory_args',None)
+    if factory_args is None:
+        return None
+    fluid, kwargs = factory_args
+    return repr((
+        fluid,kwargs.get('backend'),kwargs.get('engine','PropsSI'),
+        _freeze(kwargs.get('engine_options',dict())),
+        _freeze(kwargs.get('saturation_table',False))
+    ))
+
+
+class PersistentCache():
+    ''' memo cache with the interface of cache.LRUCache for values of
+        _generic_function(arg,*arg_list) in the SQLite database path.
+
+        If digits is not None, all float inputs are rounded to digits
+        significant digits before they are used in a key.
+    '''
+    def __init__(self,path=None,max_bytes=1_000_000_000,digits=None,flush_every=100,timeout=30):
+        self.path = default_path() if path is None else path
+        self.max_bytes = max_bytes
+        self.digits = digits
+        self.flush_every = flush_every
+        self.timeout = timeout
+        self.version = f'{schema_version}:{_coolprop().get_global_param_string("version")}'
+        self._namespaces = dict()
+        self._pending = dict()
+        self._connection = None
+        self._pid = None
+        self._finalizer_pid = None
+        self._lock = threading.RLock()
+        self.hits = self.misses = self.evictions = 0
+        self._connect()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.path!r},max_bytes={self.max_bytes},digits={self.digits})'
+
+    def __len__(self):
+        self.flush()
+        with self._lock:
+            return self._db().execute('SELECT COUNT(*) FROM props WHERE version=?',(self.version,)).fetchone()[0]
+
+    def _connect(self):
+        ''' open the database in this process and create the tables '''
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)),exist_ok=True)
+        connection = sqlite3.connect(self.path,timeout=self.timeout,isolation_level=None,check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            if connection.execute('PRAGMA user_version').fetchone()[0] != schema_version:
+                # the table of an older layout is replaced
+                connection.execute('DROP TABLE IF EXISTS props')
+                connection.execute(f'PRAGMA user_version = {schema_version}')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS props ('
+                'namespace TEXT, inputs TEXT, arg TEXT, value REAL, version TEXT, '
+                'UNIQUE (namespace, inputs, arg, version))'
+            )
+        self._connection = connection
+        self._pid = os.getpid()
+        # values of the parent process are not written by a child process
+        self._pending = dict()
+        # write the new values when this process exits. Unlike atexit,
+        # this works for worker processes of multiprocessing, too. Once
+        # per process, the finalizer only keeps a weak reference
+        if self._finalizer_pid != self._pid:
+            util.Finalize(None,_flush,args=(weakref.ref(self),),exitpriority=10)
+            self._finalizer_pid = self._pid
+
+    def _db(self):
+        ''' return the connection of this process. A forked
+            process must not use the connection of its parent.
+        '''
+        if self._pid != os.getpid():
+            self._connect()
+        return self._connection
+
+    def key(self,point,arg):
+        ''' return the key (namespace, inputs, arg) of property arg of point '''
+        cls = type(point)
+        ns = self._namespaces.get(cls)
+        if ns is None:
+            ns = self._namespaces[cls] = namespace(cls)
+        return (ns, repr(normalize(point._arg_list,self.digits)), arg)
+
+    def lookup(self,point,arg):
+        ''' return value of property arg of point. The value is
+            determined by point._backend(arg) if it is not cached.
+        '''
+        key = self.key(point,arg)
+        if key[0] is None:
+            return point._backend(arg)
+        with self._lock:
+            db = self._db()
+            v = self._pending.get(key)
+            if v is None:
+                row = db.execute(
+                    'SELECT value FROM props WHERE namespace=? AND inputs=? AND arg=? AND version=?',
+                    (*key,self.version)
+                ).fetchone()
+                if row is not None:
+                    # SQLite stores nan as NULL
+                    v = math.nan if row[0] is None else row[0]
+        if v is None:
+            self.misses += 1
+            # exceptions are raised and not cached
+            v = point._backend(arg)
+            with self._lock:
+                self._pending[key] = v
+                if len(self._pending) >= self.flush_every:
+                    self.flush()
+            return v
+        self.hits += 1
+        return v
+
+    def flush(self):
+        ''' write all new values to the database and evict the
+            oldest values, if the database is larger than max_bytes
+        '''
+        with self._lock:
+            if not self._pending or self._pid != os.getpid():
+                return
+            rows = [(*key,v,self.version) for key,v in self._pending.items()]
+            db = self._connection
+            with db:
+                db.execute('BEGIN IMMEDIATE')
+                db.executemany('INSERT OR IGNORE INTO props VALUES (?,?,?,?,?)',rows)
+                self._evict(db)
+            self._pending.clear()
+
+    def _evict(self,db):
+        ''' delete the oldest values until the used pages of the
+            database are below 90 % of max_bytes
+        '''
+        page_size = db.execute('PRAGMA page_size').fetchone()[0]
+        pages = db.execute('PRAGMA page_count').fetchone()[0] - db.execute('PRAGMA freelist_count').fetchone()[0]
+        used = pages*page_size
+        if used <= self.max_bytes:
+            return
+        count = db.execute('SELECT COUNT(*) FROM props').fetchone()[0]
+        n = int(count*(1 - 0.9*self.max_bytes/used)) + 1
+        db.execute('DELETE FROM props WHERE rowid IN (SELECT rowid FROM props ORDER BY rowid LIMIT ?)',(n,))
+        self.evictions += n
+
+    def clear(self,cls=None):
+        ''' delete all values of this version of CoolProp or, if cls is
+            given, only the values of points of state of the fluid class cls
+        '''
+        self.flush()
+        with self._lock:
+            db = self._db()
+            with db:
+                if cls is None:
+                    db.execute('DELETE FROM props WHERE version=?',(self.version,))
+                else:
+                    db.execute('DELETE FROM props WHERE namespace=? AND version=?',(namespace(cls),self.version))
+
+    @property
+    def stats(self):
+        ''' return dict of statistics of the cache '''
+        calls = self.hits + self.misses
+        currsize = len(self)
+        with self._lock:
+            db = self._db()
+            size = db.execute('PRAGMA page_count').fetchone()[0]*db.execute('PRAGMA page_size').fetchone()[0]
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            hit_ratio=self.hits/calls if calls else 0.0,
+            currsize=currsize,
+            bytes=size,
+            max_bytes=self.max_bytes,
+        )
+
+    def reset_stats(self):
+        self.hits = self.misses = self.evictions = 0
+
+    def close(self):
+        ''' write all new values and close the database '''
+        self.flush()
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+            self._pid = None
+
+
+def _flush(ref):
+    ''' flush the cache ref() at the exit of the process, if it still exists '''
+    cache = ref()
+    if cache is not None:
+        cache.flush()
+
+
+def enable_persistent_cache(path=None,max_bytes=1_000_000_000,digits=None,cls=Point_of_State,**kwargs):
+    ''' enable a PersistentCache for all points of state of cls and
+        its subclasses (default: all points of state) and return it.
+        disable_cache(cls) disables it.
+    '''
+    cls._memo = PersistentCache(path=path,max_bytes=max_bytes,digits=digits,**kwargs)
+    return cls._memo
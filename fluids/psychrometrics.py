@@ -0,0 +1,208 @@
+''' Ideal gas psychrometrics for the engine 'ideal' of humid air.
+
+    CP.HAPropsSI uses a real gas model of humid air that is solved
+    iteratively. For the usual range of HVAC applications, the ideal gas
+    equations of the ASHRAE Handbook - Fundamentals (2017, chapter 1)
+    are accurate enough and much faster. They are implemented here with
+    NumPy, so that they can be used for batches of points of state:
+
+        HA = fluid_factory('HumidAir',engine='ideal')
+
+    The properties T, W, R, H, B, D, Vda, Vha, C, P_w and psi_w are
+    determined from the ideal gas equations. All other properties (e.g. S,
+    M and K) are determined by CP.HAPropsSI.
+
+    The saturation pressure of water vapour is determined over ice below
+    0 °C and over liquid water above 0 °C (ASHRAE eq. 5 and 6). The
+    enhancement factor of the real gas model is neglected.
+'''
+import math
+
+import CoolProp.CoolProp as CP
+import numpy as np
+
+
+epsilon = 0.621945  # M_Water/M_Air
+R_da = 287.042      # J/kg/K, gas constant of dry air
+
+# range of validity of the saturation pressure equations
+T_min, T_max = 173.15, 473.15
+
+
+def saturation_pressure(T):
+    ''' saturation pressure (Pa) of water vapour at temperature T (K)
+        over ice (T < 273.15 K) or liquid water, ASHRAE eq. 5 and 6
+    '''
+    T = np.asarray(T,dtype=float)
+    ln_ice = (
+        -5.6745359e3/T + 6.3925247 - 9.6778430e-3*T + 6.2215701e-7*T**2
+        + 2.0747825e-9*T**3 - 9.4840240e-13*T**4 + 4.1635019*np.log(T)
+    )
+    ln_liquid = (
+        -5.8002206e3/T + 1.3914993 - 4.8640239e-2*T + 4.1764768e-5*T**2
+        - 1.4452093e-8*T**3 + 6.5459673*np.log(T)
+    )
+    return np.exp(np.where(T < 273.15,ln_ice,ln_liquid))
+
+
+def _bisect(f,target,lo,hi,iterations=48):
+    ''' solve f(x) = target for a monotonic function f on [lo,hi].
+        All arguments may be arrays. Values without a solution in
+        [lo,hi] are nan.
+    '''
+    target = np.asarray(target,dtype=float)
+    lo, hi = np.broadcast_arrays(np.asarray(lo,dtype=float),np.asarray(hi,dtype=float),target)[:2]
+    lo, hi = lo.copy(), hi.copy()
+    with np.errstate(invalid='ignore',divide='ignore',over='ignore'):
+        f_lo, f_hi = f(lo), f(hi)
+        ok = (np.fmin(f_lo,f_hi) <= target) & (target <= np.fmax(f_lo,f_hi))
+        # sign is 1 for increasing and -1 for decreasing functions
+        sign = np.where(f_lo <= f_hi,1,-1)
+        for i in range(iterations):
+            mid = (lo+hi)/2
+            below = sign*f(mid) < sign*target
+            lo = np.where(below,mid,lo)
+            hi = np.where(below,hi,mid)
+    return np.where(ok,(lo+hi)/2,np.nan)
+
+
+def _W_of_p_w(p_w,P):
+    return epsilon*p_w/(P-p_w)
+
+
+def _p_w_of_W(W,P):
+    return P*W/(epsilon+W)
+
+
+def _H(T,W):
+    ''' specific enthalpy (J/kg dry air), ASHRAE eq. 32 '''
+    t = T-273.15
+    return 1006*t + W*(2501e3 + 1860*t)
+
+
+def _W_of_B(T,B,P):
+    ''' humidity ratio from dry bulb T and wet bulb B, ASHRAE eq. 33 and 35 '''
+    t, b = T-273.15, B-273.15
+    W_s = _W_of_p_w(saturation_pressure(B),P)
+    water = ((2501 - 2.326*b)*W_s - 1.006*(t-b))/(2501 + 1.86*t - 4.186*b)
+    ice = ((2830 - 0.24*b)*W_s - 1.006*(t-b))/(2830 + 1.86*t - 2.1*b)
+    return np.where(b < 0,ice,water)
+
+
+def _dew_point(p_w):
+    ''' temperature of saturation at partial pressure p_w '''
+    return _bisect(saturation_pressure,p_w,T_min,T_max)
+
+
+# humidity ratio W from temperature T, pressure P and value v of an input
+_W_from_T = {
+    'W': lambda T,P,v: v,
+    'psi_w': lambda T,P,v: epsilon*v/(1-v),
+    'P_w': lambda T,P,v: _W_of_p_w(v,P),
+    'D': lambda T,P,v: _W_of_p_w(saturation_pressure(v),P),
+    'R': lambda T,P,v: _W_of_p_w(v*saturation_pressure(T),P),
+    'H': lambda T,P,v: (v - 1006*(T-273.15))/(2501e3 + 1860*(T-273.15)),
+    'Vda': lambda T,P,v: (v*P/(R_da*T) - 1)/1.607858,
+    'B': lambda T,P,v: _W_of_B(T,v,P),
+}
+
+# inputs that determine W without T
+_W_inputs = ('W','psi_w','P_w','D')
+
+
+def _output(output,T,W,P):
+    ''' value of output for the point of state (T,W,P) '''
+    if output == 'T':
+        return T
+    if output == 'W':
+        return W
+    if output == 'P':
+        return P + 0*T
+    if output in ['P_w','psi_w','R','D']:
+        p_w = _p_w_of_W(W,P)
+        if output == 'P_w':
+            return p_w
+        if output == 'psi_w':
+            return p_w/P
+        if output == 'R':
+            return p_w/saturation_pressure(T)
+        return _dew_point(p_w)
+    if output == 'H':
+        return _H(T,W)
+    if output == 'Vda':
+        return R_da*T*(1 + 1.607858*W)/P
+    if output == 'Vha':
+        return R_da*T*(1 + 1.607858*W)/P/(1+W)
+    if output == 'C':
+        return 1006 + 1860*W
+    if output == 'B':
+        # the wet bulb temperature is below T (or equal to T for saturated
+        # air). T_min-50 brackets the solution also for T close to T_min
+        return _bisect(lambda B: _W_of_B(T,B,P),W,T_min-50,T+1e-6)
+    return None
+
+
+def state(P,**inputs):
+    ''' return temperature T and humidity ratio W of the point of state
+        determined by P and two other inputs
+    '''
+    (k1,v1), (k2,v2) = inputs.items()
+    if k2 == 'T' or k2 in _W_inputs:
+        (k1,v1), (k2,v2) = (k2,v2), (k1,v1)
+    if k1 == 'T':
+        return v1, _W_from_T[k2](v1,P,v2)
+    if k1 in _W_inputs:
+        W = _W_from_T[k1](None,P,v1)
+        if k2 == 'H':
+            T = 273.15 + (v2 - 2501e3*W)/(1006 + 1860*W)
+        elif k2 == 'Vda':
+            T = v2*P/(R_da*(1 + 1.607858*W))
+        else:
+            T = _bisect(lambda T: _output(k2,T,W,P),v2,T_min,T_max)
+        return T, W
+    # neither T nor W is given, solve for T with W(T) from the first input.
+    # Above the boiling temperature at P, W(T) is not defined for R
+    T_boil = _dew_point(P)
+    T_boil = np.where(np.isnan(T_boil),T_max,T_boil)
+    T = _bisect(lambda T: _output(k2,T,_W_from_T[k1](T,P,v1),P),v2,T_min,T_boil)
+    return T, _W_from_T[k1](T,P,v1)
+
+
+def ideal_HAPropsSI(output,name1,value1,name2,value2,name3,value3):
+    ''' ideal gas replacement of CP.HAPropsSI with the same signature.
+        One of the inputs must be P.
+
+        For arrays, points of state that can not be determined are nan.
+        For scalars, a ValueError is raised like in CP.HAPropsSI.
+    '''
+    inputs = {
+        name1: np.asarray(value1,dtype=float),
+        name2: np.asarray(value2,dtype=float),
+        name3: np.asarray(value3,dtype=float),
+    }
+    scalar = not any(np.ndim(v) for v in inputs.values())
+    if 'P' not in inputs or any(k not in _W_from_T and k != 'T' for k in inputs if k != 'P'):
+        raise ValueError(f'inputs {name1}, {name2}, {name3} are not supported by ideal_HAPropsSI')
+    P = inputs.pop('P')
+    if output in inputs:
+        res = inputs[output]
+    else:
+        with np.errstate(invalid='ignore',divide='ignore'):
+            T, W = state(P,**inputs)
+            res = _output(output,T,W,P)
+            if res is None:
+                # not an ideal gas property, use the real gas model
+                return CP.HAPropsSI(output,name1,value1,name2,value2,name3,value3)
+            # only states in the range of the equations are valid
+            valid = (T_min <= T) & (T <= T_max) & (W >= 0)
+            if 'R' in inputs:
+                valid &= (0 <= inputs['R']) & (inputs['R'] <= 1)
+            res = np.where(valid,res,np.nan)
+    if scalar:
+        res = float(res)
+        if math.isnan(res):
+            raise ValueError(
+                f'{output} can not be determined for {name1}={value1}, '
+                f'{name2}={value2}, {name3}={value3}'
+            )
+    return res
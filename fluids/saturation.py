@@ -0,0 +1,299 @@
+''' Saturation curve of a fluid as table with cubic splines.
+
+    A SaturationTable holds the properties of saturated liquid (Q=0) and
+    saturated vapor (Q=1) of a fluid at nodes between the triple point
+    and (close to) the critical point. The nodes are dense near both
+    ends of the curve. Between the nodes, the properties are cubic Hermite
+    splines in T. The derivatives at the nodes are determined from the
+    values at the neighbouring nodes. The saturation temperature at a
+    pressure is a cubic Hermite spline in ln(P).
+
+    The maximum relative error of each property is determined when the
+    table is built by comparing the splines with CP.PropsSI in the middle
+    of all intervals. It is stored in SaturationTable.max_rel_error.
+
+    R134a = fluid_factory('R134a')
+    sat = R134a.saturation() # built once per fluid on first use
+    sat.properties(T=263.15,Q=1) # {'P': ..., 'H': ..., ...}
+    sat.quality(P=3e5,H=3e5) # Q, < 0 for liquid, > 1 for vapor
+    sat.phase(P=3e5,T=300.0) # 'gas'
+
+    With fluid_factory(fluid,saturation_table=True), points of state in
+    the two phase region are determined from the table, if the inputs are
+    P or T together with Q, H, S or U, see SaturationFunction.
+'''
+from bisect import bisect_right
+from functools import lru_cache
+import math
+
+import CoolProp.CoolProp as CP
+import numpy as np
+
+
+# properties of saturated liquid and vapor in the table
+saturation_outputs = ('P','T','D','H','S','U','C','CVMASS','A','L','V')
+
+# properties of a point of state in the two phase region that are the
+# mass weighted means of the saturated liquid and vapor
+_mixed = ('H','S','U')
+
+# properties that change exponentially with T are interpolated as ln(value)
+_logarithmic = ('P','D','V','L')
+
+
+def _hermite(x,z,dz,xq):
+    ''' value of the cubic Hermite spline with values z and derivatives dz
+        at the nodes x at xq. xq is a float (evaluated without numpy) or
+        an array. xq must be in [x[0], x[-1]].
+    '''
+    if isinstance(xq,np.ndarray):
+        i = np.clip(np.searchsorted(x,xq,side='right')-1,0,len(x)-2)
+        x0, h = x[i], x[i+1]-x[i]
+        z0, z1, d0, d1 = z[i], z[i+1], dz[i]*h, dz[i+1]*h
+    else:
+        i = min(max(bisect_right(x,xq)-1,0),len(x)-2)
+        x0, h = x[i], x[i+1]-x[i]
+        z0, z1, d0, d1 = z[i], z[i+1], dz[i]*h, dz[i+1]*h
+    t = (xq-x0)/h
+    t2 = t*t
+    t3 = t2*t
+    return (2*t3-3*t2+1)*z0 + (t3-2*t2+t)*d0 + (-2*t3+3*t2)*z1 + (t3-t2)*d1
+
+
+class SaturationTable():
+    ''' properties of saturated liquid and vapor of fluid at n nodes
+        between the triple point (or Tmin) and Tcrit*(1-critical_gap).
+
+        Properties that are not finite at all nodes (e.g. transport
+        properties of some fluids) are not in the table.
+    '''
+    def __init__(self,fluid,n=200,critical_gap=1e-3):
+        self.fluid = fluid
+        self.n = n
+        T_crit = self.T_crit = CP.PropsSI('Tcrit',fluid)
+        self.P_crit = CP.PropsSI('Pcrit',fluid)
+        try:
+            T_low = max(CP.PropsSI('Ttriple',fluid),CP.PropsSI('Tmin',fluid))
+        except ValueError:
+            T_low = CP.PropsSI('Tmin',fluid)
+        T_high = T_crit*(1-critical_gap)
+        # nodes are dense near the triple point and denser near the
+        # critical point
+        s = (1-np.cos(np.linspace(0,np.pi,n)))/2
+        T = T_high - (T_high-T_low)*(1-s)**2
+
+        values = dict()
+        for q in (0,1):
+            for o in saturation_outputs:
+                z = T if o == 'T' else np.asarray(CP.PropsSI(o,'T',T,'Q',q,fluid),dtype=float)
+                if np.all(np.isfinite(z)):
+                    values[(o,q)] = z
+        self.outputs = tuple(o for o in saturation_outputs if (o,0) in values and (o,1) in values)
+        self.T = T
+        self.T_range = (float(T[0]),float(T[-1]))
+        self.values = {k: v for k,v in values.items() if k[0] in self.outputs}
+        # values (or their logarithms) and their derivatives at the nodes
+        self._nodes = dict()
+        for (o,q),v in self.values.items():
+            z = np.log(v) if o in _logarithmic else v
+            self._nodes[(o,q)] = (z,np.gradient(z,T))
+        # saturation temperature as function of ln(P) of the liquid
+        self.lnP = np.log(self.values[('P',0)])
+        self.P_range = (float(self.values[('P',0)][0]),float(self.values[('P',0)][-1]))
+        self.dT_dlnP = np.gradient(T,self.lnP)
+
+        # lists for the evaluation of single points without numpy
+        self._lists = {k: (z.tolist(),dz.tolist()) for k,(z,dz) in self._nodes.items()}
+        self._T_list = T.tolist()
+        self._lnP_list = self.lnP.tolist()
+        self._dT_dlnP_list = self.dT_dlnP.tolist()
+        self.max_rel_error = self._errors()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.fluid!r},n={self.n})'
+
+    def _errors(self):
+        ''' return {(output, Q): maximum relative error} of the splines
+            in the middle of the intervals
+        '''
+        T = (self.T[1:]+self.T[:-1])/2
+        res = dict()
+        for (o,q),z in self.values.items():
+            exact = np.asarray(CP.PropsSI(o,'T',T,'Q',q,self.fluid),dtype=float)
+            ok = np.isfinite(exact) & (exact != 0)
+            res[(o,q)] = float(np.max(np.abs(self.saturated(o,q,T=T)[ok]/exact[ok]-1)))
+        return res
+
+    def T_sat(self,P):
+        ''' return the saturation temperature at P (nan outside of the table) '''
+        if isinstance(P,np.ndarray) or np.ndim(P):
+            P = np.asarray(P,dtype=float)
+            ok = (P >= self.P_range[0]) & (P <= self.P_range[1])
+            lnP = np.log(np.where(ok,P,self.P_range[0]))
+            return np.where(ok,_hermite(self.lnP,self.T,self.dT_dlnP,lnP),np.nan)
+        if not self.P_range[0] <= P <= self.P_range[1]:
+            return math.nan
+        return _hermite(self._lnP_list,self._T_list,self._dT_dlnP_list,math.log(P))
+
+    def saturated(self,output,Q,T=None,P=None):
+        ''' return output of saturated liquid (Q=0) or vapor (Q=1) at
+            T or P (floats or arrays). Values outside of the table are nan.
+        '''
+        if T is None:
+            T = self.T_sat(P)
+        if isinstance(T,np.ndarray) or np.ndim(T):
+            T = np.asarray(T,dtype=float)
+            ok = (T >= self.T_range[0]) & (T <= self.T_range[1])
+            z = _hermite(self.T,*self._nodes[(output,Q)],np.where(ok,T,self.T_range[0]))
+            return np.where(ok,np.exp(z) if output in _logarithmic else z,np.nan)
+        if not self.T_range[0] <= T <= self.T_range[1]:
+            return math.nan
+        z = _hermite(self._T_list,*self._lists[(output,Q)],T)
+        return math.exp(z) if output in _logarithmic else z
+
+    def properties(self,T=None,P=None,Q=0,outputs=None,exact=False):
+        ''' return dict {output: value} of the point of state with
+            quality Q (0 <= Q <= 1) at T or P. For 0 < Q < 1, only
+            P, T, D, H, S and U are defined. With exact=True, the values
+            are determined by CP.PropsSI instead of the table.
+        '''
+        if outputs is None:
+            outputs = self.outputs if Q in (0,1) else ('P','T','D') + _mixed
+        name, value = ('T',T) if P is None else ('P',P)
+        if exact:
+            return {o: CP.PropsSI(o,name,value,'Q',Q,self.fluid) for o in outputs}
+        if T is None:
+            T = self.T_sat(P)
+        res = dict()
+        for o in outputs:
+            if o == name:
+                res[o] = value
+            elif Q in (0,1):
+                res[o] = self.saturated(o,Q,T=T)
+            elif o in _mixed or o in ('P','T'):
+                z0, z1 = self.saturated(o,0,T=T), self.saturated(o,1,T=T)
+                res[o] = z0 + Q*(z1-z0)
+            elif o == 'D':
+                res[o] = 1/((1-Q)/self.saturated('D',0,T=T) + Q/self.saturated('D',1,T=T))
+            else:
+                raise Exception(f'{o} is not defined for the quality Q = {Q}')
+        return res
+
+    def quality(self,T=None,P=None,**kwargs):
+        ''' return the quality Q of the point of state at T or P with one
+            of H, S, U or D, e.g. quality(P=3e5,H=3e5). Q < 0 is liquid,
+            Q > 1 is vapor (the linear extrapolation of H, S, U or 1/D).
+        '''
+        if len(kwargs) != 1:
+            raise Exception(f'quality needs one of H, S, U or D, not {list(kwargs)}')
+        (name, z), = kwargs.items()
+        if T is None:
+            T = self.T_sat(P)
+        if name == 'D':
+            v0, v1 = 1/self.saturated('D',0,T=T), 1/self.saturated('D',1,T=T)
+            return (1/z-v0)/(v1-v0)
+        if name not in _mixed:
+            raise Exception(f'quality needs one of H, S, U or D, not {name}')
+        z0, z1 = self.saturated(name,0,T=T), self.saturated(name,1,T=T)
+        return (z-z0)/(z1-z0)
+
+    def phase(self,T=None,P=None,**kwargs):
+        ''' return 'liquid', 'twophase', 'gas' or 'supercritical' (above
+            the critical pressure or temperature) of the point of state at
+            P and T or at T or P with one of H, S, U or D. Below the
+            critical point, but outside of the table (e.g. between the
+            highest node and the critical point), it is 'unknown'.
+        '''
+        if T is not None and P is not None:
+            if P > self.P_crit or T > self.T_crit:
+                return 'supercritical'
+            T_sat = self.T_sat(P)
+            if math.isnan(T_sat):
+                return 'unknown'
+            return 'liquid' if T < T_sat else 'gas'
+        q = self.quality(T=T,P=P,**kwargs)
+        if math.isnan(q):
+            return 'unknown'
+        return 'liquid' if q < 0 else 'gas' if q > 1 else 'twophase'
+
+
+@lru_cache(maxsize=None)
+def saturation_table(fluid,n=200):
+    ''' return the SaturationTable of fluid, built once per process '''
+    return SaturationTable(fluid,n=n)
+
+
+class SaturationFunction():
+    ''' SaturationFunction has the signature of CP.PropsSI. Points of
+        state in the two phase region defined by P or T and one of Q, H,
+        S or U are determined from the SaturationTable of fluid, all
+        other calls are passed to engine.
+
+        For 0 < Q < 1, P, T, Q, D, H, S and U are determined from the
+        table. For Q = 0 and Q = 1, all outputs of the table.
+        If tolerance is given, only the properties with a maximum relative
+        error of the table below tolerance are determined from the table
+        (and used as inputs).
+    '''
+    def __init__(self,engine,fluid,n=200,tolerance=None):
+        self.engine = engine
+        self.fluid = fluid
+        self.n = n
+        self.tolerance = tolerance
+        self._accurate = None
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.engine!r},{self.fluid!r})'
+
+    @property
+    def table(self):
+        ''' the SaturationTable, built on first use '''
+        return saturation_table(self.fluid,self.n)
+
+    @property
+    def accurate(self):
+        ''' the properties that are determined from the table '''
+        if self._accurate is None:
+            table = self.table
+            errors = table.max_rel_error
+            self._accurate = frozenset(('Q',) + tuple(
+                o for o in table.outputs
+                if self.tolerance is None or max(errors[(o,0)],errors[(o,1)]) <= self.tolerance
+            ))
+        return self._accurate
+
+    def _two_phase(self,output,name1,value1,name2,value2):
+        ''' return the value from the table or None '''
+        if name1 not in ('P','T'):
+            name1, value1, name2, value2 = name2, value2, name1, value1
+        if name1 not in ('P','T') or name2 not in ('Q',) + _mixed:
+            return None
+        accurate = self.accurate
+        if output not in accurate or name1 not in accurate or name2 not in accurate:
+            return None
+        table = self.table
+        T = value1 if name1 == 'T' else table.T_sat(value1)
+        if not table.T_range[0] <= T <= table.T_range[1]:
+            return None
+        if name2 == 'Q':
+            Q = value2
+        else:
+            Q = table.quality(T=T,**{name2: value2})
+        if not 0 <= Q <= 1:
+            return None
+        if output == 'Q':
+            return Q
+        if output in (name1,name2):
+            return value1 if output == name1 else value2
+        if Q in (0,1):
+            return table.saturated(output,int(Q),T=T)
+        if output in ('P','T','D') + _mixed:
+            return table.properties(T=T,Q=Q,outputs=(output,))[output]
+        return None
+
+    def __call__(self,output,name1,value1,name2,value2,fluid=None):
+        if not (np.ndim(value1) or np.ndim(value2)):
+            v = self._two_phase(output,name1,value1,name2,value2)
+            if v is not None:
+                return v
+        return self.engine(output,name1,value1,name2,value2,self.fluid if fluid is None else fluid)
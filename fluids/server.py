@@ -0,0 +1,432 @@
+''' A local property server and its client.
+
+    Services that need properties of fluids can share one process with
+    warm classes and caches instead of importing fluids (and CoolProp)
+    each. The server listens on a Unix socket or on a TCP port of
+    localhost:
+
+        python -m fluids.server --unix /tmp/fluids.sock
+        python -m fluids.server --port 8765
+
+    and the client mirrors fluid_factory(...) and the properties of
+    points of state:
+
+        client = Client(path='/tmp/fluids.sock')
+        Air = client.fluid_factory('Air')
+        p = Air(T=300.0,P=1e5)
+        p.H, p.outputs('D','S'), p.args
+
+    The protocol is one JSON object per line in both directions.
+    A request is
+
+        {"id": 1, "fluid": "Air", "options": {}, "inputs": {"T": 300.0, "P": 1e5}, "outputs": ["H"]}
+
+    with the keyword arguments options of fluid_factory(...) (only
+    server_options, all values are magnitudes in the units of acceptable_args).
+    The response is {"id": 1, "values": {"H": ...}, "errors": {}}, with a
+    message for each output that can not be determined in "errors".
+    {"id": 2, "op": "describe", "fluid": "Air"} returns acceptable_args and
+    constants of the class, {"id": 3, "op": "stats"} the statistics of
+    the server. Responses of pipelined requests may arrive out of order,
+    they are matched by their id. A request that fails has "error".
+
+    The server
+      - coalesces identical concurrent requests, they wait for the same
+        evaluation,
+      - keeps the last maxsize results of all clients in one LRU cache,
+      - collects single point requests of the same class, inputs and
+        outputs for batch_window seconds (or up to max_batch requests) and
+        evaluates them as one batch.
+'''
+import argparse
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import json
+import math
+import os
+import socket
+
+import numpy as np
+
+from .fluids import fluid_factory, PropertyError, _coolprop, _freeze
+from .parallel import _evaluate_chunk
+
+
+# keyword arguments of fluid_factory(...) that clients may use. Others,
+# like engine_options (e.g. the directory of the files of a table), are
+# rejected
+server_options = ('engine','backend','validation','saturation_table','P_default')
+
+
+class PropertyServer():
+    ''' asyncio server of the properties of points of state, see the
+        module docstring. With path, the server listens on the Unix
+        socket path, otherwise on host:port (port=0: a free port, see
+        address after start()).
+
+        With workers=0, the batches are evaluated in the thread of the
+        event loop. With the GIL, a pool of workers threads only adds
+        switches of the GIL, they are meant for free-threaded builds.
+    '''
+    def __init__(self,path=None,host='127.0.0.1',port=0,batch_window=0.001,max_batch=1024,maxsize=100_000,workers=0):
+        self.path = path
+        self.host = host
+        self.port = port
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.maxsize = maxsize
+        self.address = None
+        self._server = None
+        self._executor = ThreadPoolExecutor(max_workers=workers) if workers else None
+        self._classes = dict()
+        self._cache = OrderedDict()
+        self._pending = dict()
+        self._queues = dict()
+        self._timers = dict()
+        self.reset_stats()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(address={self.address!r})'
+
+    def reset_stats(self):
+        self.requests = self.coalesced = self.hits = self.batches = self.points = 0
+
+    @property
+    def stats(self):
+        ''' return dict of statistics. coalesced requests waited for an
+            identical request, hits were found in the cache, points is
+            the number of evaluated points of state in batches.
+        '''
+        return dict(
+            requests=self.requests,
+            coalesced=self.coalesced,
+            hits=self.hits,
+            batches=self.batches,
+            points=self.points,
+            mean_batch=self.points/self.batches if self.batches else 0.0,
+            cached=len(self._cache),
+        )
+
+    async def start(self):
+        ''' start listening, return the address (path or (host, port)).
+            CoolProp is imported before, so the first request does not
+            wait for the import.
+        '''
+        _coolprop()
+        if self.path is not None:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self._server = await asyncio.start_unix_server(self._handle,path=self.path,limit=2**20)
+            self.address = self.path
+        else:
+            self._server = await asyncio.start_server(self._handle,self.host,self.port,limit=2**20)
+            self.address = self._server.sockets[0].getsockname()[:2]
+        return self.address
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        if self.path is not None and os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def fluid_class(self,fluid,options):
+        ''' return the fluid class (without units) of fluid and options '''
+        key = (fluid,_freeze(options))
+        FluidClass = self._classes.get(key)
+        if FluidClass is None:
+            for k in options:
+                if k not in server_options:
+                    raise Exception(f'the option {k} is not allowed, allowed options are {server_options}')
+            FluidClass = self._classes[key] = fluid_factory(fluid,**options)
+        return FluidClass
+
+    async def evaluate(self,fluid,inputs,outputs=None,options=None):
+        ''' return ({output: value}, {output: errormessage}) of the point
+            of state of fluid with inputs
+        '''
+        FluidClass = self.fluid_class(fluid,dict() if options is None else options)
+        outputs = tuple(FluidClass.acceptable_args) if outputs is None else tuple(outputs)
+        for k in (*inputs,*outputs):
+            if k not in FluidClass.acceptable_args:
+                raise Exception(f'{k} is not in acceptable_args of {FluidClass.__name__}')
+        self.requests += 1
+        # the same outputs in another order are the same request
+        outputs = tuple(sorted(set(outputs)))
+        names = tuple(inputs)
+        values = tuple(float(v) for v in inputs.values())
+        key = (FluidClass,names,values,outputs)
+        result = self._cache.get(key)
+        if result is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return result
+        future = self._pending.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+        future = self._pending[key] = asyncio.get_running_loop().create_future()
+        try:
+            self._enqueue((FluidClass,names,outputs),values,future)
+            result = await future
+            self._cache[key] = result
+            if len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+            return result
+        finally:
+            del self._pending[key]
+
+    def _enqueue(self,group,values,future):
+        ''' add the point of state to the queue of its group, the queue
+            is evaluated after batch_window seconds or with max_batch points
+        '''
+        queue = self._queues.get(group)
+        if queue is None:
+            queue = self._queues[group] = []
+            self._timers[group] = asyncio.get_running_loop().call_later(self.batch_window,self._flush,group)
+        queue.append((values,future))
+        if len(queue) >= self.max_batch:
+            self._flush(group)
+
+    def _flush(self,group):
+        ''' evaluate the queue of group. The timer of the queue is
+            cancelled, so it never flushes a later queue of group early
+        '''
+        timer = self._timers.pop(group,None)
+        if timer is not None:
+            timer.cancel()
+        queue = self._queues.pop(group,None)
+        if queue:
+            asyncio.ensure_future(self._evaluate_queue(group,queue))
+
+    async def _evaluate_queue(self,group,queue):
+        FluidClass, names, outputs = group
+        self.batches += 1
+        self.points += len(queue)
+        inputs = {k: np.array([values[i] for values,_ in queue]) for i,k in enumerate(names)}
+        try:
+            if self._executor is None:
+                values, errors = _evaluate_chunk(inputs,outputs,FluidClass)
+            else:
+                values, errors = await asyncio.get_running_loop().run_in_executor(
+                    self._executor,_evaluate_chunk,inputs,outputs,FluidClass
+                )
+        except Exception as e:
+            for _,future in queue:
+                future.set_exception(e)
+            return
+        for i,(_,future) in enumerate(queue):
+            future.set_result((
+                {q: float(values[q][i]) for q in outputs if i not in errors[q]},
+                {q: errors[q][i] for q in outputs if i in errors[q]},
+            ))
+
+    async def _respond(self,request):
+        ''' return the response to request (a dict) '''
+        op = request.get('op','evaluate')
+        if op == 'evaluate':
+            values, errors = await self.evaluate(
+                request['fluid'],request['inputs'],request.get('outputs'),request.get('options')
+            )
+            return dict(values=values,errors=errors)
+        if op == 'describe':
+            FluidClass = self.fluid_class(request['fluid'],request.get('options') or dict())
+            constants = dict()
+            for k in FluidClass._constant_args:
+                try:
+                    constants[k] = FluidClass._constant(k)
+                except Exception:
+                    pass
+            return dict(
+                acceptable_args=FluidClass.acceptable_args,
+                constants={k: v for k,v in constants.items() if math.isfinite(v)},
+            )
+        if op == 'stats':
+            return dict(stats=self.stats)
+        raise Exception(f'unknown op {op!r}')
+
+    async def _answer(self,line,writer):
+        request = dict()
+        try:
+            request = json.loads(line)
+            response = await self._respond(request)
+        except Exception as e:
+            response = dict(error=str(e))
+        response['id'] = request.get('id')
+        writer.write(json.dumps(response).encode()+b'\n')
+        try:
+            # back pressure of clients that do not read their responses
+            await writer.drain()
+        except (ConnectionResetError,BrokenPipeError):
+            pass
+
+    async def _handle(self,reader,writer):
+        ''' answer the requests of one connection '''
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.ensure_future(self._answer(line,writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        except (ConnectionResetError,BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+
+
+class Client():
+    ''' synchronous client of a PropertyServer on the Unix socket path or
+        on host:port
+    '''
+    def __init__(self,path=None,host='127.0.0.1',port=None,timeout=60):
+        if path is not None:
+            self._socket = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+            self._socket.settimeout(timeout)
+            self._socket.connect(path)
+        else:
+            self._socket = socket.create_connection((host,port),timeout=timeout)
+            self._socket.setsockopt(socket.IPPROTO_TCP,socket.TCP_NODELAY,1)
+        self._file = self._socket.makefile('rb')
+        self._id = 0
+        self._classes = dict()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self._socket.getpeername()!r})'
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.close()
+
+    def request(self,**request):
+        ''' send request and return the response, raise an Exception
+            if the request failed
+        '''
+        self._id += 1
+        request['id'] = self._id
+        self._socket.sendall(json.dumps(request).encode()+b'\n')
+        response = json.loads(self._file.readline())
+        if 'error' in response:
+            raise Exception(response['error'])
+        return response
+
+    def evaluate(self,fluid,inputs,outputs=None,**options):
+        ''' return ({output: value}, {output: errormessage}) '''
+        response = self.request(fluid=fluid,options=options,inputs=inputs,outputs=outputs)
+        return response['values'], response['errors']
+
+    @property
+    def stats(self):
+        return self.request(op='stats')['stats']
+
+    def fluid_factory(self,fluid,**options):
+        ''' return a RemoteFluid class of fluid, see fluid_factory(...) '''
+        key = (fluid,_freeze(options))
+        cls = self._classes.get(key)
+        if cls is None:
+            description = self.request(op='describe',fluid=fluid,options=options)
+            cls = self._classes[key] = type(fluid,(RemotePoint,),dict(
+                _client=self,
+                _fluid=fluid,
+                _options=options,
+                acceptable_args=description['acceptable_args'],
+                _constants=description['constants'],
+            ))
+        return cls
+
+
+class RemotePoint():
+    ''' point of state of a class returned by Client.fluid_factory(...).
+        Properties are requested from the server on first access and
+        kept in the point of state.
+    '''
+    def __init__(self,name=None,**kwargs):
+        self.name = name
+        self._inputs = {k: float(v) for k,v in kwargs.items()}
+        self._values = dict(self._inputs)
+        self._errors = dict()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self._inputs})'
+
+    def __getattr__(self,q):
+        if q.startswith('_') or q not in self.acceptable_args:
+            raise AttributeError(q)
+        v = self.outputs(q)[q]
+        if isinstance(v,PropertyError):
+            raise v
+        return v
+
+    def outputs(self,*args):
+        ''' return dict {arg: value or PropertyError} of args (default:
+            all properties), unknown values are requested with one request
+        '''
+        args = args or tuple(self.acceptable_args)
+        missing = [q for q in args if q not in self._values and q not in self._constants and q not in self._errors]
+        if missing:
+            values, errors = self._client.evaluate(self._fluid,self._inputs,missing,**self._options)
+            self._values.update(values)
+            self._errors.update(errors)
+        return {
+            q: self._values[q] if q in self._values else self._constants[q] if q in self._constants
+            else PropertyError(q,'error',self._errors.get(q,f'{q} is not defined'))
+            for q in args
+        }
+
+    @property
+    def args(self):
+        ''' return dict of all properties, raise the PropertyError of
+            the first property that can not be determined, like
+            Point_of_State.args
+        '''
+        res = self.outputs()
+        for v in res.values():
+            if isinstance(v,PropertyError):
+                raise v
+        return res
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='local property server of fluids')
+    parser.add_argument('--unix',help='path of the Unix socket')
+    parser.add_argument('--host',default='127.0.0.1')
+    parser.add_argument('--port',type=int,default=8765)
+    parser.add_argument('--batch-window',type=float,default=0.001,help='seconds to collect a batch')
+    parser.add_argument('--max-batch',type=int,default=1024)
+    parser.add_argument('--maxsize',type=int,default=100_000,help='size of the cache of results')
+    args = parser.parse_args(argv)
+    server = PropertyServer(
+        path=args.unix,host=args.host,port=args.port,
+        batch_window=args.batch_window,max_batch=args.max_batch,maxsize=args.maxsize,
+    )
+
+    async def serve():
+        print(f'fluids server on {await server.start()}',flush=True)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
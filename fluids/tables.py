@@ -0,0 +1,301 @@
+''' Tabulated properties of fluids for the engine 'table'.
+
+    A PropertyTable holds the values of the properties of a fluid on a
+    grid over (P,T) or (P,H). The grid is equidistant in ln(P) and in
+    T or H. Together with the values, the first and second derivatives
+    are stored at each node. A property at (x,y) is determined from the
+    nearest node (x_i,y_j) by a second order Taylor series expansion
+    (Tabular Taylor Series Expansion, TTSE), where x = ln(P):
+
+        z = z_ij + z_x*dx + z_y*dy + z_xx*dx**2/2 + z_yy*dy**2/2 + z_xy*dx*dy
+
+    The error of this expansion is of third order in the grid spacing.
+    The maximum relative error of each property is determined when
+    the table is built by comparing the table with CP.PropsSI at the
+    centers of all cells. It is stored in PropertyTable.max_rel_error.
+
+    A node is only used if all nodes used for its derivatives have finite
+    values and are on the same side of the saturation dome. Near the saturation dome, outside of the domain
+    of the table and for properties that are not tabulated, the exact
+    value from CP.PropsSI is returned instead.
+
+    Tables are stored as .npy files in a directory. They are loaded with
+    numpy.load(...,mmap_mode='r'), so all processes on a host that use
+    the same table share the read only pages of these files.
+
+    Water = fluid_factory(
+        'Water',
+        engine='table',
+        engine_options=dict(inputs=('P','H'),P=(1e5,1e7),H=(1e5,3.5e6))
+    )
+'''
+import hashlib
+import json
+import math
+import os
+import tempfile
+
+import CoolProp.CoolProp as CP
+import numpy as np
+
+from .engines import AbstractStateFunction, parameter_index
+
+
+# state dependent properties that are tabulated by default
+table_outputs = ('T','H','D','U','S','A','L','C','CVMASS','Z','V')
+
+def default_directory():
+    ''' directory for tables, defined by the environment variable
+        FLUIDS_TABLE_DIR or ~/.cache/fluids/tables
+    '''
+    return os.environ.get(
+        'FLUIDS_TABLE_DIR',
+        os.path.join(os.path.expanduser('~'),'.cache','fluids','tables')
+    )
+
+
+class PropertyTable():
+    ''' table of the properties outputs of fluid on a grid of inputs,
+        which is ('P','T') or ('P','H').
+
+        P, T and H are the ranges (min,max) of the inputs. They default
+        to the range of validity of the fluid for P and T and to the
+        range of H on the border of this (P,T) domain.
+
+        shape is the number of nodes in P and T or H direction.
+    '''
+    def __init__(self,fluid,inputs=('P','T'),shape=(200,200),outputs=table_outputs,
+                 directory=None,P=None,T=None,H=None):
+        if tuple(inputs) not in [('P','T'),('P','H')]:
+            raise Exception(f'inputs {inputs} must be ("P","T") or ("P","H")')
+        self.fluid = fluid
+        self.inputs = tuple(inputs)
+        self.shape = tuple(shape)
+        self.outputs = tuple(o for o in outputs if o not in self.inputs)
+        self.directory = default_directory() if directory is None else directory
+
+        if P is None:
+            P = (CP.PropsSI('ptriple',fluid)*1.001,CP.PropsSI('pmax',fluid))
+        if T is None:
+            T = (CP.PropsSI('Tmin',fluid)*1.001,CP.PropsSI('Tmax',fluid))
+        if self.inputs[1] == 'H' and H is None:
+            H = self._H_range(P,T)
+        self.ranges = {'P': tuple(map(float,P)), self.inputs[1]: tuple(map(float,T if H is None else H))}
+
+        self._load_or_build()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.fluid!r},inputs={self.inputs},shape={self.shape})'
+
+    def _H_range(self,P,T):
+        ''' range of H on the border of the (P,T) domain '''
+        P = np.geomspace(*P,50)
+        H = np.concatenate([CP.PropsSI('H','P',P,'T',t,self.fluid) for t in T])
+        H = H[np.isfinite(H)]
+        return (H.min(),H.max())
+
+    @property
+    def meta(self):
+        ''' all data that define the content of the table '''
+        return dict(
+            fluid=self.fluid,
+            inputs=self.inputs,
+            shape=self.shape,
+            outputs=self.outputs,
+            ranges=self.ranges,
+            coolprop=CP.get_global_param_string('version'),
+        )
+
+    @property
+    def path(self):
+        ''' directory of the files of this table '''
+        key = hashlib.sha1(json.dumps(self.meta,sort_keys=True).encode()).hexdigest()[:16]
+        name = self.fluid.replace('::','_').replace('&','_')
+        return os.path.join(self.directory,f'{name}_{"".join(self.inputs)}_{key}')
+
+    def _load_or_build(self):
+        path = self.path
+        if not os.path.exists(os.path.join(path,'meta.json')):
+            self._save(path,*self._build())
+        with open(os.path.join(path,'meta.json'),encoding='utf-8') as f:
+            self.max_rel_error = json.load(f)['max_rel_error']
+        self.x = np.load(os.path.join(path,'x.npy'),mmap_mode='r')
+        self.y = np.load(os.path.join(path,'y.npy'),mmap_mode='r')
+        self.tables = {
+            o: np.load(os.path.join(path,f'{o}.npy'),mmap_mode='r') for o in self.outputs
+        }
+        self.valid = {
+            o: np.load(os.path.join(path,f'{o}_valid.npy'),mmap_mode='r') for o in self.outputs
+        }
+        self._x0, self._dx = float(self.x[0]), float(self.x[1]-self.x[0])
+        self._y0, self._dy = float(self.y[0]), float(self.y[1]-self.y[0])
+
+    def _exact(self,P,y):
+        ''' exact values of self.outputs and of the phase index at
+            the inputs P and y. The phase index is the last row.
+        '''
+        engine = AbstractStateFunction(self.fluid)
+        indices = [parameter_index(o) for o in self.outputs]
+        res = np.full((len(self.outputs)+1,len(P)),np.inf)
+        for k,(p,v) in enumerate(zip(P,y)):
+            try:
+                state = engine.update('P',p,self.inputs[1],v)
+            except ValueError:
+                continue
+            res[-1,k] = int(state.phase())
+            for i,index in enumerate(indices):
+                try:
+                    res[i,k] = state.keyed_output(index)
+                except ValueError:
+                    pass
+        return res
+
+    def _build(self):
+        ''' determine all tables and the maximum relative errors '''
+        nx, ny = self.shape
+        (P_min,P_max), (y_min,y_max) = self.ranges['P'], self.ranges[self.inputs[1]]
+        x = np.linspace(math.log(P_min),math.log(P_max),nx)
+        y = np.linspace(y_min,y_max,ny)
+        X, Y = np.meshgrid(x,y,indexing='ij')
+        exact = self._exact(np.exp(X.ravel()),Y.ravel()).reshape(-1,nx,ny)
+        phase = exact[-1]
+
+        # a node is valid, if no node used for its second derivatives is in
+        # the two phase region or at the critical point and these nodes are
+        # not both liquid and gas. The borders between the other phases
+        # (e.g. gas and supercritical gas) are no discontinuities.
+        index = lambda name: int(CP.get_phase_index(name))
+        bad = ~np.isfinite(phase) | np.isin(phase,[index('phase_twophase'),index('phase_critical_point')])
+        liquid = phase == index('phase_liquid')
+        gas = phase == index('phase_gas')
+        inner = (slice(2,nx-2),slice(2,ny-2))
+        any_bad, any_liquid, any_gas = (np.zeros((nx-4,ny-4),dtype=bool) for i in range(3))
+        for i in range(5):
+            for j in range(5):
+                stencil = (slice(i,nx-4+i),slice(j,ny-4+j))
+                any_bad |= bad[stencil]
+                any_liquid |= liquid[stencil]
+                any_gas |= gas[stencil]
+        same_phase = np.zeros((nx,ny),dtype=bool)
+        same_phase[inner] = ~any_bad & ~(any_liquid & any_gas)
+
+        tables, valid = dict(), dict()
+        for k,o in enumerate(self.outputs):
+            z = exact[k]
+            with np.errstate(invalid='ignore'):
+                z_x, z_y = np.gradient(z,x,y)
+                z_xx, z_xy = np.gradient(z_x,x,y)
+                z_yy = np.gradient(z_y,y,axis=1)
+            tables[o] = np.stack([z,z_x,z_y,z_xx,z_yy,z_xy])
+            # and all coefficients of the Taylor series are finite
+            valid[o] = same_phase & np.isfinite(tables[o]).all(axis=0)
+
+        # compare with exact values at the centers of the cells
+        xc, yc = (x[1:]+x[:-1])/2, (y[1:]+y[:-1])/2
+        Xc, Yc = np.meshgrid(xc,yc,indexing='ij')
+        exact_c = self._exact(np.exp(Xc.ravel()),Yc.ravel())
+        max_rel_error = dict()
+        for k,o in enumerate(self.outputs):
+            z, ok = self._ttse(tables[o],valid[o],x,y,Xc.ravel(),Yc.ravel())
+            ok &= np.isfinite(exact_c[k]) & (exact_c[k] != 0)
+            err = np.abs(z[ok]/exact_c[k][ok]-1)
+            max_rel_error[o] = float(err.max()) if err.size else None
+        return x, y, tables, valid, max_rel_error
+
+    def _save(self,path,x,y,tables,valid,max_rel_error):
+        ''' save all files to a temporary directory and rename it
+            to path, so that other processes never see an incomplete table
+        '''
+        os.makedirs(self.directory,exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=self.directory)
+        np.save(os.path.join(tmp,'x.npy'),x)
+        np.save(os.path.join(tmp,'y.npy'),y)
+        for o in self.outputs:
+            np.save(os.path.join(tmp,f'{o}.npy'),tables[o])
+            np.save(os.path.join(tmp,f'{o}_valid.npy'),valid[o])
+        with open(os.path.join(tmp,'meta.json'),'w',encoding='utf-8') as f:
+            json.dump(dict(self.meta,max_rel_error=max_rel_error),f,indent=1)
+        try:
+            os.rename(tmp,path)
+        except OSError:
+            # another process saved the same table in the meantime
+            for name in os.listdir(tmp):
+                os.remove(os.path.join(tmp,name))
+            os.rmdir(tmp)
+
+    @staticmethod
+    def _ttse(table,valid,x,y,xq,yq):
+        ''' evaluate table at (xq,yq). Return values and a mask
+            of the points that could be determined from the table
+        '''
+        dx, dy = x[1]-x[0], y[1]-y[0]
+        fi, fj = (xq-x[0])/dx, (yq-y[0])/dy
+        ok = (fi >= 0) & (fi <= len(x)-1) & (fj >= 0) & (fj <= len(y)-1)
+        i = np.clip(np.rint(np.where(ok,fi,0)).astype(int),0,len(x)-1)
+        j = np.clip(np.rint(np.where(ok,fj,0)).astype(int),0,len(y)-1)
+        ok &= valid[i,j]
+        ddx, ddy = xq-x[i], yq-y[j]
+        z, z_x, z_y, z_xx, z_yy, z_xy = (table[k,i,j] for k in range(6))
+        with np.errstate(invalid='ignore'):
+            z = z + z_x*ddx + z_y*ddy + 0.5*z_xx*ddx**2 + 0.5*z_yy*ddy**2 + z_xy*ddx*ddy
+        return z, ok
+
+    def evaluate(self,output,P,y):
+        ''' return value(s) of output at P and y (T or H) from the table.
+            Values that can not be determined from the table are nan.
+        '''
+        if np.ndim(P) or np.ndim(y):
+            P, y = np.broadcast_arrays(np.asarray(P,dtype=float),np.asarray(y,dtype=float))
+            z, ok = self._ttse(self.tables[output],self.valid[output],self.x,self.y,np.log(P),y)
+            return np.where(ok,z,np.nan)
+        # fast path without numpy overhead for a single point of state
+        if P <= 0:
+            return math.nan
+        x = math.log(P)
+        fi, fj = (x-self._x0)/self._dx, (y-self._y0)/self._dy
+        nx, ny = self.shape
+        if not (0 <= fi <= nx-1 and 0 <= fj <= ny-1):
+            return math.nan
+        i, j = int(round(fi)), int(round(fj))
+        if not self.valid[output][i,j]:
+            return math.nan
+        ddx, ddy = x-self._x0-i*self._dx, y-self._y0-j*self._dy
+        z, z_x, z_y, z_xx, z_yy, z_xy = self.tables[output][:,i,j].tolist()
+        return z + z_x*ddx + z_y*ddy + 0.5*z_xx*ddx**2 + 0.5*z_yy*ddy**2 + z_xy*ddx*ddy
+
+
+class TableFunction():
+    ''' TableFunction has the signature of CP.PropsSI and determines
+        the properties of a PropertyTable if possible and uses CP.PropsSI
+        otherwise.
+        
+        If tolerance is given, only the properties with a maximum relative
+        error of the table below tolerance are determined from the table.
+    '''
+    def __init__(self,fluid,tolerance=None,**kwargs):
+        self.table = PropertyTable(fluid,**kwargs)
+        self.fluid = fluid
+        self.outputs = {
+            o for o,e in self.table.max_rel_error.items()
+            if e is not None and (tolerance is None or e <= tolerance)
+        }
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.table!r})'
+
+    def __call__(self,output,name1,value1,name2,value2,fluid=None):
+        table = self.table
+        if output not in self.outputs or {name1,name2} != set(table.inputs):
+            return CP.PropsSI(output,name1,value1,name2,value2,self.fluid)
+        P, y = (value1,value2) if name1 == 'P' else (value2,value1)
+        z = table.evaluate(output,P,y)
+        if np.ndim(z):
+            # exact values for all points outside of the table
+            missing = np.isnan(z)
+            if missing.any():
+                P, y = np.broadcast_arrays(P,y)
+                z[missing] = CP.PropsSI(output,'P',P[missing],table.inputs[1],y[missing],self.fluid)
+            return z
+        if math.isnan(z):
+            return CP.PropsSI(output,name1,value1,name2,value2,self.fluid)
+        return z
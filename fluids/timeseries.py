@@ -0,0 +1,122 @@
+''' Incremental evaluation of time series of points of state.
+
+    Sensor streams often repeat the same inputs for minutes. The
+    IncrementalEvaluator is a generator based stage of a pipeline, which
+    only creates a point of state for inputs that differ from the
+    previous and from recently seen inputs:
+
+    HA = fluid_factory('HumidAir')
+    evaluator = IncrementalEvaluator(HA,inputs={'T':'temp_K','R':'rel_hum'},outputs=['H','W'],digits=4)
+    for record in evaluator(records): # e.g. dicts from csv.DictReader
+        record['H'], record['W']
+    evaluator.stats # {'records': ..., 'evaluated': ..., 'saved': ..., ...}
+'''
+from collections import OrderedDict
+
+from .cache import normalize
+from .fluids import _is_quantity
+
+
+class IncrementalEvaluator():
+    ''' yield records with the properties outputs of the points of state
+        of FluidClass defined by the input records.
+
+        inputs is a dict {property: key of the records} (default: the
+        keys of the records are the names of the properties). Values of
+        the records are floats (magnitudes in the units of acceptable_args)
+        or, if FluidClass has units, Quantities.
+
+        Inputs are near-duplicates, if they are equal after rounding to
+        digits significant digits (see cache.normalize) or, if atol is a
+        dict {property: step}, to multiples of step. The properties of
+        near-duplicates are those of the first point of state of their
+        kind. The last maxsize (at least 1) different inputs are kept.
+
+        The values of outputs are those of Point_of_State.outputs(...),
+        so properties that can not be determined are PropertyErrors.
+    '''
+    def __init__(self,FluidClass,inputs=None,outputs=None,digits=None,atol=None,maxsize=128):
+        if maxsize < 1:
+            raise Exception(f'maxsize must be at least 1, not {maxsize}')
+        self.FluidClass = FluidClass
+        self.inputs = inputs
+        self.outputs = tuple(FluidClass.acceptable_args) if outputs is None else tuple(outputs)
+        self.digits = digits
+        self.atol = dict() if atol is None else atol
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._last = None
+        self.reset_stats()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.FluidClass.__name__}, outputs={list(self.outputs)})'
+
+    def reset_stats(self):
+        self.records = self.repeated = self.hits = self.evaluated = 0
+
+    @property
+    def stats(self):
+        ''' return dict of statistics. repeated records have the inputs
+            of the previous record, hits are found in the recent inputs,
+            saved is the number of points of state that were not
+            evaluated and saved_calls the number of values of properties
+            that were not determined by the engine.
+        '''
+        saved = self.repeated + self.hits
+        return dict(
+            records=self.records,
+            evaluated=self.evaluated,
+            repeated=self.repeated,
+            hits=self.hits,
+            saved=saved,
+            saved_calls=saved*len(self.outputs),
+            saved_ratio=saved/self.records if self.records else 0.0,
+        )
+
+    def clear(self):
+        ''' forget all recent inputs '''
+        self._data.clear()
+        self._last = None
+
+    def key(self,kwargs):
+        ''' return the hashable key of the inputs kwargs of a point of state '''
+        units = self.FluidClass.acceptable_args
+        values = []
+        for k,v in kwargs.items():
+            if _is_quantity(v):
+                v = v.m_as(units[k])
+            step = self.atol.get(k)
+            values.append(round(v/step) if step else v)
+        return tuple(kwargs), normalize(values,self.digits)
+
+    def evaluate(self,**kwargs):
+        ''' return dict {property: value or PropertyError} of outputs of
+            the point of state FluidClass(**kwargs) or of a near-duplicate
+        '''
+        self.records += 1
+        key = self.key(kwargs)
+        if key == self._last:
+            self.repeated += 1
+            return self._data[key]
+        values = self._data.get(key)
+        if values is None:
+            self.evaluated += 1
+            values = self._data[key] = self.FluidClass(**kwargs).outputs(*self.outputs)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        else:
+            self.hits += 1
+            self._data.move_to_end(key)
+        self._last = key
+        return values
+
+    def __call__(self,records):
+        ''' yield a new dict with the items of each record of the
+            iterable records and the values of the outputs. Values that
+            are not Quantities are converted to float, e.g. the strings
+            of csv.DictReader.
+        '''
+        for record in records:
+            inputs = record if self.inputs is None else {k: record[c] for k,c in self.inputs.items()}
+            kwargs = {k: v if _is_quantity(v) else float(v) for k,v in inputs.items()}
+            yield {**record, **self.evaluate(**kwargs)}
@@ -1,13 +1,30 @@
 import unittest
 
+import math
 import os
+import subprocess
 import sys
+import tempfile
+import threading
+import weakref
 sys.path.insert(0,os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from fluids import fluid_factory, Q_, Quantity
 from fluids.fluids import Point_of_State
+from fluids import PropertyError
+from fluids import enable_cache, disable_cache, clear_cache
+from fluids import PersistentCache, enable_persistent_cache
+from fluids import evaluate_many
+from fluids import IncrementalEvaluator
+from fluids import HXChart, hx_chart
+from fluids import StateTable
+from fluids import enable_instrumentation, disable_instrumentation
 
 import CoolProp.CoolProp as CP
+import numpy as np
+import pandas as pd
+from fluids.frames import evaluate_frame, evaluate_file
+from fluids.server import PropertyServer, Client
 
 class Test_Q_(unittest.TestCase):
     
@@ -147,6 +164,1230 @@ class Test_fluid_factory(unittest.TestCase):
         HA.unregister('W')
         return self.assertEqual('W' in HA.acceptable_args, False)
 
+class Test_batch(unittest.TestCase):
+    
+    def test_batch_args_shape(self):
+        Air = fluid_factory('Air')
+        T = np.linspace(250,350,6).reshape(2,3)
+        b = Air.batch(T=T,P=1e5)
+        args = b.args
+        res = b.outputs('H','Pcrit','T')
+        ok = all(v.shape == (2,3) for v in args.values()) and np.array_equal(args['H'],b.H)
+        return self.assertTrue(ok and np.all(res['Pcrit'] == CP.PropsSI('Pcrit','Air')) and np.array_equal(res['T'],T))
+    
+    def test_batch_args_shape_with_units(self):
+        Air = fluid_factory('Air',with_units=True)
+        b = Air.batch(T=Q_(np.linspace(250,350,6).reshape(3,2),'K'),P=Q_(1,'bar'))
+        res = b.args_or_errormessages
+        return self.assertTrue(res['H'].shape == (3,2) and res['Tcrit'].shape == (3,2) and str(res['H'].units) == str(b.H.units))
+    
+    def test_Air_batch_calculation(self):
+        Air = fluid_factory('Air')
+        T = np.linspace(250,350,6)
+        b = Air.batch(T=T,P=1e5)
+        return self.assertTrue(np.array_equal(b.H, CP.PropsSI('H','T',T,'P',1e5,'Air')))
+    
+    def test_Air_batch_shape(self):
+        Air = fluid_factory('Air')
+        b = Air.batch(T=np.linspace(250,350,6).reshape(2,3),P=1e5)
+        return self.assertEqual((b.H.shape,b.P.shape),((2,3),(2,3)))
+    
+    def test_Air_batch_is_cached(self):
+        Air = fluid_factory('Air')
+        b = Air.batch(T=np.array([273.15,300]),P=1e5)
+        return self.assertTrue(np.shares_memory(b.H,b.H))
+    
+    def test_Air_batch_is_subclass(self):
+        Air = fluid_factory('Air')
+        return self.assertTrue(isinstance(Air.batch(T=[273.15],P=1e5),Air))
+    
+    def test_Air_batch_invalid_state_is_nan(self):
+        Air = fluid_factory('Air')
+        b = Air.batch(T=np.array([273.15,-5]),P=1e5)
+        return self.assertTrue(np.isnan(b.H[1]) and not np.isnan(b.H[0]))
+    
+    def test_Air_with_units_batch(self):
+        Air = fluid_factory('Air',with_units=True)
+        b = Air.batch(T=Q_(np.array([0,10]),'degC'),P=Q_(1,'bar'))
+        H = CP.PropsSI('H','T',np.array([273.15,283.15]),'P',1e5,'Air')
+        return self.assertTrue(np.allclose(b.H.m_as('J/kg'),H))
+    
+    def test_HA_batch_calculation(self):
+        HA = fluid_factory('HumidAir')
+        T = np.array([293.15,300])
+        b = HA.batch(T=T,R=0.5)
+        return self.assertTrue(np.array_equal(b.W, CP.HAPropsSI('W','T',T,'R',0.5,'P',101325)))
+    
+    def test_HA_batch_W_R(self):
+        HA = fluid_factory('HumidAir')
+        b = HA.batch(W=np.array([5e-3,10e-3]),R=0.5)
+        T = [HA(W=W,R=0.5).T for W in [5e-3,10e-3]]
+        return self.assertTrue(np.allclose(b.T,T))
+    
+    def test_HA_batch_D_R(self):
+        HA = fluid_factory('HumidAir')
+        b = HA.batch(D=np.array([280,285,400]),R=0.5)
+        T = [HA(D=D,R=0.5).T for D in [280,285]]
+        return self.assertTrue(np.allclose(b.T[:2],T) and np.isnan(b.T[2]))
+    
+    def test_HA_mix_line(self):
+        HA = fluid_factory('HumidAir')
+        p_0, p_1 = HA(T=293.15,R=0.5), HA(T=303.15,R=0.8)
+        other_part = np.linspace(0,1,5)
+        T = [p_0.mix(p_1,o).T for o in other_part]
+        return self.assertTrue(np.allclose(p_0.mix(p_1,other_part).T,T))
+    
+    def test_HA_mix_line_not_in_0_1(self):
+        HA = fluid_factory('HumidAir')
+        p_0, p_1 = HA(T=293.15,R=0.5), HA(T=303.15,R=0.8)
+        with self.assertRaises(Exception):
+            p_0.mix(p_1,np.array([0.5,1.5]))
+    
+    def test_HA_hom_coord_line(self):
+        HA = fluid_factory('HumidAir')
+        p_0, p_1 = HA(T=293.15,R=0.5), HA(T=303.15,R=0.8)
+        lambda_ = np.array([-0.5,0.5,1.5])
+        b = p_0.hom_coord(p_1,lambda_)
+        H = [p_0.hom_coord(p_1,l).H for l in lambda_]
+        return self.assertTrue(isinstance(b,HA) and np.allclose(b.H,H))
+    
+    def test_HA_with_units_mix_line(self):
+        HA = fluid_factory('HumidAir',with_units=True)
+        p_0, p_1 = HA(T=Q_(20,'degC'),R=0.5), HA(T=Q_(30,'degC'),R=0.8)
+        b = p_0.mix(p_1,np.array([0,0.5]))
+        return self.assertTrue(np.allclose(b.T.m_as('K'),[p_0.T.m_as('K'),p_0.mix(p_1,0.5).T.m_as('K')]))
+    
+    def test_HA_mix_percent(self):
+        HA = fluid_factory('HumidAir',with_units=True)
+        p_0, p_1 = HA(T=Q_(20,'degC'),R=0.5), HA(T=Q_(30,'degC'),R=0.8)
+        p = p_0.mix(p_1,Q_(30,'percent'))
+        return self.assertAlmostEqual(p.H.m_as('J/kg'),p_0.mix(p_1,0.3).H.m_as('J/kg'))
+    
+    def test_HA_batch_mix(self):
+        HA = fluid_factory('HumidAir')
+        b = HA.batch(T=np.array([290,300]),R=0.5)
+        p_1 = HA(T=303.15,R=0.8)
+        T = [HA(T=T,R=0.5).mix(p_1,0.5).T for T in [290,300]]
+        return self.assertTrue(np.allclose(b.mix(p_1,0.5).T,T))
+    
+    def test_HA_batch_invalid_state_is_nan(self):
+        HA = fluid_factory('HumidAir')
+        b = HA.batch(T=np.array([293.15,300]),R=np.array([0.5,1.2]))
+        return self.assertTrue(np.isnan(b.H[1]) and not np.isnan(b.H[0]))
+
+class Test_engines(unittest.TestCase):
+    
+    def test_AbstractState_calculation(self):
+        Air = fluid_factory('Air',engine='AbstractState')
+        p = Air(T=273.15, P=1e5)
+        ok = True
+        for arg in p.acceptable_args:
+            ok = ok and np.isclose(getattr(p,arg),CP.PropsSI(arg,'T',273.15,'P',1e5,'Air'),rtol=1e-12)
+        return self.assertEqual(ok,True)
+    
+    def test_AbstractState_one_flash_per_point(self):
+        class Counting_State():
+            def __init__(self,state):
+                self.state, self.updates = state, 0
+            def update(self,*args):
+                self.updates += 1
+                return self.state.update(*args)
+            def keyed_output(self,i):
+                return self.state.keyed_output(i)
+            
+        # the engine is shared by all tests, its state is restored
+        Air = fluid_factory('Air',engine='AbstractState')
+        original = Air._generic_function.state
+        state = Air._generic_function.state = Counting_State(original)
+        try:
+            Air(T=273.15, P=1e5).args
+        finally:
+            Air._generic_function.state = original
+        return self.assertEqual(state.updates,1)
+    
+    def test_AbstractState_with_units(self):
+        Air = fluid_factory('Air',engine='AbstractState',with_units=True)
+        p = Air(T=Q_(0,'degC'), P=Q_(1e5,'Pa'))
+        return self.assertAlmostEqual(p.H.m_as('J/kg'),CP.PropsSI('H','T',273.15,'P',1e5,'Air'))
+    
+    def test_AbstractState_error(self):
+        Air = fluid_factory('Air',engine='AbstractState')
+        p = Air(T=-5, P=1e5)
+        with self.assertRaises(ValueError):
+            p.H
+    
+    def test_AbstractState_batch(self):
+        Air = fluid_factory('Air',engine='AbstractState')
+        T = np.array([273.15,300,-5])
+        H = Air.batch(T=T,P=1e5).H
+        return self.assertTrue(np.allclose(H[:2],CP.PropsSI('H','T',T[:2],'P',1e5,'Air')) and np.isnan(H[2]))
+    
+    def test_unknown_engine(self):
+        with self.assertRaises(Exception):
+            fluid_factory('Air',engine='unknown')
+
+class Test_cache(unittest.TestCase):
+    
+    def setUp(self):
+        self.cache = enable_cache(maxsize=20)
+        
+    def tearDown(self):
+        disable_cache()
+    
+    def test_cache_shared_between_points(self):
+        Air = fluid_factory('Air')
+        H = [Air(T=273.15,P=1e5).H for i in range(3)]
+        ok = H[0] == CP.PropsSI('H','T',273.15,'P',1e5,'Air')
+        return self.assertEqual((ok,self.cache.hits,self.cache.misses),(True,2,1))
+    
+    def test_cache_shared_with_units(self):
+        Air = fluid_factory('Air')
+        Air_with_units = fluid_factory('Air',with_units=True)
+        Air(T=273.15,P=1e5).H
+        Air_with_units(T=Q_(273.15,'K'),P=Q_(1e5,'Pa')).H
+        return self.assertEqual(self.cache.hits,1)
+    
+    def test_cache_eviction(self):
+        Air = fluid_factory('Air')
+        Air(T=273.15,P=1e5).args
+        Air(T=300,P=1e5).args
+        # 11 properties per point of state, inputs and constants are not cached
+        return self.assertEqual((len(self.cache),self.cache.evictions),(20,2))
+    
+    def test_cache_digits(self):
+        self.cache = enable_cache(digits=6)
+        Air = fluid_factory('Air')
+        H_0 = Air(T=273.15,P=1e5).H
+        H_1 = Air(T=273.15+1e-9,P=1e5).H
+        return self.assertEqual((H_0==H_1,self.cache.hits),(True,1))
+    
+    def test_cache_clear_fluid(self):
+        Air = fluid_factory('Air')
+        HA = fluid_factory('HumidAir')
+        Air(T=273.15,P=1e5).H
+        HA(T=293.15,R=0.5).H
+        clear_cache(Air)
+        return self.assertEqual([k[2] for k in self.cache._data],['H'])
+    
+    def test_cache_stats(self):
+        Air = fluid_factory('Air')
+        Air(T=273.15,P=1e5).H
+        Air(T=273.15,P=1e5).H
+        stats = self.cache.stats
+        return self.assertEqual((stats['hits'],stats['misses'],stats['hit_ratio']),(1,1,0.5))
+    
+    def test_cache_errors_not_cached(self):
+        Air = fluid_factory('Air')
+        with self.assertRaises(ValueError):
+            Air(T=-5,P=1e5).H
+        return self.assertEqual(len(self.cache),0)
+
+class Test_persistent_cache(unittest.TestCase):
+    
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name,'states.sqlite')
+        self.cache = enable_persistent_cache(self.path)
+        
+    def tearDown(self):
+        disable_cache()
+        self.cache.close()
+        self.dir.cleanup()
+    
+    def test_persistent_cache_shared_between_sessions(self):
+        Air = fluid_factory('Air')
+        H = Air(T=273.15,P=1e5).H
+        self.cache.close()
+        self.cache = enable_persistent_cache(self.path)
+        ok = Air(T=273.15,P=1e5).H == H == CP.PropsSI('H','T',273.15,'P',1e5,'Air')
+        return self.assertEqual((ok,self.cache.hits,self.cache.misses),(True,1,0))
+    
+    def test_persistent_cache_shared_between_processes(self):
+        code = (
+            'from fluids import fluid_factory, enable_persistent_cache;'
+            f'enable_persistent_cache({self.path!r});'
+            'fluid_factory("Air")(T=300.0,P=1e5).H'
+        )
+        subprocess.run([sys.executable,'-c',code],check=True)
+        Air = fluid_factory('Air')
+        Air(T=300.0,P=1e5).H
+        return self.assertEqual((self.cache.hits,self.cache.misses),(1,0))
+    
+    def test_persistent_cache_namespaces(self):
+        Air = fluid_factory('Air')
+        Water = fluid_factory('Water')
+        Air(T=300.0,P=1e5).H
+        Water(T=300.0,P=1e5).H
+        Air(T=300.0,P=1e5).H
+        clear_cache(Water)
+        return self.assertEqual((self.cache.hits,len(self.cache)),(1,1))
+    
+    def test_persistent_cache_version(self):
+        Air = fluid_factory('Air')
+        Air(T=300.0,P=1e5).H
+        self.cache.close()
+        self.cache = PersistentCache(self.path)
+        self.cache.version = 'other'
+        self.cache._connect()
+        return self.assertEqual(len(self.cache),0)
+    
+    def test_persistent_cache_other_version_open(self):
+        other = PersistentCache(self.path)
+        other.version = 'other'
+        Air = fluid_factory('Air')
+        Air(T=300.0,P=1e5).H
+        self.cache.flush()
+        H = other.lookup(Air(T=300.0,P=1e5),'H')
+        other.close()
+        return self.assertEqual((H,other.hits,other.misses),(CP.PropsSI('H','T',300,'P',1e5,'Air'),0,1))
+    
+    def test_persistent_cache_other_version_kept(self):
+        Air = fluid_factory('Air')
+        Air(T=300.0,P=1e5).H
+        self.cache.flush()
+        other = PersistentCache(self.path)
+        other.version = 'other'
+        other.close()
+        other._connect()
+        other.close()
+        disable_cache()
+        self.cache.close()
+        self.cache = enable_persistent_cache(self.path)
+        Air(T=300.0,P=1e5).H
+        return self.assertEqual((self.cache.hits,self.cache.misses),(1,0))
+    
+    def test_persistent_cache_nan(self):
+        calls = []
+        def engine(*args):
+            calls.append(args)
+            return math.nan
+        Air = fluid_factory('Air')
+        Nan = type('Nan',(Air,),dict(__slots__=(),_generic_function=staticmethod(engine)))
+        Nan(T=300.0,P=1e5).H
+        self.cache.flush()
+        H = Nan(T=300.0,P=1e5).H
+        return self.assertTrue(math.isnan(H) and len(calls) == 1 and self.cache.hits == 1)
+    
+    def test_persistent_cache_released(self):
+        import gc
+        cache = PersistentCache(self.path)
+        ref = weakref.ref(cache)
+        cache.close()
+        cache._db()
+        cache.close()
+        del cache
+        gc.collect()
+        return self.assertIsNone(ref())
+    
+    def test_persistent_cache_eviction(self):
+        self.cache = enable_persistent_cache(self.path,max_bytes=40_000,flush_every=10)
+        Air = fluid_factory('Air')
+        for T in np.linspace(250,350,100):
+            Air(T=T,P=1e5).args
+        stats = self.cache.stats
+        return self.assertTrue(stats['evictions'] > 0 and stats['bytes'] < 60_000)
+
+class Test_frames(unittest.TestCase):
+    
+    def setUp(self):
+        self.Air = fluid_factory('Air')
+        self.df = pd.DataFrame(dict(temp_K=[280.0,300.0,-5.0],p_Pa=1e5))
+    
+    def test_frames_accessor(self):
+        res = self.df.fluids.evaluate(self.Air,inputs={'T':'temp_K','P':'p_Pa'},outputs=['H','D'])
+        ok = res['H'][1] == CP.PropsSI('H','T',300.0,'P',1e5,'Air') and np.isnan(res['D'][2])
+        return self.assertEqual((ok,list(res.columns)),(True,['temp_K','p_Pa','H','D']))
+    
+    def test_frames_units(self):
+        df = pd.DataFrame(dict(temp_C=[20.0]))
+        res = evaluate_frame(self.Air,df,inputs={'T':'temp_C','P':1.0},outputs=['H'],units={'T':'degC','P':'bar','H':'kJ/kg'},prefix='h_')
+        return self.assertAlmostEqual(res['h_H'][0],CP.PropsSI('H','T',293.15,'P',1e5,'Air')/1000)
+    
+    def test_frames_raise(self):
+        with self.assertRaises(Exception):
+            self.df.fluids.evaluate(self.Air,inputs={'T':'temp_K','P':'p_Pa'},outputs=['H'],errors='raise')
+    
+    def test_frames_file(self):
+        with tempfile.TemporaryDirectory() as d:
+            source, destination = os.path.join(d,'log.csv'), os.path.join(d,'states.csv')
+            pd.DataFrame(dict(temp_K=np.linspace(250,350,25),p_Pa=1e5)).to_csv(source,index=False)
+            rows = evaluate_file(self.Air,source,destination,inputs={'T':'temp_K','P':'p_Pa'},outputs=['H'],chunksize=10)
+            res = pd.read_csv(destination)
+        H = CP.PropsSI('H','T',np.linspace(250,350,25),'P',1e5,'Air')
+        return self.assertEqual((rows,len(res),np.allclose(res['H'],H)),(25,25,True))
+
+class Test_incremental(unittest.TestCase):
+    
+    def setUp(self):
+        self.HA = fluid_factory('HumidAir')
+    
+    def test_incremental_maxsize(self):
+        with self.assertRaises(Exception):
+            IncrementalEvaluator(self.HA,maxsize=0)
+        evaluator = IncrementalEvaluator(self.HA,outputs=['H'],maxsize=1)
+        res = [evaluator.evaluate(T=T,R=0.5)['H'] for T in (293.15,293.15,303.15,293.15)]
+        return self.assertEqual((res[0],res[1],res[3],evaluator.stats['evaluated']),(res[0],res[0],res[0],3))
+    
+    def test_incremental_repeated(self):
+        evaluator = IncrementalEvaluator(self.HA,inputs={'T':'t','R':'r'},outputs=['H'])
+        records = [dict(t='293.15',r='0.5')]*3 + [dict(t='303.15',r='0.5')]
+        res = list(evaluator(records))
+        H = CP.HAPropsSI('H','T',303.15,'R',0.5,'P',101325)
+        stats = evaluator.stats
+        return self.assertEqual(
+            (res[3]['H'],res[3]['t'],stats['evaluated'],stats['repeated'],stats['saved_calls']),
+            (H,'303.15',2,2,2)
+        )
+    
+    def test_incremental_near_duplicates(self):
+        evaluator = IncrementalEvaluator(self.HA,outputs=['H','W'],digits=4,maxsize=2)
+        records = [dict(T=293.0+1e-6*i,R=0.5) for i in range(3)] + [dict(T=303.0,R=0.5),dict(T=293.0,R=0.5)]
+        list(evaluator(records))
+        stats = evaluator.stats
+        return self.assertEqual((stats['evaluated'],stats['repeated'],stats['hits']),(2,2,1))
+    
+    def test_incremental_eviction(self):
+        evaluator = IncrementalEvaluator(self.HA,outputs=['H'],maxsize=1)
+        list(evaluator([dict(T=293.15,R=0.5),dict(T=303.15,R=0.5),dict(T=293.15,R=0.5)]))
+        return self.assertEqual(evaluator.stats['evaluated'],3)
+    
+    def test_incremental_errors(self):
+        evaluator = IncrementalEvaluator(self.HA,outputs=['H'])
+        res = list(evaluator([dict(T=-5.0,R=0.5)]))
+        return self.assertIsInstance(res[0]['H'],PropertyError)
+
+class Test_validation(unittest.TestCase):
+    
+    def test_validation_domain(self):
+        Air = fluid_factory('Air',validation='mask')
+        domain = Air.domain('P','Q')
+        ok = domain['P'] == (CP.PropsSI('ptriple','Air'),CP.PropsSI('Pcrit','Air'))
+        return self.assertEqual((ok,domain['Q']),(True,(0.0,1.0)))
+    
+    def test_validation_mask(self):
+        Air = fluid_factory('Air',validation='mask')
+        p = Air(T=30.0,P=1e5)
+        with self.assertRaises(PropertyError):
+            p.H
+        return self.assertEqual(p.outputs('H','D')['D'].code,'state')
+    
+    def test_validation_mask_batch(self):
+        HA = fluid_factory('HumidAir')
+        HA_mask = fluid_factory('HumidAir',validation='mask')
+        R = np.linspace(0,1.5,31)
+        H = HA.batch(T=293.15,R=R).H
+        H_mask = HA_mask.batch(T=293.15,R=R).H
+        return self.assertEqual((np.array_equal(H,H_mask,equal_nan=True),int(np.isnan(H_mask).sum())),(True,10))
+    
+    def test_validation_strict(self):
+        HA = fluid_factory('HumidAir',validation='strict')
+        with self.assertRaises(PropertyError):
+            HA(T=293.15,R=1.2)
+        with self.assertRaises(PropertyError):
+            HA.batch(T=293.15,R=[0.5,1.2])
+        return self.assertEqual(HA(T=293.15,R=0.5).H,CP.HAPropsSI('H','T',293.15,'R',0.5,'P',101325))
+    
+    def test_validation_units(self):
+        Air = fluid_factory('Air',with_units=True,validation='strict')
+        with self.assertRaises(PropertyError):
+            Air(T=Q_(-250,'degC'),P=Q_(1,'bar'))
+        return self.assertEqual(Air(T=Q_(20,'degC'),P=Q_(1,'bar')).T,Q_(293.15,'K'))
+    
+    def test_validation_default(self):
+        # without validation, the engine decides, CP.PropsSI extrapolates above Tmax
+        Air = fluid_factory('Air')
+        return self.assertEqual(Air(T=2100.0,P=1e5).H,CP.PropsSI('H','T',2100.0,'P',1e5,'Air'))
+
+class Test_backends(unittest.TestCase):
+    
+    def test_backend_IF97(self):
+        Water = fluid_factory('Water',backend='IF97')
+        p = Water(T=300.0,P=1e5)
+        H = CP.PropsSI('H','T',300.0,'P',1e5,'IF97::Water')
+        return self.assertEqual((Water.__name__,p.H,p.outputs('H')['H']),('IF97::Water',H,H))
+    
+    def test_backend_default_is_HEOS(self):
+        H = fluid_factory('Water',backend='HEOS')(T=300.0,P=1e5).H
+        return self.assertEqual(H,fluid_factory('Water')(T=300.0,P=1e5).H)
+    
+    def test_backend_tabular(self):
+        Water = fluid_factory('Water',backend='BICUBIC')
+        p = Water(T=300.0,P=1e5)
+        batch = Water.batch(T=[300.0,400.0],P=1e5)
+        ok = np.isclose(p.H,CP.PropsSI('H','T',300.0,'P',1e5,'Water'),rtol=1e-6)
+        ok = ok and batch.H[0] == p.H and p.Tcrit == CP.PropsSI('Tcrit','Water')
+        return self.assertTrue(ok)
+    
+    def test_backend_not_combined(self):
+        with self.assertRaises(Exception):
+            fluid_factory('IF97::Water',backend='HEOS')
+        with self.assertRaises(Exception):
+            fluid_factory('HumidAir',backend='IF97')
+
+class Test_saturation(unittest.TestCase):
+    
+    def test_saturation_table_accuracy(self):
+        table = fluid_factory('R134a').saturation()
+        T = np.linspace(200,370,7)
+        ok = all(
+            np.allclose(table.saturated(q,Q,T=T),CP.PropsSI(q,'T',T,'Q',Q,'R134a'),rtol=1e-4)
+            for q in ['P','D','H','S'] for Q in (0,1)
+        )
+        return self.assertTrue(ok and max(table.max_rel_error.values()) < 1e-3)
+    
+    def test_saturation_table_shared(self):
+        return self.assertIs(fluid_factory('R134a').saturation(),fluid_factory('R134a',with_units=True).saturation())
+    
+    def test_saturation_T_sat(self):
+        T = fluid_factory('R134a').saturation().T_sat(3e5)
+        return self.assertAlmostEqual(T,CP.PropsSI('T','P',3e5,'Q',0,'R134a'),places=3)
+    
+    def test_saturation_exact(self):
+        values = fluid_factory('R134a').saturation().properties(T=263.15,Q=0.3,outputs=['H','D'],exact=True)
+        return self.assertEqual(values,{q: CP.PropsSI(q,'T',263.15,'Q',0.3,'R134a') for q in ['H','D']})
+    
+    def test_saturation_phase(self):
+        table = fluid_factory('R134a').saturation()
+        phases = [table.phase(P=3e5,T=300.0),table.phase(P=3e5,T=250.0),table.phase(P=3e5,H=3e5),table.phase(P=5e6,T=400.0)]
+        return self.assertEqual(phases,['gas','liquid','twophase','supercritical'])
+    
+    def test_saturation_phase_near_critical_point(self):
+        table = fluid_factory('R134a').saturation()
+        P = (table.P_range[1]+table.P_crit)/2
+        return self.assertEqual([table.phase(P=P,T=300.0),table.phase(P=table.P_crit*1.01,T=300.0)],['unknown','supercritical'])
+    
+    def test_saturation_function(self):
+        R134a = fluid_factory('R134a',saturation_table=True)
+        p = R134a(P=3e5,H=3e5)
+        ok = np.isclose(p.Q,CP.PropsSI('Q','P',3e5,'H',3e5,'R134a'),rtol=1e-5)
+        ok = ok and np.isclose(p.D,CP.PropsSI('D','P',3e5,'H',3e5,'R134a'),rtol=1e-4)
+        # properties that are not in the table and single phase points
+        # of state are determined by the engine
+        ok = ok and p.C == CP.PropsSI('C','P',3e5,'H',3e5,'R134a')
+        ok = ok and R134a(T=300.0,P=1e5).H == CP.PropsSI('H','T',300.0,'P',1e5,'R134a')
+        return self.assertTrue(ok)
+    
+    def test_saturation_function_tolerance(self):
+        R134a = fluid_factory('R134a',saturation_table=dict(tolerance=1e-12))
+        return self.assertEqual(R134a(T=263.15,Q=1).H,CP.PropsSI('H','T',263.15,'Q',1,'R134a'))
+    
+    def test_saturation_HumidAir(self):
+        with self.assertRaises(Exception):
+            fluid_factory('HumidAir',saturation_table=True)
+
+class Test_derivatives(unittest.TestCase):
+    
+    def test_derivative(self):
+        p = fluid_factory('Water')(P=1e5,H=1e6)
+        return self.assertEqual(p.derivative('D','P','H'),CP.PropsSI('d(D)/d(P)|H','P',1e5,'H',1e6,'Water'))
+    
+    def test_derivative_cached(self):
+        p = fluid_factory('Water')(T=300.0,P=1e5)
+        p.derivative('H','T','P')
+        return self.assertEqual(p._get('d(H)/d(T)|P'),CP.PropsSI('d(H)/d(T)|P','T',300.0,'P',1e5,'Water'))
+    
+    def test_jacobian(self):
+        J = fluid_factory('Water')(T=300.0,P=1e5).jacobian('H','D')
+        expected = [
+            [CP.PropsSI(f'd({q})/d({x})|{c}','T',300.0,'P',1e5,'Water') for x,c in (('T','P'),('P','T'))]
+            for q in ('H','D')
+        ]
+        return self.assertTrue(np.allclose(J,expected,rtol=1e-12))
+    
+    def test_jacobian_AbstractState(self):
+        J = fluid_factory('Water',engine='AbstractState')(T=300.0,P=1e5).jacobian('H','D')
+        return self.assertTrue(np.allclose(J,fluid_factory('Water')(T=300.0,P=1e5).jacobian('H','D'),rtol=1e-12))
+    
+    def test_jacobian_batch(self):
+        Water = fluid_factory('Water')
+        T = np.linspace(300,400,6).reshape(2,3)
+        J = Water.batch(T=T,P=1e5).jacobian('H','D','S')
+        ok = J.shape == (3,2,2,3) and np.isclose(J[1,0,1,2],Water(T=T[1,2],P=1e5).derivative('D','T','P'))
+        return self.assertTrue(ok)
+    
+    def test_derivative_units(self):
+        dH_dT = fluid_factory('Water',with_units=True)(T=Q_(300,'K'),P=Q_(1,'bar')).derivative('H','T','P')
+        return self.assertAlmostEqual(dH_dT.m_as('kJ/kg/K'),CP.PropsSI('C','T',300,'P',1e5,'Water')/1e3,places=9)
+    
+    def test_derivative_error(self):
+        with self.assertRaises(PropertyError):
+            fluid_factory('Water')(T=300.0,Q=0.5).derivative('H','T','Q')
+
+class Test_charts(unittest.TestCase):
+    
+    def setUp(self):
+        self.chart = hx_chart(T=(263.15,313.15),W=(0.0,0.02),n=21,engine='ideal')
+    
+    def test_chart_cached(self):
+        return self.assertIs(self.chart,hx_chart(T=[263.15,313.15],W=(0,0.02),n=21,engine='ideal'))
+    
+    def test_chart_isolines(self):
+        HA = fluid_factory('HumidAir',engine='ideal')
+        ok = True
+        for q in ('R','T','H','Vda','B'):
+            for v,line in self.chart.lines[q].items():
+                if q == 'B' and v == 273.15:
+                    # B is not unique between the isolines of water and ice
+                    continue
+                inside = ~np.isnan(line['T'])
+                values = getattr(HA.batch(T=line['T'][inside],W=line['W'][inside]),q)
+                ok = ok and np.allclose(values,v,rtol=1e-6,atol=1e-6)
+        return self.assertTrue(ok and len(self.chart.lines['R']) == 10)
+    
+    def test_chart_range(self):
+        T = np.concatenate([line['T'] for lines in self.chart.lines.values() for line in lines.values()])
+        W = np.concatenate([line['W'] for lines in self.chart.lines.values() for line in lines.values()])
+        ok = np.nanmin(T) >= 263.15-1e-6 and np.nanmax(T) <= 313.15+1e-6
+        return self.assertTrue(ok and np.nanmin(W) >= 0 and np.nanmax(W) <= 0.02+1e-12)
+    
+    def test_chart_wet_bulb_PropsSI(self):
+        chart = HXChart(T=(283.15,303.15),W=(0.005,0.015),n=5,R=(),T_lines=(),H=(),Vda=(),B=(293.15,))
+        line = chart.lines['B'][293.15]
+        inside = ~np.isnan(line['T'])
+        B = fluid_factory('HumidAir').batch(T=line['T'][inside],W=line['W'][inside]).B
+        return self.assertTrue(np.allclose(B,293.15,atol=1e-6))
+    
+    def test_chart_point_and_mix_line(self):
+        HA = fluid_factory('HumidAir',with_units=True)
+        p_0, p_1 = HA(T=Q_(30,'degC'),R=Q_(40,'percent')), HA(T=Q_(10,'degC'),R=Q_(80,'percent'))
+        line = self.chart.mix_line(p_0,p_1,n=11)
+        ok = np.isclose(self.chart.point(p_0)['W'],p_0.W.m_as(''))
+        ok = ok and np.isclose(line['W'][5],(p_0.W.m_as('')+p_1.W.m_as(''))/2)
+        return self.assertTrue(ok and line['H'].shape == (11,))
+    
+    def test_chart_pressure(self):
+        with self.assertRaises(Exception):
+            self.chart.point(fluid_factory('HumidAir')(T=300.0,R=0.5,P=9e4))
+    
+    def test_chart_read_only(self):
+        with self.assertRaises(ValueError):
+            self.chart.lines['R'][0.5]['T'][0] = 0.0
+
+class Test_server(unittest.TestCase):
+    
+    @classmethod
+    def setUpClass(cls):
+        import asyncio
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.server = PropertyServer(path=os.path.join(cls.directory.name,'fluids.sock'),batch_window=0.01)
+        cls.loop = asyncio.new_event_loop()
+        cls.loop.run_until_complete(cls.server.start())
+        cls.thread = threading.Thread(target=cls.loop.run_forever,daemon=True)
+        cls.thread.start()
+    
+    @classmethod
+    def tearDownClass(cls):
+        import asyncio
+        asyncio.run_coroutine_threadsafe(cls.server.close(),cls.loop).result()
+        cls.loop.call_soon_threadsafe(cls.loop.stop)
+        cls.thread.join()
+        cls.loop.close()
+        cls.directory.cleanup()
+    
+    def test_server_values(self):
+        with Client(path=self.server.address) as client:
+            Air = client.fluid_factory('Air')
+            p = Air(T=300.0,P=1e5)
+            res = p.outputs('H','D')
+        return self.assertEqual(res,dict(H=CP.PropsSI('H','T',300,'P',1e5,'Air'),D=CP.PropsSI('D','T',300,'P',1e5,'Air')))
+    
+    def test_server_options(self):
+        with Client(path=self.server.address) as client:
+            values, errors = client.evaluate('Water',dict(T=300.0,P=1e5),['H'],engine='AbstractState')
+        return self.assertEqual(values['H'],CP.PropsSI('H','T',300,'P',1e5,'Water'))
+    
+    def test_server_errors(self):
+        with Client(path=self.server.address) as client:
+            res = client.fluid_factory('Water')(P=1e5,Q=0.5).outputs('H','A')
+            with self.assertRaises(Exception):
+                client.evaluate('Water',dict(T=300.0,X=1e5),['H'])
+        return self.assertEqual((isinstance(res['H'],float),res['A'].code),(True,'error'))
+    
+    def test_server_args(self):
+        with Client(path=self.server.address) as client:
+            args = client.fluid_factory('Air')(T=300.0,P=1e5).args
+            with self.assertRaises(PropertyError):
+                client.fluid_factory('Water')(P=1e5,Q=0.5).args
+        return self.assertEqual(args,fluid_factory('Air')(T=300.0,P=1e5).args)
+    
+    def test_server_options_rejected(self):
+        with Client(path=self.server.address) as client:
+            for options in (dict(engine_options=dict(directory=self.directory.name)),dict(with_units=True)):
+                with self.assertRaises(Exception):
+                    client.evaluate('Water',dict(T=300.0,P=1e5),['H'],**options)
+            values, errors = client.evaluate('HumidAir',dict(T=300.0,R=0.5),['P'],P_default=9e4)
+        return self.assertEqual(values['P'],9e4)
+    
+    def test_server_coalescing_and_batches(self):
+        import json
+        with Client(path=self.server.address) as client:
+            before = client.stats
+            # pipelined requests: 10 different and 10 identical points of state
+            requests = [dict(id=i,fluid='Air',inputs=dict(T=280.0+i,P=2e5),outputs=['S']) for i in range(10)]
+            requests += [dict(id=10+i,fluid='Air',inputs=dict(T=250.0,P=2e5),outputs=['S']) for i in range(10)]
+            client._socket.sendall(b''.join(json.dumps(r).encode()+b'\n' for r in requests))
+            responses = [json.loads(client._file.readline()) for r in requests]
+            stats = client.stats
+        S = {r['id']: r['values']['S'] for r in responses}
+        ok = S[3] == CP.PropsSI('S','T',283,'P',2e5,'Air') and S[15] == CP.PropsSI('S','T',250,'P',2e5,'Air')
+        points = stats['points']-before['points']
+        return self.assertTrue(ok and points == 11 and stats['batches']-before['batches'] < 11)
+    
+    def test_server_batch_window_after_early_flush(self):
+        import asyncio
+        async def scenario():
+            server = PropertyServer(batch_window=0.2,max_batch=2)
+            # the first queue is flushed by max_batch before its timer
+            await asyncio.gather(*(server.evaluate('Air',dict(T=T,P=1e5),['H']) for T in (300.0,301.0)))
+            await asyncio.sleep(0.1)
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            await server.evaluate('Air',dict(T=302.0,P=1e5),['H'])
+            return loop.time()-start
+        return self.assertGreater(asyncio.run(scenario()),0.18)
+    
+    def test_server_cache_outputs_order(self):
+        with Client(path=self.server.address) as client:
+            client.evaluate('Nitrogen',dict(T=310.0,P=1e5),['H','D'])
+            hits = client.stats['hits']
+            values, errors = client.evaluate('Nitrogen',dict(T=310.0,P=1e5),['D','H'])
+            return self.assertEqual((client.stats['hits'],sorted(values)),(hits+1,['D','H']))
+    
+    def test_server_cache(self):
+        with Client(path=self.server.address) as client:
+            client.evaluate('Nitrogen',dict(T=300.0,P=1e5),['H'])
+            hits = client.stats['hits']
+            client.evaluate('Nitrogen',dict(T=300.0,P=1e5),['H'])
+            return self.assertEqual(client.stats['hits'],hits+1)
+
+class Test_columns(unittest.TestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.Water = fluid_factory('Water')
+        self.table = StateTable.evaluate(self.Water,dict(T=[300.0,350.0,-5.0],P=1e5),['H','D'],workers=1)
+    
+    def tearDown(self):
+        self.directory.cleanup()
+    
+    def test_columns_values(self):
+        H = [CP.PropsSI('H','T',T,'P',1e5,'Water') for T in (300,350)]
+        ok = np.array_equal(self.table['H'][:2],H) and np.isnan(self.table['H'][2])
+        return self.assertTrue(ok and list(self.table.columns) == ['T','P','H','D'] and 2 in self.table.errors['H'])
+    
+    def test_columns_save_load(self):
+        path = os.path.join(self.directory.name,'states')
+        self.table.save(path)
+        table = StateTable.load(path)
+        ok = isinstance(table['H'].base,np.memmap) and table.FluidClass is self.Water
+        return self.assertTrue(ok and np.array_equal(table['D'],self.table['D'],equal_nan=True) and table.errors == self.table.errors)
+    
+    def test_columns_evaluate_to_path(self):
+        path = os.path.join(self.directory.name,'states')
+        table = StateTable.evaluate(self.Water,dict(T=np.linspace(300,400,10),P=1e5),['S'],path=path,chunksize=3,workers=1)
+        S = CP.PropsSI('S','T',np.linspace(300,400,10),'P',1e5,'Water')
+        return self.assertTrue(np.array_equal(table['S'],S) and np.array_equal(StateTable.load(path)['S'],S))
+    
+    def test_columns_point(self):
+        p = self.table.point(1)
+        ok = p._get('H') == self.table['H'][1] and p._get('D') == self.table['D'][1]
+        return self.assertTrue(ok and p.S == CP.PropsSI('S','T',350,'P',1e5,'Water'))
+    
+    def test_columns_batch(self):
+        batch = self.table.batch(slice(0,2))
+        return self.assertTrue(np.shares_memory(batch.H,self.table['H']) and batch.S.shape == (2,))
+    
+    def test_columns_units(self):
+        Air = fluid_factory('Air',with_units=True)
+        table = StateTable.evaluate(Air,dict(T=Q_([20.0,30.0],'degC'),P=Q_(1,'bar')),['H'],workers=1)
+        H = CP.PropsSI('H','T',293.15,'P',1e5,'Air')
+        ok = table.units['T'] == 'K' and table['T'][0] == 293.15
+        return self.assertTrue(ok and table.point(0).H.m_as('J/kg') == H and table.quantity('H')[0].m_as('kJ/kg') == H/1e3)
+    
+    def test_columns_humid_air(self):
+        HA = fluid_factory('HumidAir',P_default=9e4)
+        table = StateTable.evaluate(HA,dict(T=300.0,R=[0.2,0.6]),['W'],workers=1)
+        path = os.path.join(self.directory.name,'ha')
+        table.save(path)
+        p = StateTable.load(path).point(1)
+        return self.assertTrue(type(p) is HA and p.W == table['W'][1] and p.P == 9e4)
+    
+    def test_columns_not_a_table(self):
+        with self.assertRaises(Exception):
+            StateTable.load(self.directory.name)
+
+class Test_threads(unittest.TestCase):
+    
+    def setUp(self):
+        # switch threads as often as possible
+        self.interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+    
+    def tearDown(self):
+        sys.setswitchinterval(self.interval)
+        disable_cache()
+    
+    def run_threads(self,target,n=8):
+        errors = []
+        def run(i):
+            try:
+                target(i)
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=run,args=(i,)) for i in range(n)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return errors
+    
+    def test_threads_shared_points(self):
+        Air = fluid_factory('Air')
+        points = [Air(T=T,P=1e5) for T in np.linspace(250,350,20)]
+        names = ['H','S','D','C','U','A','V','L']
+        def read(i):
+            for p in points:
+                for q in names[i:]+names[:i]:
+                    getattr(p,q)
+        errors = self.run_threads(read)
+        ok = all(p.H == CP.PropsSI('H','T',p.T,'P',1e5,'Air') and p.L == CP.PropsSI('L','T',p.T,'P',1e5,'Air') for p in points)
+        return self.assertEqual((errors,ok),([],True))
+    
+    def test_threads_AbstractState(self):
+        Air = fluid_factory('Air',engine='AbstractState')
+        res = dict()
+        def read(i):
+            T = 250.0 + 10*i
+            res[i] = [Air(T=T,P=1e5).H for j in range(50)]
+        errors = self.run_threads(read)
+        ok = all(set(res[i]) == {CP.PropsSI('H','T',250.0+10*i,'P',1e5,'Air')} for i in res)
+        return self.assertEqual((errors,ok),([],True))
+    
+    def test_threads_cache(self):
+        enable_cache(maxsize=10)
+        Air = fluid_factory('Air')
+        def read(i):
+            for T in np.linspace(250,350,30):
+                Air(T=T,P=1e5).H
+        return self.assertEqual(self.run_threads(read),[])
+    
+    def test_threads_register(self):
+        Air = fluid_factory('Air',with_units=True)
+        p = Air(T=Q_(300,'K'),P=Q_(1e5,'Pa'))
+        def register(i):
+            Air.register(f'Q_{i}','')
+            p.outputs()
+        errors = self.run_threads(register)
+        ok = all(f'Q_{i}' in Air.acceptable_args and f'Q_{i}' in Air._units for i in range(8))
+        return self.assertEqual((errors,ok),([],True))
+    
+    def test_threads_fluid_factory(self):
+        classes = []
+        self.run_threads(lambda i: classes.append(fluid_factory('Nitrogen',engine_options=dict())))
+        return self.assertEqual(len(set(classes)),1)
+    
+    def test_threads_evaluate_many(self):
+        Air = fluid_factory('Air')
+        T = np.linspace(250,350,100)
+        res = evaluate_many(Air,dict(T=T,P=1e5),['H'],workers=4,chunksize=10,pool='thread')
+        return self.assertTrue(np.array_equal(res.values['H'],CP.PropsSI('H','T',T,'P',1e5,'Air')))
+
+class Test_ideal_engine(unittest.TestCase):
+    
+    def setUp(self):
+        self.HA = fluid_factory('HumidAir',engine='ideal')
+        
+    def test_ideal_calculation(self):
+        p = self.HA(T=293.15,R=0.5)
+        ok = np.isclose(p.W,CP.HAPropsSI('W','T',293.15,'R',0.5,'P',101325),rtol=1e-2)
+        ok = ok and np.isclose(p.H,CP.HAPropsSI('H','T',293.15,'R',0.5,'P',101325),atol=500)
+        ok = ok and np.isclose(p.D,CP.HAPropsSI('D','T',293.15,'R',0.5,'P',101325),atol=0.05)
+        ok = ok and np.isclose(p.Vda,CP.HAPropsSI('Vda','T',293.15,'R',0.5,'P',101325),rtol=1e-3)
+        return self.assertTrue(ok)
+    
+    def test_ideal_H_R(self):
+        p = self.HA(H=40000,R=0.5)
+        return self.assertTrue(np.isclose(p.T,CP.HAPropsSI('T','H',40000,'R',0.5,'P',101325),atol=0.05))
+    
+    def test_ideal_W_R(self):
+        p = self.HA(W=0.01,R=0.5)
+        return self.assertTrue(np.isclose(p.T,CP.HAPropsSI('T','W',0.01,'R',0.5,'P',101325),atol=0.1))
+    
+    def test_ideal_roundtrip(self):
+        p = self.HA(T=300,R=0.4)
+        q = self.HA(T=300,B=p.B)
+        r = self.HA(Vda=p.Vda,R=0.4)
+        return self.assertTrue(np.isclose(q.R,0.4) and np.isclose(r.T,300))
+    
+    def test_ideal_other_properties(self):
+        p = self.HA(T=293.15,W=0.01)
+        return self.assertEqual(p.S,CP.HAPropsSI('S','T',293.15,'W',0.01,'P',101325))
+    
+    def test_ideal_error(self):
+        with self.assertRaises(ValueError):
+            self.HA(T=293.15,R=1.5).H
+    
+    def test_ideal_batch(self):
+        b = self.HA.batch(T=np.array([293.15,293.15]),R=np.array([0.5,1.5]))
+        return self.assertTrue(np.isclose(b.H[0],self.HA(T=293.15,R=0.5).H) and np.isnan(b.H[1]))
+    
+    def test_ideal_with_units(self):
+        HA = fluid_factory('HumidAir',engine='ideal',with_units=True)
+        p = HA(T=Q_(20,'degC'),R=Q_(50,'percent'))
+        return self.assertAlmostEqual(p.H.m_as('J/kg'),self.HA(T=293.15,R=0.5).H)
+
+
+class Test_table_engine(unittest.TestCase):
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.options = dict(shape=(40,40),P=(1e4,1e7),T=(200,600),directory=cls.directory.name)
+        cls.Air = fluid_factory('Air',engine='table',engine_options=cls.options)
+        cls.table = cls.Air._generic_function.table
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+    
+    def test_table_calculation(self):
+        p = self.Air(T=300.5,P=2.1e5)
+        H = CP.PropsSI('H','T',300.5,'P',2.1e5,'Air')
+        return self.assertTrue(abs(p.H/H-1) <= self.table.max_rel_error['H'] < 1e-3)
+    
+    def test_table_batch(self):
+        T = np.linspace(210,590,7)
+        H = self.Air.batch(T=T,P=2.1e5).H
+        return self.assertTrue(np.allclose(H,CP.PropsSI('H','T',T,'P',2.1e5,'Air'),rtol=1e-3))
+    
+    def test_table_outside_domain(self):
+        p = self.Air(T=700,P=2.1e5)
+        return self.assertEqual(p.H,CP.PropsSI('H','T',700,'P',2.1e5,'Air'))
+    
+    def test_table_not_tabulated(self):
+        p = self.Air(T=300,P=1e5)
+        return self.assertEqual(p.Q,CP.PropsSI('Q','T',300,'P',1e5,'Air'))
+    
+    def test_table_other_inputs(self):
+        p = self.Air(D=1.2,P=1e5)
+        return self.assertEqual(p.H,CP.PropsSI('H','D',1.2,'P',1e5,'Air'))
+    
+    def test_table_is_memory_mapped(self):
+        Air = fluid_factory('Air',engine='table',engine_options=self.options)
+        table = Air._generic_function.table
+        return self.assertTrue(isinstance(table.tables['H'],np.memmap) and table.path == self.table.path)
+    
+    def test_table_tolerance(self):
+        Air = fluid_factory('Air',engine='table',engine_options=dict(self.options,tolerance=0))
+        p = Air(T=300.5,P=2.1e5)
+        return self.assertEqual(p.H,CP.PropsSI('H','T',300.5,'P',2.1e5,'Air'))
+
+class Test_evaluate_many(unittest.TestCase):
+    
+    def test_evaluate_many_Air(self):
+        Air = fluid_factory('Air')
+        T = np.linspace(250,350,50)
+        res = evaluate_many(Air,dict(T=T,P=1e5),['H','D'],workers=2,chunksize=10)
+        return self.assertTrue(np.array_equal(res.values['H'],Air.batch(T=T,P=1e5).H))
+    
+    def test_evaluate_many_in_process(self):
+        Air = fluid_factory('Air')
+        T = np.linspace(250,350,50).reshape(5,10)
+        res = evaluate_many(Air,dict(T=T,P=1e5),['H'],workers=1,chunksize=7)
+        return self.assertTrue(np.array_equal(res.values['H'],Air.batch(T=T,P=1e5).H))
+    
+    def test_evaluate_many_errors(self):
+        Air = fluid_factory('Air')
+        res = evaluate_many(Air,dict(T=[250,-5,300],P=1e5),['H','D'],workers=2,chunksize=1)
+        ok = np.isnan(res.values['H'][1]) and list(res.errors['H']) == [1]
+        return self.assertTrue(ok and list(res.errors['D']) == [1])
+    
+    def test_evaluate_many_with_units(self):
+        HA = fluid_factory('HumidAir',with_units=True,P_default=Q_(95000,'Pa'))
+        HA.register('Cha','J/kg/K')
+        res = evaluate_many(HA,dict(T=Q_([20,25],'degC'),R=Q_(50,'percent')),['P','Cha'],workers=2)
+        Cha = CP.HAPropsSI('Cha','T',298.15,'R',0.5,'P',95000)
+        return self.assertTrue(np.allclose(res.values['P'].m_as('Pa'),95000) and np.isclose(res.values['Cha'][1].m,Cha))
+    
+    def test_evaluate_many_shared_class_unchanged(self):
+        HA = fluid_factory('HumidAir',P_default=96000)
+        HAu = fluid_factory('HumidAir',with_units=True,P_default=Q_(96000,'Pa'))
+        HAu.register('Cha','J/kg/K')
+        try:
+            for pool in ('thread','process'):
+                res = evaluate_many(HAu,dict(T=Q_([20,25],'degC'),R=Q_(50,'percent')),['Cha'],workers=1,pool=pool)
+        finally:
+            HAu.unregister('Cha')
+        ok = np.isclose(res.values['Cha'][1].m,CP.HAPropsSI('Cha','T',298.15,'R',0.5,'P',96000))
+        return self.assertTrue(ok and 'Cha' not in HA.acceptable_args and fluid_factory('HumidAir',P_default=96000) is HA)
+    
+    def test_evaluate_many_single_point_fallback(self):
+        from fluids.parallel import _evaluate_chunk
+        Air = fluid_factory('Air')
+        def engine(*args):
+            # the vectorized call fails for the second point only
+            v = CP.PropsSI(*args)
+            if np.ndim(v):
+                v = np.array(v)
+                v[1] = np.inf
+            return v
+        Flaky = type('Flaky',(Air,),dict(__slots__=(),_generic_function=staticmethod(engine)))
+        values, errors = _evaluate_chunk(dict(T=np.array([300.0,310.0]),P=np.array([1e5,1e5])),['H'],Flaky)
+        return self.assertEqual((values['H'][1],errors['H']),(CP.PropsSI('H','T',310,'P',1e5,'Air'),dict()))
+    
+    def test_evaluate_many_not_from_fluid_factory(self):
+        with self.assertRaises(Exception):
+            evaluate_many(Point,dict(a=[1,2]),['x'])
+
+class Test_unit_conversions(unittest.TestCase):
+
+    def test_units_offset_conversion(self):
+        Air = fluid_factory('Air',with_units=True)
+        p = Air(T=Q_(20,'degC'),P=Q_(1,'bar'))
+        return self.assertEqual(p._arg_list,['T',293.15,'P',1e5,'Air'])
+
+    def test_units_subset_m_as(self):
+        Air = fluid_factory('Air',with_units=True)
+        p = Air(T=Q_(20,'degC'),P=Q_(1,'bar'))
+        res = p.subset_m_as(t=dict(q='T',u='degC',n=3),h=dict(q='H',u='kJ/kg'))
+        return self.assertEqual((res['t'],res['h']),(20.0,p.H.m_as('kJ/kg')))
+
+    def test_units_subset_to_batch(self):
+        Air = fluid_factory('Air',with_units=True)
+        b = Air.batch(T=Q_([0,20],'degC'),P=Q_(1,'bar'))
+        res = b.subset_to(t=dict(q='T',u='degC',n=2))['t']
+        return self.assertTrue(np.allclose(res.m,[0,20]) and res.units == Q_(1,'degC').units)
+
+    def test_units_register_new_unit(self):
+        Air = fluid_factory('Air',with_units=True)
+        Air.register('Cpmass','J/kg/K')
+        p = Air(T=Q_(300,'K'),P=Q_(1e5,'Pa'))
+        return self.assertAlmostEqual(p.Cpmass.m_as('J/kg/K'),CP.PropsSI('Cpmass','T',300,'P',1e5,'Air'))
+
+    def test_units_missing_unit(self):
+        Air = fluid_factory('Air',with_units=True)
+        with self.assertRaises(Exception):
+            Air(T=300,P=Q_(1e5,'Pa'))
+
+class Test_import(unittest.TestCase):
+
+    # seconds, importing CoolProp alone takes several seconds
+    budget = 1.0
+
+    def run_python(self,code):
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        return subprocess.run(
+            [sys.executable,'-c',code],cwd=root,capture_output=True,text=True,check=True
+        ).stdout.split()
+
+    def test_import_is_lazy(self):
+        res = self.run_python("import sys, fluids; print('pint' in sys.modules, 'CoolProp' in sys.modules)")
+        return self.assertEqual(res,['False','False'])
+
+    def test_import_time_budget(self):
+        res = self.run_python("import time; t = time.perf_counter(); import fluids; print(time.perf_counter()-t)")
+        return self.assertLess(float(res[0]),self.budget)
+
+    def test_import_star(self):
+        res = self.run_python("from fluids import *; print(Q_(5,'percent').bv, fluid_factory('Air').__name__)")
+        return self.assertEqual(res,['0.05','Air'])
+
+    def test_import_lazy_Q_(self):
+        res = self.run_python("import fluids; print(fluids.Q_(5,'percent').bv, fluids.Q_ is fluids.ureg.Quantity)")
+        return self.assertEqual(res,['0.05','True'])
+
+class Test_storage(unittest.TestCase):
+
+    def test_storage_no_dict(self):
+        Air = fluid_factory('Air',with_units=True)
+        p = Air(T=Q_(300,'K'),P=Q_(1e5,'Pa'))
+        return self.assertFalse(hasattr(p,'__dict__'))
+
+    def test_storage_cached_in_array(self):
+        Air = fluid_factory('Air')
+        p = Air(T=300,P=1e5)
+        H = p.H
+        return self.assertEqual(p._values[Air._index['H']],H)
+
+    def test_storage_register_after_creation(self):
+        Air = fluid_factory('Air')
+        p = Air(T=300,P=1e5)
+        Air.register('Cpmass','J/kg/K')
+        return self.assertEqual(p.Cpmass,CP.PropsSI('Cpmass','T',300,'P',1e5,'Air'))
+
+    def test_storage_positions_not_reused(self):
+        Air = fluid_factory('Air')
+        p = Air(T=300,P=1e5)
+        p.H
+        Air.unregister('H')
+        Air.register('Cpmass','J/kg/K')
+        return self.assertEqual(p.Cpmass,CP.PropsSI('Cpmass','T',300,'P',1e5,'Air'))
+
+class Test_constants(unittest.TestCase):
+
+    def test_factory_memoized(self):
+        return self.assertIs(fluid_factory('Air',engine='AbstractState'),fluid_factory('Air',engine='AbstractState'))
+
+    def test_factory_memoized_by_kwargs(self):
+        HA = fluid_factory('HumidAir',P_default=95000)
+        return self.assertIsNot(HA,fluid_factory('HumidAir',P_default=1e5))
+
+    def test_factory_changed_class_not_memoized(self):
+        Air = fluid_factory('Air')
+        Air.register('Cpmass','J/kg/K')
+        return self.assertFalse(hasattr(fluid_factory('Air'),'Cpmass'))
+
+    def test_constants_independent_of_state(self):
+        Air = fluid_factory('Air')
+        # no state for T=-5 K, but the constants are known
+        p = Air(T=-5,P=1e5)
+        return self.assertEqual((p.Tcrit,p.M),(CP.PropsSI('Tcrit','Air'),CP.PropsSI('M','Air')))
+
+    def test_constants_table(self):
+        Water = fluid_factory('Water',with_units=True)
+        constants = Water.constants()
+        return self.assertAlmostEqual(constants['Tcrit'].m_as('degC'),373.946,places=6)
+    
+    def test_constants_registered(self):
+        Water = fluid_factory('Water',with_units=True,validation='mask')
+        Water.register('Ttriple','K',constant=True)
+        return self.assertAlmostEqual(Water.constants()['Ttriple'].m_as('degC'),0.01,places=6)
+    
+    def test_constants_not_in_args(self):
+        args = fluid_factory('Water')(T=300.0,P=1e5).args
+        return self.assertEqual(list(args),[
+            'P','Pcrit','T','Tcrit','D','H','U','S','A','L','M','C','CVMASS','Q','Z','V'
+        ])
+
+    def test_constants_batch(self):
+        Air = fluid_factory('Air')
+        Tcrit = Air.batch(T=[300,310],P=1e5).Tcrit
+        return self.assertTrue(np.all(Tcrit == CP.PropsSI('Tcrit','Air')) and Tcrit.shape == (2,))
+
+    def test_constants_register(self):
+        Air = fluid_factory('Air')
+        Air.register('acentric','',constant=True)
+        return self.assertEqual(Air(T=300,P=1e5).acentric,CP.PropsSI('acentric','Air'))
+
+class Test_instrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.instrumentation = enable_instrumentation()
+        
+    def tearDown(self):
+        disable_instrumentation()
+
+    def test_instrumentation_hits_and_misses(self):
+        Air = fluid_factory('Air')
+        p = Air(T=300,P=1e5)
+        p.H, p.H, p.T, p.Tcrit
+        rows = {row['property']: row for row in self.instrumentation.report()}
+        return self.assertEqual(
+            [(rows[k]['calls'],rows[k]['hits'],rows[k]['misses']) for k in ['H','T','Tcrit']],
+            [(2,1,1),(1,1,0),(1,1,0)]
+        )
+
+    def test_instrumentation_errors(self):
+        Air = fluid_factory('Air')
+        with self.assertRaises(ValueError):
+            Air(T=-5,P=1e5).H
+        return self.assertEqual(dict(self.instrumentation.errors),{(Air,'H','ValueError'): 1})
+
+    def test_instrumentation_histogram(self):
+        HA = fluid_factory('HumidAir',with_units=True)
+        HA(T=Q_(20,'degC'),R=Q_(50,'percent')).H
+        return self.assertEqual(sum(self.instrumentation.histogram(HA,'H').values()),1)
+
+    def test_instrumentation_hook(self):
+        events = []
+        self.instrumentation.add_hook(events.append)
+        Air = fluid_factory('Air')
+        Air.batch(T=[300,310],P=1e5).H
+        return self.assertEqual([(e.cls.__name__,e.arg,e.error) for e in events],[('Air_Batch','H',None)])
+
+    def test_instrumentation_bulk(self):
+        Water = fluid_factory('Water')
+        Water(P=1e5,Q=0.5).args_or_errormessages
+        errors = {k[1:]: n for k,n in self.instrumentation.errors.items()}
+        return self.assertEqual((self.instrumentation.misses[(Water,'H')],errors),(1,{('A','PropertyError'): 1}))
+
+    def test_instrumentation_args(self):
+        Air = fluid_factory('Air')
+        p = Air(T=300,P=1e5)
+        p.args, p.args, p.args_or_errormessages
+        rows = {row['property']: row for row in self.instrumentation.report()}
+        return self.assertEqual(
+            [(rows[k]['calls'],rows[k]['hits'],rows[k]['misses']) for k in ['H','T','Pcrit']],
+            [(3,2,1),(3,3,0),(3,3,0)]
+        )
+    
+    def test_instrumentation_threads(self):
+        Air = fluid_factory('Air')
+        p = Air(T=300,P=1e5)
+        p.H
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=lambda: [p.H for i in range(2000)]) for k in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            sys.setswitchinterval(interval)
+        return self.assertEqual(self.instrumentation.calls[(Air,'H')],1+8*2000)
+    
+    def test_instrumentation_disabled(self):
+        disable_instrumentation()
+        names = [Point_of_State.__dict__[k].__name__ for k in ('_generic_property','outputs')]
+        return self.assertEqual(names,['_generic_property','outputs'])
+
+class Test_outputs(unittest.TestCase):
+
+    def test_outputs_values(self):
+        Air = fluid_factory('Air')
+        res = Air(T=300,P=1e5).outputs('H','S','Tcrit')
+        return self.assertEqual(res,{k: CP.PropsSI(k,'T',300,'P',1e5,'Air') for k in ['H','S','Tcrit']})
+
+    def test_outputs_cached(self):
+        Air = fluid_factory('Air')
+        p = Air(T=300,P=1e5)
+        p.outputs()
+        return self.assertEqual(p._get('D'),CP.PropsSI('D','T',300,'P',1e5,'Air'))
+
+    def test_outputs_undefined(self):
+        Water = fluid_factory('Water')
+        res = Water(P=1e5,Q=0.5).args_or_errormessages
+        return self.assertEqual((res['A'].code,isinstance(res['H'],float)),('undefined',True))
+
+    def test_outputs_state(self):
+        Water = fluid_factory('Water')
+        res = Water(T=-5,P=1e5).outputs('H','D')
+        return self.assertEqual([v.code for v in res.values()],['state','state'])
+
+    def test_outputs_not_skipped_after_failures(self):
+        Water = fluid_factory('Water')
+        for H in [1e6,1.5e6,2e6]:
+            Water(P=1e5,H=H).args_or_errormessages
+        p = Water(P=1e5,H=3e6)
+        return self.assertEqual(p.args_or_errormessages['A'],p.A)
+    
+    def test_outputs_invalid_states_not_skipped(self):
+        Water = fluid_factory('Water')
+        for T in [-5,-6,-7,-8]:
+            Water(T=T,P=1e5).outputs('H')
+        return self.assertIsInstance(Water(T=300,P=1e5).outputs('H')['H'],float)
+
+    def test_outputs_humid_air_with_units(self):
+        HA = fluid_factory('HumidAir',with_units=True)
+        res = HA(T=Q_(20,'degC'),R=Q_(200,'percent')).args_or_errormessages
+        return self.assertTrue(all(isinstance(res[k],PropertyError) for k in ['H','W']))
+
+    def test_outputs_AbstractState(self):
+        Water = fluid_factory('Water',engine='AbstractState')
+        res = Water(P=1e5,Q=0.5).outputs('H','A')
+        return self.assertEqual((res['H'],res['A'].code),(CP.PropsSI('H','P',1e5,'Q',0.5,'Water'),'undefined'))
+
 if __name__ == '__main__':
 
     unittest.main()